@@ -0,0 +1,90 @@
+"""
+Event-loop responsiveness benchmark for upload ingestion.
+
+Simulates status polls arriving every few milliseconds while a large upload
+is parsed, once inline on the event loop and once through the ingestion
+executor, and reports how long the polls were delayed. Run from the Backend
+directory:
+
+    python -m benchmarks.ingestion_benchmark --entries 300000 --pollers 20
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from src import ingestion, synthetic_history
+
+
+def synthetic_upload(entries, seed=0):
+    history = synthetic_history.generate_watch_history(entries, seed=seed)
+    return json.dumps(history).encode("utf-8")
+
+
+async def poll(interval, stop, delays):
+    # Each poll should wake up after `interval`; any extra wait is loop stall
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        delays.append((time.perf_counter() - expected) * 1000)
+
+
+async def run_scenario(raw, pollers, interval, offload):
+    stop = asyncio.Event()
+    delays = []
+    tasks = [asyncio.create_task(poll(interval, stop, delays)) for _ in range(pollers)]
+    await asyncio.sleep(interval * 2)
+
+    started = time.perf_counter()
+    if offload:
+        await ingestion.parse_upload_async(raw)
+    else:
+        ingestion.parse_upload(raw)
+    elapsed = time.perf_counter() - started
+
+    await asyncio.sleep(interval * 2)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return elapsed, sorted(delays)
+
+
+def report(label, elapsed, delays):
+    print(f"{label}")
+    print(f"  parse time:      {elapsed:.2f}s")
+    print(f"  polls:           {len(delays)}")
+    print(f"  poll delay p50:  {statistics.median(delays):.1f}ms")
+    print(f"  poll delay p99:  {delays[int(len(delays) * 0.99) - 1]:.1f}ms")
+    print(f"  poll delay max:  {delays[-1]:.1f}ms")
+
+
+async def main_async(args):
+    raw = synthetic_upload(args.entries)
+    print(f"upload size: {len(raw) / 1_000_000:.1f} MB, {args.entries} entries\n")
+
+    # Warm the pool so worker start-up is not counted against the first upload
+    await ingestion.parse_upload_async(synthetic_upload(10))
+
+    for label, offload in (("inline (event loop)", False), ("executor", True)):
+        elapsed, delays = await run_scenario(
+            raw, args.pollers, args.interval / 1000, offload
+        )
+        report(label, elapsed, delays)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=300_000)
+    parser.add_argument("--pollers", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=10, help="milliseconds")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        ingestion.shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
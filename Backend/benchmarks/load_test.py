@@ -0,0 +1,149 @@
+"""
+End-to-end load test for the JSON API.
+
+Drives concurrent sessions through upload, status polling, analytics and
+video paging against a running app and reports throughput and latency
+percentiles per endpoint. Start the YouTube API stub and the app first (see
+benchmarks/youtube_api_stub.py), then run from the Backend directory:
+
+    python -m benchmarks.load_test --sessions 20 --entries 20000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import httpx
+
+from src import synthetic_history
+from src.constants import SESSION_COOKIE_NAME
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # endpoint -> milliseconds
+        self.statuses = defaultdict(Counter)  # endpoint -> status code counts
+
+    async def request(self, client, method, endpoint, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, endpoint, **kwargs)
+        self.latencies[endpoint].append((time.perf_counter() - started) * 1000)
+        self.statuses[endpoint][response.status_code] += 1
+        return response
+
+
+async def run_session(number, args, recorder, upload):
+    session_id = str(uuid.uuid4())
+    async with httpx.AsyncClient(
+        base_url=args.base_url,
+        cookies={SESSION_COOKIE_NAME: session_id},
+        timeout=args.request_timeout,
+    ) as client:
+        started = time.perf_counter()
+        while True:
+            response = await recorder.request(
+                client,
+                "POST",
+                "/api/load-data",
+                files={
+                    "file_input": ("watch-history.json", upload, "application/json")
+                },
+            )
+            if response.status_code != 429:
+                break
+            # Admission control turned the upload away; come back when told to
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+        if response.status_code != 200:
+            return f"session {number}: upload failed with {response.status_code}"
+
+        deadline = started + args.session_timeout
+        while True:
+            response = await recorder.request(client, "GET", "/api/status")
+            if response.status_code != 200:
+                return f"session {number}: {response.json().get('error')}"
+            if response.json().get("ready"):
+                break
+            if time.perf_counter() > deadline:
+                return f"session {number}: timed out"
+            await asyncio.sleep(args.poll_interval)
+
+        response = await recorder.request(client, "GET", "/api/analytics")
+        if response.status_code != 200:
+            return f"session {number}: analytics failed with {response.status_code}"
+
+        for page in range(1, args.pages + 1):
+            response = await recorder.request(
+                client, "GET", "/api/videos", params={"page": page}
+            )
+            if page >= response.json().get("totalPages", 0):
+                break
+
+        recorder.latencies["session"].append((time.perf_counter() - started) * 1000)
+        return None
+
+
+def percentile(values, fraction):
+    return values[max(int(len(values) * fraction + 0.5) - 1, 0)]
+
+
+def report(recorder, elapsed, failures):
+    print(f"{'endpoint':<16}{'requests':>9}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}")
+    for endpoint, latencies in recorder.latencies.items():
+        latencies = sorted(latencies)
+        print(
+            f"{endpoint:<16}{len(latencies):>9}{len(latencies) / elapsed:>9.1f}"
+            f"{percentile(latencies, 0.5):>10.1f}{percentile(latencies, 0.99):>10.1f}"
+        )
+    print()
+    for endpoint, statuses in recorder.statuses.items():
+        codes = ", ".join(
+            f"{code}: {count}" for code, count in sorted(statuses.items())
+        )
+        print(f"{endpoint:<16}{codes}")
+    print(f"\nwall time: {elapsed:.1f}s, failed sessions: {len(failures)}")
+    for failure in failures:
+        print(f"  {failure}")
+
+
+async def main_async(args):
+    uploads = [
+        json.dumps(
+            synthetic_history.generate_watch_history(args.entries, seed=number)
+        ).encode("utf-8")
+        for number in range(args.sessions)
+    ]
+    print(
+        f"{args.sessions} sessions, {args.entries} entries each "
+        f"({len(uploads[0]) / 1_000_000:.1f} MB uploads)\n"
+    )
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            run_session(number, args, recorder, upload)
+            for number, upload in enumerate(uploads)
+        )
+    )
+    report(recorder, time.perf_counter() - started, [r for r in results if r])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--entries", type=int, default=10_000)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="seconds")
+    parser.add_argument("--request-timeout", type=float, default=60, help="seconds")
+    parser.add_argument("--session-timeout", type=float, default=600, help="seconds")
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Time and memory benchmark of merge_data against the pd.merge join it replaced.
+
+Both joins run on the same synthetic history and metadata table and must
+return the same frame. The pytest-benchmark tests track the time; run as a
+script it also reports the peak memory of each join from tracemalloc. Run
+from the Backend directory:
+
+    python -m pytest benchmarks/merge_data_benchmark.py --benchmark-autosave
+    python -m benchmarks.merge_data_benchmark --entries 1000000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from src import analytics, data_processing, models, synthetic_history
+
+BENCHMARK_ENTRIES = 100_000
+
+
+def pandas_merge(videos, vid_info_df):
+    """merge_data as it was: a string-keyed pd.merge, then a notna mask."""
+    video_data = [{"id": video.id, "watch_date": video.watchDate} for video in videos]
+    df = pd.DataFrame(video_data)
+
+    merged_df = pd.merge(df, vid_info_df, on="id", how="left")
+    merged_df = merged_df.loc[
+        merged_df["title"].notna()
+        & merged_df["channelTitle"].notna()
+        & merged_df["duration"].notna()
+    ]
+    youtube_df = merged_df.sort_values(
+        "watch_date", ascending=False, kind="stable", na_position="last"
+    ).reset_index(drop=True)
+    youtube_df["duration_seconds"] = analytics.duration_to_seconds(
+        youtube_df["duration"].tolist()
+    )
+    return youtube_df
+
+
+JOINS = {"pandas_merge": pandas_merge, "code_join": data_processing.merge_data}
+
+
+def merge_inputs(entries, seed=0):
+    history = synthetic_history.generate_watch_history(entries, seed=seed)
+    watched_items = [models.WatchedItem.model_validate(item) for item in history]
+    filtered_json_data, _ = data_processing.filter_data(watched_items)
+    videos = data_processing.json_to_youtube_videos(filtered_json_data)
+    metadata = synthetic_history.video_metadata_frame(video.id for video in videos)
+    return videos, metadata
+
+
+@pytest.fixture(scope="module")
+def inputs():
+    return merge_inputs(BENCHMARK_ENTRIES)
+
+
+@pytest.mark.parametrize("join", list(JOINS))
+def test_merge_data(benchmark, inputs, join):
+    merged = benchmark.pedantic(JOINS[join], args=inputs, rounds=3, iterations=1)
+    pd.testing.assert_frame_equal(merged, pandas_merge(*inputs))
+
+
+def peak_memory(join, inputs):
+    """Peak bytes allocated while joining, not counting the inputs."""
+    tracemalloc.start()
+    try:
+        join(*inputs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=BENCHMARK_ENTRIES)
+    args = parser.parse_args()
+
+    inputs = merge_inputs(args.entries)
+    for name, join in JOINS.items():
+        # tracemalloc slows allocation down, so time a separate untraced run
+        started = time.perf_counter()
+        join(*inputs)
+        elapsed = time.perf_counter() - started
+        peak = peak_memory(join, inputs)
+        print(
+            f"{name:>12}: {len(inputs[0])} watches, "
+            f"{elapsed:6.2f}s, peak memory {peak / 1_000_000:6.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
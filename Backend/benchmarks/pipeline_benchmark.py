@@ -0,0 +1,141 @@
+"""
+pytest-benchmark suite for the upload-to-analytics pipeline.
+
+Times every CPU-heavy stage on synthetic histories of 1k, 100k and 1M
+entries. The 1M size only runs when BENCHMARK_MAX_ENTRIES allows it, since
+building its fixtures alone takes a few minutes. Run from the Backend
+directory and save the results so later runs can be compared against them:
+
+    python -m pytest benchmarks/pipeline_benchmark.py --benchmark-autosave
+    BENCHMARK_MAX_ENTRIES=1000000 python -m pytest benchmarks/pipeline_benchmark.py \
+        --benchmark-autosave --benchmark-compare
+"""
+
+import copy
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from src import (
+    analytics,
+    data_processing,
+    models,
+    synthetic_history,
+    video_index,
+    visualization,
+)
+from src.data_store import DataStore
+
+SIZES = [1_000, 100_000, 1_000_000]
+BENCHMARK_MAX_ENTRIES = int(os.getenv("BENCHMARK_MAX_ENTRIES", 100_000))
+
+
+@pytest.fixture(
+    scope="module",
+    params=[
+        pytest.param(
+            size,
+            marks=pytest.mark.skipif(
+                size > BENCHMARK_MAX_ENTRIES,
+                reason=f"BENCHMARK_MAX_ENTRIES is {BENCHMARK_MAX_ENTRIES}",
+            ),
+        )
+        for size in SIZES
+    ],
+    ids=lambda size: f"{size}",
+)
+def stages(request):
+    # Module scope builds each size's inputs once; pytest runs every benchmark
+    # for one size before moving on to the next
+    history = synthetic_history.generate_watch_history(request.param)
+    watched_items = [models.WatchedItem.model_validate(item) for item in history]
+    filtered_json_data, _ = data_processing.filter_data(watched_items)
+    videos = data_processing.json_to_youtube_videos(filtered_json_data)
+    metadata = synthetic_history.video_metadata_frame(video.id for video in videos)
+    complete_data = data_processing.merge_data(videos, metadata)
+    store = DataStore()
+    store.complete_data = complete_data.copy()
+    store.watch_metrics = analytics.compute_watch_metrics(complete_data)
+    store.watch_metrics["watch_cube"] = analytics.build_watch_cube(
+        complete_data, store.watch_metrics["channel_names"]
+    )
+    return {
+        "watched_items": watched_items,
+        "videos": videos,
+        "metadata": metadata,
+        "complete_data": complete_data,
+        "watch_metrics": store.watch_metrics,
+        "store_dict": store.to_dict(),
+    }
+
+
+def test_filter_data(benchmark, stages):
+    filtered, _ = benchmark(data_processing.filter_data, stages["watched_items"])
+    assert filtered
+
+
+def test_merge_data(benchmark, stages):
+    merged = benchmark(data_processing.merge_data, stages["videos"], stages["metadata"])
+    assert len(merged) == len(stages["complete_data"])
+
+
+def test_data_store_to_dict(benchmark, stages):
+    # to_dict rewrites watch_date in place, so every round gets a fresh store
+    def setup():
+        store = DataStore()
+        store.complete_data = stages["complete_data"].copy()
+        store.watch_metrics = stages["watch_metrics"]
+        return (store,), {}
+
+    benchmark.pedantic(DataStore.to_dict, setup=setup, rounds=5)
+
+
+def test_data_store_from_dict(benchmark, stages):
+    store = benchmark(DataStore.from_dict, copy.deepcopy(stages["store_dict"]))
+    assert len(store.complete_data) == len(stages["complete_data"])
+
+
+def test_compute_watch_metrics(benchmark, stages):
+    benchmark(analytics.compute_watch_metrics, stages["complete_data"])
+
+
+def test_summarize_watch_metrics(benchmark, stages):
+    context = benchmark(analytics.summarize_watch_metrics, stages["watch_metrics"], {})
+    assert context
+
+
+def test_build_watch_cube(benchmark, stages):
+    benchmark(
+        analytics.build_watch_cube,
+        stages["complete_data"],
+        stages["watch_metrics"]["channel_names"],
+    )
+
+
+def test_build_video_index(benchmark, stages):
+    def build():
+        table = video_index.build_unique_video_table(stages["complete_data"])
+        return video_index.build_video_index(table)
+
+    benchmark(build)
+
+
+def test_calculate_total_watch_time(benchmark, stages):
+    durations = stages["complete_data"]["duration"].tolist()
+    benchmark(analytics.calculate_total_watch_time, durations, {})
+
+
+def test_prepare_visualizations(benchmark, stages):
+    context = benchmark.pedantic(
+        visualization.prepare_visualizations,
+        args=(
+            stages["complete_data"],
+            {},
+            stages["watch_metrics"]["watch_cube"],
+            stages["watch_metrics"]["channel_names"],
+        ),
+        rounds=3,
+    )
+    assert "heatmap" in context
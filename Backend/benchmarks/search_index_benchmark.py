@@ -0,0 +1,94 @@
+"""
+Latency benchmark for the per-session search index.
+
+Builds an index over synthetic unique video rows and reports build time and
+query latency percentiles. Run from the Backend directory:
+
+    python -m benchmarks.search_index_benchmark --rows 1000000
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from src import search_index
+
+WORDS = [
+    "minecraft",
+    "tutorial",
+    "review",
+    "python",
+    "music",
+    "live",
+    "stream",
+    "highlights",
+    "official",
+    "video",
+    "reaction",
+    "news",
+    "podcast",
+    "episode",
+    "trailer",
+    "gameplay",
+    "cooking",
+    "travel",
+    "vlog",
+    "guide",
+    "explained",
+    "history",
+    "science",
+    "football",
+    "lofi",
+    "remix",
+    "interview",
+    "shorts",
+]
+
+
+def synthetic_unique_vids(rows, seed=0):
+    rng = random.Random(seed)
+    channels = [f"Channel {number}" for number in range(max(rows // 50, 1))]
+    return [
+        [
+            " ".join(rng.choices(WORDS, k=rng.randint(3, 8))) + f" {number}",
+            rng.choice(channels),
+        ]
+        for number in range(rows)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    unique_vids = synthetic_unique_vids(args.rows)
+
+    started = time.perf_counter()
+    index = search_index.build_search_index(unique_vids)
+    build_seconds = time.perf_counter() - started
+
+    rng = random.Random(1)
+    queries = [
+        " ".join(rng.sample(WORDS, rng.randint(1, 3)))[: rng.randint(4, 30)]
+        for _ in range(args.queries)
+    ]
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        search_index.search(index, query)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    print(f"rows:            {args.rows}")
+    print(f"vocabulary size: {len(index['vocabulary'])}")
+    print(f"build time:      {build_seconds:.2f}s")
+    print(f"query p50:       {statistics.median(latencies):.2f}ms")
+    print(f"query p99:       {latencies[int(len(latencies) * 0.99) - 1]:.2f}ms")
+    print(f"query max:       {latencies[-1]:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
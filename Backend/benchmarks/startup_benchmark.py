@@ -0,0 +1,84 @@
+"""
+Cold-start benchmark for the web app and the pipeline worker.
+
+Imports each entry point in a fresh interpreter, so every run pays the full
+import cost a new process pays. The pytest-benchmark tests track the wall
+time with the rest of the suite; run as a script it prints the slowest
+imports from `python -X importtime` and the heavy libraries that were
+loaded eagerly. Run from the Backend directory:
+
+    python -m pytest benchmarks/startup_benchmark.py --benchmark-autosave
+    python -m benchmarks.startup_benchmark --module src.worker --top 20
+"""
+
+import argparse
+import subprocess
+import sys
+
+import pytest
+
+ENTRY_POINTS = ["src.main", "src.worker"]
+# Loaded on first use; they should not be loaded by importing an entry point
+LAZY_MODULES = ["pandas", "numpy", "plotly.express"]
+
+_LOADED_SCRIPT = """
+import importlib, sys
+from src.lazy_imports import is_loaded
+importlib.import_module(sys.argv[1])
+print(",".join(name for name in sys.argv[2:] if is_loaded(name)))
+"""
+
+
+def import_module(module: str) -> None:
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+
+
+def import_times(module: str):
+    """(cumulative microseconds, module) of every import, slowest first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times.append((int(cumulative), name.strip()))
+    return sorted(times, reverse=True)
+
+
+def eagerly_loaded(module: str):
+    """The LAZY_MODULES that importing the module loads right away."""
+    result = subprocess.run(
+        [sys.executable, "-c", _LOADED_SCRIPT, module, *LAZY_MODULES],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return [name for name in result.stdout.strip().split(",") if name]
+
+
+@pytest.mark.parametrize("module", ENTRY_POINTS)
+def test_import(benchmark, module):
+    benchmark.pedantic(import_module, args=(module,), rounds=5, iterations=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="src.main", choices=ENTRY_POINTS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+    print(f"{'cumulative ms':>14}  module")
+    for cumulative, name in times[: args.top]:
+        print(f"{cumulative / 1000:>14.1f}  {name}")
+    loaded = eagerly_loaded(args.module)
+    print(f"\neagerly loaded heavy libraries: {', '.join(loaded) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
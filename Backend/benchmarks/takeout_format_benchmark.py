@@ -0,0 +1,71 @@
+"""
+Parse-time and memory benchmark for the JSON and HTML Takeout formats.
+
+Renders the same synthetic history in both formats and parses each with
+ingestion.parse_upload. The pytest-benchmark tests track the parse time;
+run as a script it also reports the peak memory of each parse from
+tracemalloc. Run from the Backend directory:
+
+    python -m pytest benchmarks/takeout_format_benchmark.py --benchmark-autosave
+    python -m benchmarks.takeout_format_benchmark --entries 100000
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import pytest
+
+from src import ingestion, synthetic_history
+
+FORMATS = ["json", "html"]
+BENCHMARK_ENTRIES = 20_000
+
+
+def synthetic_upload(entries, file_format, seed=0):
+    history = synthetic_history.generate_watch_history(entries, seed=seed)
+    if file_format == "html":
+        return synthetic_history.to_takeout_html(history).encode("utf-8")
+    return json.dumps(history).encode("utf-8")
+
+
+@pytest.mark.parametrize("file_format", FORMATS)
+def test_parse_upload(benchmark, file_format):
+    raw = synthetic_upload(BENCHMARK_ENTRIES, file_format)
+    parsed = benchmark.pedantic(
+        ingestion.parse_upload, args=(raw,), rounds=3, iterations=1
+    )
+    assert parsed.entry_count == BENCHMARK_ENTRIES
+
+
+def peak_memory(raw):
+    """Peak bytes allocated while parsing, not counting the upload itself."""
+    tracemalloc.start()
+    try:
+        ingestion.parse_upload(raw)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for file_format in FORMATS:
+        raw = synthetic_upload(args.entries, file_format)
+        # tracemalloc slows allocation down, so time a separate untraced run
+        started = time.perf_counter()
+        ingestion.parse_upload(raw)
+        elapsed = time.perf_counter() - started
+        peak = peak_memory(raw)
+        print(
+            f"{file_format:>4}: {len(raw) / 1_000_000:6.1f} MB, "
+            f"{elapsed:6.2f}s, peak memory {peak / 1_000_000:6.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
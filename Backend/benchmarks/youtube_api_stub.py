@@ -0,0 +1,122 @@
+"""
+Local stand-in for the YouTube Data API videos.list endpoint.
+
+Serves deterministic snippet/contentDetails for any video ID (see
+src.synthetic_history.video_metadata) with optional latency, 429 responses
+and missing IDs, so the pipeline can be load-tested offline. Run from the
+Backend directory and point the app at it:
+
+    python -m benchmarks.youtube_api_stub --port 8081 --latency-ms 80 --rate-limit-ratio 0.02
+    YOUTUBE_API_BASE_URL=http://127.0.0.1:8081/youtube/v3 YOUTUBE_API_KEY=stub ...
+"""
+
+import argparse
+import asyncio
+import random
+import zlib
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+
+from src import synthetic_history
+
+MAX_IDS_PER_REQUEST = 50
+
+
+def create_app(
+    latency_ms: float = 0,
+    jitter_ms: float = 0,
+    rate_limit_ratio: float = 0,
+    missing_ratio: float = 0,
+    seed: int = 0,
+) -> FastAPI:
+    """
+    Build the stub app.
+
+    :param latency_ms: Delay added to every response.
+    :param jitter_ms: Extra uniformly random delay on top of latency_ms.
+    :param rate_limit_ratio: Share of requests answered with 429.
+    :param missing_ratio: Share of video IDs the stub has no record for. The
+        same IDs are missing on every request, like deleted videos.
+    :param seed: Seed for latency jitter and which requests get a 429.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+    app.state.stats = {"requests": 0, "rateLimited": 0, "videos": 0, "missing": 0}
+
+    @app.get("/youtube/v3/videos")
+    async def videos(part: str, id: str, key: str):
+        stats = app.state.stats
+        stats["requests"] += 1
+        delay = latency_ms + rng.uniform(0, jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        if rng.random() < rate_limit_ratio:
+            stats["rateLimited"] += 1
+            return JSONResponse(
+                {"error": {"code": 429, "errors": [{"reason": "rateLimitExceeded"}]}},
+                status_code=429,
+                headers={"Retry-After": "1"},
+            )
+
+        video_ids = [video_id for video_id in id.split(",") if video_id]
+        if len(video_ids) > MAX_IDS_PER_REQUEST:
+            raise HTTPException(status_code=400, detail="Too many video IDs.")
+
+        items = []
+        for video_id in video_ids:
+            if _is_missing(video_id, missing_ratio):
+                stats["missing"] += 1
+                continue
+            metadata = synthetic_history.video_metadata(video_id)
+            items.append(
+                {
+                    "kind": "youtube#video",
+                    "id": video_id,
+                    "snippet": {
+                        "title": metadata["title"],
+                        "channelTitle": metadata["channelTitle"],
+                    },
+                    "contentDetails": {"duration": metadata["duration"]},
+                }
+            )
+        stats["videos"] += len(items)
+        return {"kind": "youtube#videoListResponse", "items": items}
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+
+def _is_missing(video_id: str, missing_ratio: float) -> bool:
+    # Hash-based so every request and every process agrees on the missing IDs
+    return zlib.crc32(video_id.encode("utf-8")) % 10_000 < missing_ratio * 10_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0)
+    parser.add_argument("--missing-ratio", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit_ratio=args.rate_limit_ratio,
+        missing_ratio=args.missing_ratio,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Admission Module
+
+This module limits how many data pipelines a single process runs at once.
+A pipeline is admitted when a concurrency slot is free and its estimated
+memory fits in the remaining budget; otherwise it waits in a FIFO queue.
+Uploads are turned away once the queue itself is full.
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_PIPELINES = int(os.getenv("MAX_CONCURRENT_PIPELINES", 2))
+MAX_QUEUED_PIPELINES = int(os.getenv("MAX_QUEUED_PIPELINES", 20))
+PIPELINE_MEMORY_BUDGET_MB = int(os.getenv("PIPELINE_MEMORY_BUDGET_MB", 1024))
+# Peak pipeline memory per uploaded byte: parsed entries, merged DataFrame,
+# aggregates and indexes together come to roughly ten times the raw JSON
+UPLOAD_MEMORY_FACTOR = float(os.getenv("UPLOAD_MEMORY_FACTOR", 10))
+# Suggested wait, in seconds, for clients turned away with a 429
+PIPELINE_RETRY_AFTER_SECONDS = int(os.getenv("PIPELINE_RETRY_AFTER_SECONDS", 30))
+
+_admission_controller = None
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_PIPELINES,
+        memory_budget: int = PIPELINE_MEMORY_BUDGET_MB * 1024 * 1024,
+        max_queued: int = MAX_QUEUED_PIPELINES,
+    ):
+        self.max_concurrent = max_concurrent
+        self.memory_budget = memory_budget
+        self.max_queued = max_queued
+        # Tickets are (session ID, unique marker) so a re-upload waiting next
+        # to its superseded run is still told apart from it
+        self._running = {}  # ticket -> estimated bytes
+        self._waiting = deque()  # tickets in arrival order
+        self._changed = asyncio.Condition()
+
+    def estimate_cost(self, upload_bytes: int) -> int:
+        """Estimate the peak memory a pipeline needs for an upload of this size."""
+        return int(upload_bytes * UPLOAD_MEMORY_FACTOR)
+
+    def is_full(self) -> bool:
+        """Whether another pipeline would exceed the queue limit."""
+        return len(self._waiting) >= self.max_queued
+
+    def position(self, session_id: str) -> Optional[int]:
+        """1-based queue position of a waiting session, or None if not waiting."""
+        for position, (waiting_session, _) in enumerate(self._waiting, start=1):
+            if waiting_session == session_id:
+                return position
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._running),
+            "queued": len(self._waiting),
+            "reservedBytes": sum(self._running.values()),
+        }
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        session_id: str,
+        cost: int,
+        on_queued: Optional[Callable[[int], Awaitable[None]]] = None,
+    ):
+        """
+        Hold a pipeline slot for the duration of the block.
+
+        :param session_id: Session the pipeline runs for.
+        :param cost: Estimated peak memory in bytes (see estimate_cost).
+        :param on_queued: Awaited with the queue position whenever the
+            pipeline has to wait and its position changes.
+        """
+        ticket = (session_id, object())
+        async with self._changed:
+            self._waiting.append(ticket)
+
+        reported = None
+        try:
+            while True:
+                async with self._changed:
+                    if self._can_start(ticket, cost):
+                        self._waiting.remove(ticket)
+                        self._running[ticket] = cost
+                        self._changed.notify_all()
+                        break
+                    position = self._waiting.index(ticket) + 1
+                    if on_queued is None or position == reported:
+                        await self._changed.wait()
+                        continue
+                # Reported outside the lock so slow callbacks never hold up
+                # pipelines that are finishing or being admitted
+                reported = position
+                await on_queued(position)
+        except BaseException:
+            async with self._changed:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                self._changed.notify_all()
+            raise
+
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self._running.pop(ticket, None)
+                self._changed.notify_all()
+
+    def _can_start(self, ticket: tuple, cost: int) -> bool:
+        if self._waiting[0] != ticket:
+            return False
+        if not self._running:
+            # A pipeline larger than the whole budget still runs, but alone
+            return True
+        return (
+            len(self._running) < self.max_concurrent
+            and sum(self._running.values()) + cost <= self.memory_budget
+        )
+
+
+def get_admission_controller() -> AdmissionController:
+    """Return this process's admission controller."""
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController()
+    return _admission_controller
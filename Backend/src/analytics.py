@@ -7,9 +7,32 @@ Author: Zachary Cervenka
 """
 
 from collections import Counter
-from datetime import timedelta
+from datetime import date, datetime, timedelta, timezone
 import re
 
+from .lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Consecutive watches closer together than this belong to the same session
+SESSION_GAP_SECONDS = 30 * 60
+
+# Lower bound in seconds of each session-length histogram bucket
+SESSION_HISTOGRAM_EDGES = tuple(minutes * 60 for minutes in (0, 15, 30, 60, 120, 240))
+SESSION_HISTOGRAM_LABELS = ("<15m", "15-30m", "30m-1h", "1-2h", "2-4h", "4h+")
+
+ISO_DURATION_PATTERN = (
+    r"^P(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+
+# Time resolutions of the watch cube, finest first
+CUBE_RESOLUTIONS = ("day", "week", "month")
+
+# Day numbers in the watch cube count from here
+_EPOCH = date(1970, 1, 1)
+
 
 def get_top_channels(youtube_history_df, column_name="channelTitle", top_n=5):
     """Function to get the top channels from a DataFrame with a 'channelTitle' column."""
@@ -57,6 +80,624 @@ def calculate_total_watch_time(vid_duration_list, context):
     return context
 
 
+def duration_to_seconds(vid_duration_list):
+    """Function to convert ISO 8601 video durations into an int64 array of seconds."""
+    durations = pd.Series(vid_duration_list, dtype="object").astype("string")
+    parts = durations.str.extract(ISO_DURATION_PATTERN).astype("float64").fillna(0)
+    seconds = (
+        parts["days"] * 86400
+        + parts["hours"] * 3600
+        + parts["minutes"] * 60
+        + parts["seconds"]
+    )
+    return seconds.to_numpy(dtype=np.int64)
+
+
+def watch_seconds(youtube_df):
+    """Function to get per-row watch durations in seconds, preferring the numeric column."""
+    if "duration_seconds" in youtube_df.columns:
+        return youtube_df["duration_seconds"].to_numpy(dtype=np.int64)
+    if "duration" in youtube_df.columns:
+        return duration_to_seconds(youtube_df["duration"].tolist())
+    return np.zeros(len(youtube_df), dtype=np.int64)
+
+
+def compute_watch_metrics(youtube_df, session_gap=SESSION_GAP_SECONDS):
+    """
+    Compute per-channel watch time, per-video rewatch counts and session length in one pass.
+
+    Channels and videos are factorized into integer codes once, and every
+    per-group total is a bincount over those codes.
+
+    :param youtube_df: Complete watch history with channelTitle, id, title,
+        watch_date and duration columns.
+    :param session_gap: Maximum gap in seconds between watches in one session.
+    :return: Dictionary of per-channel arrays, per-video arrays and totals.
+    """
+    seconds = watch_seconds(youtube_df)
+    channel_codes, channel_names = pd.factorize(youtube_df["channelTitle"])
+    video_codes, video_ids = pd.factorize(youtube_df["id"])
+
+    channel_counts = np.bincount(channel_codes, minlength=len(channel_names))
+    channel_seconds = np.bincount(
+        channel_codes, weights=seconds, minlength=len(channel_names)
+    )
+    video_counts = np.bincount(video_codes, minlength=len(video_ids))
+
+    # Codes are assigned in order of first appearance, so the first row of each
+    # video lines up with its code
+    first_rows = ~pd.Series(video_codes).duplicated().to_numpy()
+    video_titles = youtube_df["title"].to_numpy()[first_rows]
+
+    rewatches = np.maximum(video_counts - 1, 0)
+    sessions = detect_watch_sessions(
+        pd.to_datetime(youtube_df["watch_date"]).to_numpy()
+        if "watch_date" in youtube_df.columns
+        else np.empty(0, dtype=np.int64),
+        seconds,
+        session_gap,
+    )
+    # Only the summary is cached; per-session lengths can be recomputed on demand
+    sessions.pop("session_lengths")
+
+    return {
+        "channel_names": [str(name) for name in channel_names],
+        "channel_watch_counts": channel_counts.astype(np.int32),
+        "channel_watch_seconds": channel_seconds.astype(np.int64),
+        "video_ids": [str(video_id) for video_id in video_ids],
+        "video_titles": [str(title) for title in video_titles],
+        "video_watch_counts": video_counts.astype(np.int32),
+        "total_watch_seconds": int(seconds.sum()),
+        "rewatched_video_count": int(np.count_nonzero(rewatches)),
+        "total_rewatches": int(rewatches.sum()),
+        "session_count": sessions["session_count"],
+        "average_session_seconds": sessions["average_session_seconds"],
+        "sessions": sessions,
+    }
+
+
+def merge_watch_metrics(existing, new, session_gap=SESSION_GAP_SECONDS):
+    """
+    Fold metrics computed over newly ingested watches into an existing snapshot.
+
+    Per-channel and per-video totals are added by aligning the new codes onto
+    the existing ones, so the cost scales with the number of channels and
+    videos rather than the number of watch events.
+    """
+    if not existing:
+        return new
+    if not new:
+        return existing
+
+    channel_names, channel_counts, channel_seconds = _merge_code_totals(
+        existing["channel_names"],
+        new["channel_names"],
+        (existing["channel_watch_counts"], new["channel_watch_counts"]),
+        (existing["channel_watch_seconds"], new["channel_watch_seconds"]),
+    )
+    video_ids, video_counts = _merge_code_totals(
+        existing["video_ids"],
+        new["video_ids"],
+        (existing["video_watch_counts"], new["video_watch_counts"]),
+    )
+    unseen_videos = pd.Index(existing["video_ids"]).get_indexer(new["video_ids"]) == -1
+    video_titles = existing["video_titles"] + [
+        title for title, unseen in zip(new["video_titles"], unseen_videos) if unseen
+    ]
+
+    rewatches = np.maximum(video_counts - 1, 0)
+    sessions = merge_watch_sessions(
+        existing.get("sessions"), new.get("sessions"), session_gap
+    )
+
+    return {
+        "channel_names": channel_names,
+        "channel_watch_counts": channel_counts.astype(np.int32),
+        "channel_watch_seconds": channel_seconds.astype(np.int64),
+        "video_ids": video_ids,
+        "video_titles": video_titles,
+        "video_watch_counts": video_counts.astype(np.int32),
+        "total_watch_seconds": existing["total_watch_seconds"]
+        + new["total_watch_seconds"],
+        "rewatched_video_count": int(np.count_nonzero(rewatches)),
+        "total_rewatches": int(rewatches.sum()),
+        "session_count": sessions.get("session_count", 0),
+        "average_session_seconds": sessions.get("average_session_seconds", 0.0),
+        "sessions": sessions,
+    }
+
+
+def _merge_code_totals(existing_keys, new_keys, *totals):
+    """Append unseen keys and add per-key totals of the new batch onto the existing ones."""
+    positions = pd.Index(existing_keys).get_indexer(new_keys)
+    unseen = positions == -1
+    positions[unseen] = len(existing_keys) + np.arange(np.count_nonzero(unseen))
+    keys = list(existing_keys) + [
+        key for key, is_unseen in zip(new_keys, unseen) if is_unseen
+    ]
+
+    merged = []
+    for existing_totals, new_totals in totals:
+        combined = np.zeros(len(keys), dtype=np.int64)
+        combined[: len(existing_keys)] = existing_totals
+        # Keys are unique within a batch, so plain fancy-index addition is safe
+        combined[positions] += new_totals
+        merged.append(combined)
+    return (keys, *merged)
+
+
+def summarize_watch_metrics(watch_metrics, context, top_n=10):
+    """Function to add the top per-channel and per-video metrics to the analytics context."""
+    if not watch_metrics:
+        return context
+
+    channel_seconds = watch_metrics["channel_watch_seconds"]
+    top_channels = np.argsort(-channel_seconds, kind="stable")[:top_n]
+    context["top_channels_by_watch_time"] = [
+        (watch_metrics["channel_names"][code], int(channel_seconds[code]))
+        for code in top_channels
+    ]
+
+    video_counts = watch_metrics["video_watch_counts"]
+    top_videos = np.argsort(-video_counts, kind="stable")[:top_n]
+    context["most_rewatched_videos"] = [
+        (watch_metrics["video_titles"][code], int(video_counts[code]) - 1)
+        for code in top_videos
+        if video_counts[code] > 1
+    ]
+
+    context["rewatched_video_count"] = watch_metrics["rewatched_video_count"]
+    context["total_rewatches"] = watch_metrics["total_rewatches"]
+    context["session_count"] = watch_metrics["session_count"]
+    context["average_session_mins"] = round(
+        watch_metrics["average_session_seconds"] / 60, 1
+    )
+
+    sessions = watch_metrics.get("sessions")
+    if sessions:
+        longest_start = sessions["longest_session_start"]
+        context["watch_sessions"] = {
+            "session_count": sessions["session_count"],
+            "longest_session_mins": round(sessions["longest_session_seconds"] / 60, 1),
+            "longest_session_videos": sessions["longest_session_videos"],
+            "longest_session_start": datetime.fromtimestamp(
+                longest_start, tz=timezone.utc
+            ).isoformat()
+            if longest_start is not None
+            else None,
+            "histogram": sessions["histogram"],
+        }
+    return context
+
+
+def build_watch_cube(youtube_df, channel_names):
+    """
+    Aggregate watches into time buckets by day, ISO week and month, crossed with channel.
+
+    Every resolution is built in the same vectorized pass and stored as
+    prefix sums over its buckets, which span every bucket from the first
+    watch to the last (weeks start on Monday, times are UTC). Totals over a
+    run of buckets are the difference of two entries, and per-bucket totals
+    are the differences of neighbouring entries. Per-channel totals are kept
+    sparsely: one entry per (channel, bucket) with at least one watch,
+    sorted by channel and then bucket, with cumulative sums over all
+    entries, so a channel's run of buckets is found by binary search.
+
+    Bucket edges are day numbers since 1970-01-01: the first day of every
+    bucket, then the day after the last one.
+
+    The cube also counts watches per hour of the week, for the heatmap.
+
+    :param youtube_df: Complete watch history with watch_date, channelTitle
+        and duration columns.
+    :param channel_names: Channel names whose positions are the channel codes,
+        as in compute_watch_metrics.
+    :return: Dictionary with one level per name in CUBE_RESOLUTIONS and an
+        "hour_of_week" array of 7 * 24 counts, Monday 00:00 first.
+    """
+    hours = (
+        pd.to_datetime(youtube_df["watch_date"])
+        .to_numpy()
+        .astype("datetime64[h]")
+        .astype(np.int64)
+    )
+    days = hours // 24
+    seconds = watch_seconds(youtube_df)
+    channel_codes = pd.Index(channel_names).get_indexer(youtube_df["channelTitle"])
+
+    # 1970-01-01 was a Thursday, so weeks are counted from Monday 1969-12-29
+    weeks = (days + 3) // 7
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+    cube = {
+        "day": _build_cube_level(days, _days_of_days, seconds, channel_codes),
+        "week": _build_cube_level(weeks, _days_of_weeks, seconds, channel_codes),
+        "month": _build_cube_level(months, _days_of_months, seconds, channel_codes),
+    }
+    weekdays = (days + 3) % 7
+    cube["hour_of_week"] = np.bincount(
+        weekdays * 24 + hours % 24, minlength=7 * 24
+    ).astype(np.int32)
+    return cube
+
+
+def _days_of_days(days):
+    return days
+
+
+def _days_of_weeks(weeks):
+    return weeks * 7 - 3
+
+
+def _days_of_months(months):
+    return months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+
+def _build_cube_level(bucket_numbers, first_days, seconds, channel_codes):
+    """
+    Prefix sums of one resolution, with buckets numbered consecutively.
+
+    :param first_days: Function mapping bucket numbers to their first day.
+    """
+    if len(bucket_numbers) == 0:
+        first, bucket_count = 0, 0
+    else:
+        first = int(bucket_numbers.min())
+        bucket_count = int(bucket_numbers.max()) - first + 1
+    offsets = bucket_numbers - first
+
+    bucket_counts = np.bincount(offsets, minlength=bucket_count)
+    bucket_seconds = np.bincount(offsets, weights=seconds, minlength=bucket_count)
+
+    known = channel_codes >= 0
+    keys = channel_codes[known].astype(np.int64) * bucket_count + offsets[known]
+    channel_keys, positions = np.unique(keys, return_inverse=True)
+    channel_counts = np.bincount(positions, minlength=len(channel_keys))
+    channel_seconds = np.bincount(
+        positions, weights=seconds[known], minlength=len(channel_keys)
+    )
+
+    return {
+        "bucket_edges": first_days(first + np.arange(bucket_count + 1)).astype(
+            np.int32
+        ),
+        "cumulative_counts": _prefix_sums(bucket_counts, np.int32),
+        "cumulative_seconds": _prefix_sums(bucket_seconds, np.int64),
+        "channel_keys": channel_keys.astype(np.int64),
+        "channel_cumulative_counts": _prefix_sums(channel_counts, np.int32),
+        "channel_cumulative_seconds": _prefix_sums(channel_seconds, np.int64),
+    }
+
+
+def summarize_date_range(cube, channel_names, first=None, last=None, top_n=10):
+    """
+    Totals and top channels of the watches between two days, both included.
+
+    Reads only the day level of the cube from build_watch_cube: the totals
+    take two lookups and the per-channel totals two binary searches per
+    channel, however many watches the range holds.
+
+    :param first: First day (datetime.date) of the range; None for the start.
+    :param last: Last day of the range; None for the end.
+    """
+    level = cube["day"]
+    start, stop = _bucket_range(level, first, last)
+    edges = level["bucket_edges"]
+
+    channel_counts, channel_seconds = _channel_totals(
+        level, len(channel_names), start, stop
+    )
+
+    if len(edges) > 1:
+        first = first or _day_to_date(edges[0])
+        last = last or _day_to_date(edges[-1] - 1)
+
+    return {
+        "from": first.isoformat() if first else None,
+        "to": last.isoformat() if last else None,
+        "total_vids": int(
+            level["cumulative_counts"][stop] - level["cumulative_counts"][start]
+        ),
+        "total_watch_seconds": int(
+            level["cumulative_seconds"][stop] - level["cumulative_seconds"][start]
+        ),
+        "total_unique_channels": int(np.count_nonzero(channel_counts)),
+        "top_channels": _top_totals(channel_names, channel_counts, top_n),
+        "top_channels_by_watch_time": _top_totals(
+            channel_names, channel_seconds, top_n
+        ),
+    }
+
+
+def channel_trends(
+    cube,
+    channel_names,
+    resolution="month",
+    first=None,
+    last=None,
+    channels=None,
+    top_n=5,
+):
+    """
+    Watches and watch time per bucket, overall and for a few channels.
+
+    The cost scales with the number of buckets in the range, however many
+    watches they hold. Buckets are included when they overlap the range.
+
+    :param resolution: One of CUBE_RESOLUTIONS.
+    :param channels: Channel names to include; None for the top_n channels
+        by watches in the range. Unknown names are skipped.
+    :raises ValueError: if the resolution is unknown.
+    """
+    if resolution not in CUBE_RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(CUBE_RESOLUTIONS)}.")
+    level = cube[resolution]
+    start, stop = _bucket_range(level, first, last)
+
+    if channels is None:
+        channel_counts, _ = _channel_totals(level, len(channel_names), start, stop)
+        codes = [
+            code
+            for code in np.argsort(-channel_counts, kind="stable")[:top_n]
+            if channel_counts[code] > 0
+        ]
+    else:
+        positions = pd.Index(channel_names).get_indexer(channels)
+        codes = [code for code in positions if code >= 0]
+
+    bucket_count = len(level["bucket_edges"]) - 1
+    keys = level["channel_keys"]
+    series = []
+    for code in codes:
+        lower, upper = np.searchsorted(
+            keys, code * bucket_count + np.array([start, stop])
+        )
+        buckets = keys[lower:upper] - code * bucket_count - start
+        counts = np.zeros(stop - start, dtype=np.int64)
+        watch_time = np.zeros(stop - start, dtype=np.int64)
+        counts[buckets] = np.diff(level["channel_cumulative_counts"][lower : upper + 1])
+        watch_time[buckets] = np.diff(
+            level["channel_cumulative_seconds"][lower : upper + 1]
+        )
+        series.append(
+            {
+                "channel": channel_names[code],
+                "watch_counts": counts.tolist(),
+                "watch_seconds": watch_time.tolist(),
+            }
+        )
+
+    return {
+        "resolution": resolution,
+        "buckets": [
+            _day_to_date(day).isoformat() for day in level["bucket_edges"][start:stop]
+        ],
+        "watch_counts": np.diff(level["cumulative_counts"][start : stop + 1]).tolist(),
+        "watch_seconds": np.diff(
+            level["cumulative_seconds"][start : stop + 1]
+        ).tolist(),
+        "channels": series,
+    }
+
+
+def _bucket_range(level, first, last):
+    """Positions [start, stop) of the buckets overlapping a range of days."""
+    edges = level["bucket_edges"]
+    bucket_count = len(edges) - 1
+    start = 0
+    if first is not None:
+        start = int(np.searchsorted(edges, _day_number(first), "right")) - 1
+    stop = bucket_count
+    if last is not None:
+        stop = int(np.searchsorted(edges, _day_number(last), "right"))
+    start = min(max(start, 0), bucket_count)
+    stop = min(max(stop, start), bucket_count)
+    return start, stop
+
+
+def _channel_totals(level, channel_count, start, stop):
+    bucket_count = len(level["bucket_edges"]) - 1
+    channel_bases = np.arange(channel_count, dtype=np.int64) * bucket_count
+    keys = level["channel_keys"]
+    lower = np.searchsorted(keys, channel_bases + start)
+    upper = np.searchsorted(keys, channel_bases + stop)
+    counts = (
+        level["channel_cumulative_counts"][upper]
+        - level["channel_cumulative_counts"][lower]
+    )
+    seconds = (
+        level["channel_cumulative_seconds"][upper]
+        - level["channel_cumulative_seconds"][lower]
+    )
+    return counts, seconds
+
+
+def _prefix_sums(values, dtype):
+    sums = np.zeros(len(values) + 1, dtype=dtype)
+    sums[1:] = np.cumsum(values)
+    return sums
+
+
+def _day_number(day):
+    return (day - _EPOCH).days
+
+
+def _day_to_date(day_number):
+    return _EPOCH + timedelta(days=int(day_number))
+
+
+def _top_totals(names, totals, top_n):
+    top = np.argsort(-totals, kind="stable")[:top_n]
+    return [(names[code], int(totals[code])) for code in top if totals[code] > 0]
+
+
+def detect_watch_sessions(watch_dates, durations=None, session_gap=SESSION_GAP_SECONDS):
+    """
+    Group watch events into binge sessions by segmenting on gaps between watches.
+
+    :param watch_dates: Watch start times (datetime-like or int64 epoch seconds).
+    :param durations: Optional per-watch durations in seconds, aligned with watch_dates.
+    :param session_gap: Gap in seconds that ends a session.
+    :return: Dictionary with session count, longest session, average length,
+        a session-length histogram and per-session lengths in seconds.
+    """
+    starts = np.asarray(watch_dates)
+    if starts.dtype.kind == "M":
+        starts = starts.astype("datetime64[s]").astype(np.int64)
+    starts = starts.astype(np.int64, copy=False)
+    if durations is None:
+        durations = np.zeros(len(starts), dtype=np.int64)
+
+    if len(starts) == 0:
+        return {
+            "session_count": 0,
+            "longest_session_seconds": 0,
+            "longest_session_videos": 0,
+            "longest_session_start": None,
+            "average_session_seconds": 0.0,
+            "total_session_seconds": 0,
+            "histogram": _session_histogram(np.empty(0, dtype=np.int64)),
+            "session_lengths": np.empty(0, dtype=np.int64),
+        }
+
+    order = np.argsort(starts, kind="stable")
+    starts = starts[order]
+    ends = starts + np.asarray(durations, dtype=np.int64)[order]
+
+    # Each gap above the limit opens a new session; the running sum is the session ID
+    session_ids = np.concatenate(([0], np.cumsum(np.diff(starts) > session_gap)))
+    session_starts = np.flatnonzero(np.diff(session_ids, prepend=-1))
+
+    session_ends = np.maximum.reduceat(ends, session_starts)
+    lengths = session_ends - starts[session_starts]
+    videos = np.diff(np.append(session_starts, len(starts)))
+    longest = int(np.argmax(lengths))
+
+    return {
+        "session_count": int(len(session_starts)),
+        "longest_session_seconds": int(lengths[longest]),
+        "longest_session_videos": int(videos[longest]),
+        "longest_session_start": int(starts[session_starts[longest]]),
+        "average_session_seconds": float(lengths.mean()),
+        "total_session_seconds": int(lengths.sum()),
+        "histogram": _session_histogram(lengths),
+        # Boundary sessions let a later batch of watches be merged in without
+        # re-segmenting the whole history
+        "first_session": _session_bounds(starts[0], session_ends[0], videos[0]),
+        "last_session": _session_bounds(
+            starts[session_starts[-1]], session_ends[-1], videos[-1]
+        ),
+        "last_watch_start": int(starts[-1]),
+        "session_lengths": lengths.astype(np.int64),
+    }
+
+
+def merge_watch_sessions(earlier, later, session_gap=SESSION_GAP_SECONDS):
+    """
+    Combine session summaries of two consecutive watch batches.
+
+    The later batch must start after the earlier one ends, as it does for an
+    incremental re-upload. Only the sessions at the seam can change, so the
+    merge is O(1) in the number of watches.
+    """
+    if not earlier or not earlier["session_count"]:
+        return dict(later)
+    if not later or not later["session_count"]:
+        return dict(earlier)
+
+    merged = {
+        "session_count": earlier["session_count"] + later["session_count"],
+        "total_session_seconds": earlier["total_session_seconds"]
+        + later["total_session_seconds"],
+        "histogram": {
+            "labels": earlier["histogram"]["labels"],
+            "counts": [
+                first + second
+                for first, second in zip(
+                    earlier["histogram"]["counts"], later["histogram"]["counts"]
+                )
+            ],
+        },
+        "first_session": earlier["first_session"],
+        "last_session": later["last_session"],
+        "last_watch_start": later["last_watch_start"],
+    }
+    candidates = [
+        (
+            earlier["longest_session_seconds"],
+            earlier["longest_session_videos"],
+            earlier["longest_session_start"],
+        ),
+        (
+            later["longest_session_seconds"],
+            later["longest_session_videos"],
+            later["longest_session_start"],
+        ),
+    ]
+
+    seam_gap = later["first_session"]["start"] - earlier["last_watch_start"]
+    if seam_gap <= session_gap:
+        # The last earlier session continues into the first later one
+        before = earlier["last_session"]
+        after = later["first_session"]
+        joined = _session_bounds(
+            before["start"],
+            max(before["end"], after["end"]),
+            before["videos"] + after["videos"],
+        )
+        joined_length = joined["end"] - joined["start"]
+
+        merged["session_count"] -= 1
+        merged["total_session_seconds"] += (
+            joined_length
+            - (before["end"] - before["start"])
+            - (after["end"] - after["start"])
+        )
+        counts = merged["histogram"]["counts"]
+        for bucket_length, change in (
+            (before["end"] - before["start"], -1),
+            (after["end"] - after["start"], -1),
+            (joined_length, 1),
+        ):
+            counts[_session_bucket(bucket_length)] += change
+
+        if earlier["session_count"] == 1:
+            merged["first_session"] = joined
+        if later["session_count"] == 1:
+            merged["last_session"] = joined
+        candidates.append((joined_length, joined["videos"], joined["start"]))
+
+    longest = max(candidates, key=lambda candidate: candidate[0])
+    merged["longest_session_seconds"] = int(longest[0])
+    merged["longest_session_videos"] = int(longest[1])
+    merged["longest_session_start"] = longest[2]
+    merged["average_session_seconds"] = (
+        merged["total_session_seconds"] / merged["session_count"]
+    )
+    return merged
+
+
+def _session_bounds(start, end, videos):
+    return {"start": int(start), "end": int(end), "videos": int(videos)}
+
+
+def _session_bucket(session_length):
+    return (
+        int(np.searchsorted(SESSION_HISTOGRAM_EDGES, session_length, side="right")) - 1
+    )
+
+
+def _session_histogram(session_lengths):
+    counts = np.bincount(
+        np.searchsorted(SESSION_HISTOGRAM_EDGES, session_lengths, side="right") - 1,
+        minlength=len(SESSION_HISTOGRAM_LABELS),
+    )
+    return {
+        "labels": list(SESSION_HISTOGRAM_LABELS),
+        "counts": [int(count) for count in counts],
+    }
+
+
 def unique_channels(youtube_df):
     # Getting all unique channelTitles from the filtered DataFrame
     unique_channel_titles = youtube_df["channelTitle"].unique()
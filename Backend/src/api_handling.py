@@ -8,71 +8,374 @@ Author: Zachary Cervenka
 
 import asyncio
 import httpx
-import pandas as pd
+import logging
 import os
+import uuid
+import weakref
 from dotenv import load_dotenv
 
+from . import metadata_cache, quota
+from .metrics import YOUTUBE_API_REQUESTS
+from .quota import QuotaExceededError
+from .lazy_imports import lazy_import
 
-async def fetch_video_data(youtube_api_key, video_id_string):
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+# Point at a local stub (benchmarks/youtube_api_stub.py) for offline load tests
+YOUTUBE_API_BASE_URL = os.getenv(
+    "YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3"
+).rstrip("/")
+# Retries for a chunk request the API answered with 429 Too Many Requests
+YOUTUBE_API_MAX_RETRIES = int(os.getenv("YOUTUBE_API_MAX_RETRIES", 3))
+# Longest a 429 retry waits, whatever Retry-After asks for; the pipeline and
+# its job lease are stalled meanwhile
+YOUTUBE_API_MAX_RETRY_AFTER_SECONDS = float(
+    os.getenv("YOUTUBE_API_MAX_RETRY_AFTER_SECONDS", 30)
+)
+# Chunk requests a single session keeps in flight; the quota scheduler
+# decides when each of them may actually hit the API
+YOUTUBE_API_CONCURRENCY = int(os.getenv("YOUTUBE_API_CONCURRENCY", 8))
+# How often a session waiting on another process's fetch checks the cache
+COALESCE_POLL_SECONDS = 0.25
+
+# Video IDs each event loop is fetching right now, so concurrent sessions
+# can await the same lookup instead of requesting it again
+_in_flight_by_loop = weakref.WeakKeyDictionary()
+# Result handed to waiters when the fetch they waited on failed
+_RETRY = object()
+
+
+async def fetch_video_data(
+    youtube_api_key, video_id_string, client=None, session_id=None, scheduler=None
+):
     """
     Fetch video data from YouTube API.
 
     :param youtube_api_key: YouTube API key.
     :param video_id_string: Comma-separated string of video IDs.
+    :param client: Optional shared httpx.AsyncClient to send the request with.
+    :param session_id: Session the request is made for (fairness key).
+    :param scheduler: Optional quota.QuotaScheduler that retries after a 429
+        wait on, like the first request did.
     :return: List of dictionaries containing video information.
     """
-    async with httpx.AsyncClient() as client:
+    if client is None:
+        async with httpx.AsyncClient() as client:
+            return await fetch_video_data(
+                youtube_api_key, video_id_string, client, session_id, scheduler
+            )
+
+    for attempt in range(YOUTUBE_API_MAX_RETRIES + 1):
+        if attempt and scheduler is not None:
+            await asyncio.to_thread(scheduler.register, session_id, 1)
+            await scheduler.acquire(session_id)
         response = await client.get(
-            f"https://www.googleapis.com/youtube/v3/videos?part=snippet,contentDetails&id={video_id_string}&key={youtube_api_key}"
+            f"{YOUTUBE_API_BASE_URL}/videos",
+            params={
+                "part": "snippet,contentDetails",
+                "id": video_id_string,
+                "key": youtube_api_key,
+            },
         )
-        response.raise_for_status()
-        data = response.json()["items"]
-
-        extracted_data = [
-            {
-                "id": item.get("id", ""),
-                "title": item.get("snippet", {}).get("title", ""),
-                "channelTitle": item.get("snippet", {}).get("channelTitle", ""),
-                "duration": item.get("contentDetails", {}).get("duration", ""),
-            }
-            for item in data
-        ]
-        print(extracted_data)
+        YOUTUBE_API_REQUESTS.inc(status=response.status_code)
+        if response.status_code != 429 or attempt == YOUTUBE_API_MAX_RETRIES:
+            break
+        await asyncio.sleep(_retry_delay(response, attempt))
+    if response.status_code == 403 and "quotaExceeded" in response.text:
+        raise QuotaExceededError("YouTube API reported the daily quota as exceeded.")
+    response.raise_for_status()
+    data = response.json()["items"]
 
-        return extracted_data
+    extracted_data = [
+        {
+            "id": item.get("id", ""),
+            "title": item.get("snippet", {}).get("title", ""),
+            "channelTitle": item.get("snippet", {}).get("channelTitle", ""),
+            "duration": item.get("contentDetails", {}).get("duration", ""),
+        }
+        for item in data
+    ]
+
+    return extracted_data
+
+
+def _retry_delay(response, attempt):
+    # Honour Retry-After when the API sends one, otherwise back off exponentially
+    try:
+        delay = float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        delay = 0.5 * 2**attempt
+    return min(delay, YOUTUBE_API_MAX_RETRY_AFTER_SECONDS)
 
 
-async def process_vid_info_df_chunk(youtube_api, chunk):
+async def process_vid_info_df_chunk(
+    youtube_api, chunk, client=None, session_id=None, scheduler=None
+):
     """
     Process a chunk of video information.
 
     :param youtube_api: YouTube API key.
     :param chunk: List of video IDs.
+    :param client: Optional shared httpx.AsyncClient.
+    :param session_id: Session the request is made for (fairness key).
+    :param scheduler: Optional quota.QuotaScheduler to pace retries with.
     :return: List of dictionaries containing video information.
     """
     video_id_string = ",".join(chunk)
-    return await fetch_video_data(youtube_api, video_id_string)
+    return await fetch_video_data(
+        youtube_api, video_id_string, client, session_id, scheduler
+    )
 
 
-async def process_vid_info_df(vid_id_chunks, youtube_api):
+async def process_vid_info_df(
+    vid_id_chunks, youtube_api, session_id=None, scheduler=None, client=None
+):
     """
     Process video information DataFrame.
 
+    Chunks are fetched by a bounded set of workers. With a quota scheduler,
+    every request first waits for this session's turn in the global
+    round-robin and for a free slot in the shared rate limit.
+
     :param vid_id_chunks: List of lists, each containing video IDs.
     :param youtube_api: YouTube API key.
+    :param session_id: Session the requests are made for (fairness key).
+    :param scheduler: Optional quota.QuotaScheduler to pace requests with.
+    :param client: Optional shared httpx.AsyncClient.
     :return: DataFrame containing video information.
     """
-    tasks = [process_vid_info_df_chunk(youtube_api, chunk) for chunk in vid_id_chunks]
-    video_data_chunks = await asyncio.gather(*tasks)
-
-    # Flatten the list of lists
-    video_data = [item for sublist in video_data_chunks for item in sublist]
+    video_data = await _fetch_chunks(
+        vid_id_chunks, youtube_api, session_id, scheduler, client
+    )
 
     vid_info_df = pd.DataFrame(video_data)
 
     return vid_info_df
 
 
+async def _fetch_chunks(vid_id_chunks, youtube_api, session_id, scheduler, client):
+    if client is None:
+        async with httpx.AsyncClient() as client:
+            return await _fetch_chunks(
+                vid_id_chunks, youtube_api, session_id, scheduler, client
+            )
+
+    chunks = list(vid_id_chunks)
+    session_id = session_id or f"anonymous-{uuid.uuid4().hex}"
+    video_data_chunks = [[] for _ in chunks]
+    next_chunk = iter(range(len(chunks)))
+    pending = len(chunks)
+    budget_exhausted = None
+
+    async def fetch_chunks():
+        nonlocal pending, budget_exhausted
+        for position in next_chunk:
+            if scheduler is not None:
+                try:
+                    await scheduler.acquire(session_id)
+                except QuotaExceededError as exc:
+                    # Requests already granted have been paid for; let them finish
+                    budget_exhausted = exc
+                    return
+            pending -= 1
+            try:
+                video_data_chunks[position] = await process_vid_info_df_chunk(
+                    youtube_api, chunks[position], client, session_id, scheduler
+                )
+            except QuotaExceededError:
+                if scheduler is not None:
+                    await asyncio.to_thread(scheduler.mark_exhausted)
+                raise
+
+    if scheduler is not None and chunks:
+        await asyncio.to_thread(scheduler.register, session_id, len(chunks))
+    workers = [
+        asyncio.create_task(fetch_chunks())
+        for _ in range(min(YOUTUBE_API_CONCURRENCY, len(chunks)))
+    ]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if scheduler is not None and pending > 0:
+            # Give back the turns of chunks that will never be requested
+            await asyncio.to_thread(scheduler.release, session_id, pending)
+    if budget_exhausted is not None:
+        raise budget_exhausted
+
+    # Flatten the list of lists
+    return [item for sublist in video_data_chunks for item in sublist]
+
+
+async def fetch_video_metadata(
+    vid_ids, youtube_api, session_id=None, scheduler=None, client=None, cache=None
+):
+    """
+    Look up metadata records for video IDs, coalescing duplicate lookups.
+
+    IDs already in the shared cache, or known to belong to deleted or private
+    videos, are not requested. IDs that another session is fetching, in this
+    process or (through the cache's fetch markers) in another one, are
+    awaited instead of requested again. The remaining IDs are claimed and
+    fetched in full 50-ID batches.
+
+    :param vid_ids: Video IDs to look up.
+    :param youtube_api: YouTube API key.
+    :param session_id: Session the requests are made for (fairness key).
+    :param scheduler: Optional quota.QuotaScheduler to pace requests with.
+    :param client: Optional shared httpx.AsyncClient.
+    :param cache: Optional metadata_cache.MetadataCache shared across processes.
+    :return: Tuple of (dictionary of video ID to metadata record, number of
+        IDs skipped as known to be unavailable). IDs the API returned nothing
+        for are absent from the dictionary.
+    """
+    remaining = list(dict.fromkeys(map(str, vid_ids)))
+    records = {}
+    skipped = 0
+    loop = asyncio.get_running_loop()
+    in_flight = _in_flight_by_loop.setdefault(loop, {})
+
+    if cache is not None:
+        cached, missing = await asyncio.to_thread(cache.lookup, remaining)
+        records.update(cached)
+        known = set(cached).union(missing)
+        remaining = [vid_id for vid_id in remaining if vid_id not in known]
+        skipped = len(missing)
+        if missing:
+            logger.info("Skipped %d video IDs known to be unavailable", skipped)
+
+    while remaining:
+        local = {
+            vid_id: in_flight[vid_id] for vid_id in remaining if vid_id in in_flight
+        }
+        unclaimed = [vid_id for vid_id in remaining if vid_id not in local]
+        if cache is not None:
+            owned, elsewhere = await asyncio.to_thread(cache.claim, unclaimed)
+            # Claimed meanwhile by another session of this process
+            local.update(
+                (vid_id, in_flight[vid_id])
+                for vid_id in elsewhere
+                if vid_id in in_flight
+            )
+            elsewhere = [vid_id for vid_id in elsewhere if vid_id not in local]
+        else:
+            owned, elsewhere = unclaimed, []
+
+        # Registered before yielding so concurrent sessions see them at once
+        futures = {vid_id: loop.create_future() for vid_id in owned}
+        in_flight.update(futures)
+
+        tasks = [
+            asyncio.create_task(
+                _fetch_owned(
+                    futures,
+                    in_flight,
+                    youtube_api,
+                    session_id,
+                    scheduler,
+                    client,
+                    cache,
+                )
+            ),
+            asyncio.create_task(_await_local(local)),
+            asyncio.create_task(_await_remote(elsewhere, cache)),
+        ]
+        try:
+            (
+                fetched,
+                (local_found, local_retry),
+                (remote_found, remote_retry),
+            ) = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        records.update(fetched)
+        records.update(local_found)
+        records.update(remote_found)
+        # Lookups whose owner failed or vanished are retried by this session
+        remaining = local_retry + remote_retry
+        if remaining and cache is not None:
+            cached, _ = await asyncio.to_thread(cache.lookup, remaining)
+            records.update(cached)
+            remaining = [vid_id for vid_id in remaining if vid_id not in cached]
+
+    return records, skipped
+
+
+async def _fetch_owned(
+    futures, in_flight, youtube_api, session_id, scheduler, client, cache
+):
+    if not futures:
+        return {}
+
+    vid_ids = list(futures)
+    heartbeat = asyncio.create_task(_keep_claims(cache)) if cache else None
+    try:
+        video_data = await _fetch_chunks(
+            get_vid_id_chunks(50, vid_ids), youtube_api, session_id, scheduler, client
+        )
+        fetched = {record["id"]: record for record in video_data}
+        if cache is not None:
+            await asyncio.to_thread(cache.store, fetched.values())
+            await asyncio.to_thread(
+                cache.store_missing,
+                [vid_id for vid_id in vid_ids if vid_id not in fetched],
+            )
+        for vid_id, future in futures.items():
+            future.set_result(fetched.get(vid_id))
+        return fetched
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
+        for vid_id, future in futures.items():
+            if in_flight.get(vid_id) is future:
+                del in_flight[vid_id]
+            if not future.done():
+                future.set_result(_RETRY)
+        if cache is not None:
+            await asyncio.to_thread(cache.release, vid_ids)
+
+
+async def _await_local(futures):
+    found, retry = {}, []
+    for vid_id, future in futures.items():
+        # Shielded so a cancelled waiter does not cancel the owner's future
+        record = await asyncio.shield(future)
+        if record is _RETRY:
+            retry.append(vid_id)
+        elif record is not None:
+            found[vid_id] = record
+    return found, retry
+
+
+async def _await_remote(vid_ids, cache):
+    found, retry = {}, []
+    pending = list(vid_ids)
+    while pending:
+        await asyncio.sleep(COALESCE_POLL_SECONDS)
+        statuses = await asyncio.to_thread(cache.status, pending)
+        ready = [vid_id for vid_id, code in zip(pending, statuses) if code == 1]
+        retry += [vid_id for vid_id, code in zip(pending, statuses) if code == -1]
+        pending = [vid_id for vid_id, code in zip(pending, statuses) if code == 0]
+
+        cached, missing = await asyncio.to_thread(cache.lookup, ready)
+        found.update(cached)
+        known = set(cached).union(missing)
+        retry += [vid_id for vid_id in ready if vid_id not in known]
+    return found, retry
+
+
+async def _keep_claims(cache):
+    while True:
+        await asyncio.sleep(metadata_cache.OWNER_HEARTBEAT_TTL / 3)
+        await asyncio.to_thread(cache.heartbeat)
+
+
 def get_vid_id_chunks(chunk_size, vid_ids):
     """Function to split a list of unique video IDs into chunks of size chunk"""
     unique_vid_ids = list(set(vid_ids))
@@ -83,7 +386,17 @@ def get_vid_id_chunks(chunk_size, vid_ids):
     ]
 
 
-async def request_data(videos):
+async def request_data(
+    videos, session_id=None, scheduler=None, client=None, cache=None
+):
+    """
+    Look up metadata for a list of videos, pacing requests through the
+    global quota scheduler and sharing results through the metadata cache.
+
+    :return: Tuple of (metadata DataFrame, number of video IDs skipped as
+        known to be unavailable).
+    :raises QuotaExceededError: if the daily API quota runs out.
+    """
     # Load environment variables from .env file
     load_dotenv()
 
@@ -92,9 +405,18 @@ async def request_data(videos):
 
     vid_ids = [video.id for video in videos]
 
-    vid_info_df = await process_vid_info_df(
-        get_vid_id_chunks(50, vid_ids),
+    records, skipped = await fetch_video_metadata(
+        vid_ids,
         youtube_api_key,
+        session_id=session_id,
+        scheduler=scheduler or quota.get_quota_scheduler(),
+        client=client,
+        cache=cache or metadata_cache.get_metadata_cache(),
     )
 
-    return vid_info_df
+    # Keeps its columns when every ID was skipped or missing
+    vid_info_df = pd.DataFrame(
+        list(records.values()), columns=["id", "title", "channelTitle", "duration"]
+    )
+
+    return vid_info_df, skipped
@@ -1,22 +1,41 @@
+import asyncio
 import json
 import logging
-from typing import Optional
-
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, UploadFile
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError
 
-from . import data_processing, models
+from . import analytics, data_processing, ingestion, quota, search_index, video_index
+from .admission import PIPELINE_RETRY_AFTER_SECONDS
 from .constants import SESSION_COOKIE_NAME
 from .data_store import DataStore, DataStoreState
+from .redis_utils import StaleGenerationError, get_queue_position
 from .session_pipeline import (
+    apply_upload,
+    attach_cached_result,
     delete_store,
     ensure_datastore,
     generate_analytics_context,
     load_store,
+    load_watch_cube,
     new_session_id,
-    process_data_pipeline,
+    pipeline_queue_full,
+    release_result,
     save_store,
+    schedule_pipeline,
+    start_generation,
+    supports_incremental,
 )
 
 logger = logging.getLogger(__name__)
@@ -25,12 +44,33 @@ router = APIRouter(prefix="/api", tags=["api"])
 
 @router.post("/load-data")
 async def api_load_data(
-    request: Request, file_input: UploadFile, background_tasks: BackgroundTasks
+    request: Request,
+    file_input: UploadFile,
+    background_tasks: BackgroundTasks,
+    incremental: bool = Form(False),
 ):
     session_id = request.cookies.get(SESSION_COOKIE_NAME) or new_session_id()
 
+    if await pipeline_queue_full():
+        response = _json_with_cookie(
+            request,
+            session_id,
+            {
+                "status": "error",
+                "error": "Too many uploads are being processed right now. "
+                "Please try again shortly.",
+            },
+            status_code=429,
+        )
+        response.headers["Retry-After"] = str(PIPELINE_RETRY_AFTER_SECONDS)
+        return response
+
     existing_store = await load_store(session_id)
-    if existing_store:
+    incremental = incremental and supports_incremental(existing_store)
+    # Supersede any pipeline still running for an earlier upload
+    generation = await start_generation(session_id)
+    await release_result(session_id, existing_store)
+    if existing_store and not incremental:
         try:
             await delete_store(session_id)
         except Exception as exc:  # pragma: no cover - defensive logging
@@ -38,7 +78,8 @@ async def api_load_data(
                 "Failed to delete existing API session store %s: %s", session_id, exc
             )
 
-    data_store = DataStore()
+    data_store = existing_store if incremental else DataStore()
+    data_store.generation = generation
     data_store.error_message = ""
     if hasattr(data_store, "state_queue"):
         data_store.state_queue.clear()
@@ -48,20 +89,23 @@ async def api_load_data(
         if not file_input:
             raise ValueError("No file provided.")
 
-        raw = await file_input.read()
+        raw, upload_hash = await ingestion.read_upload(file_input)
         if not raw:
             raise ValueError("Uploaded file is empty.")
-        decoded = raw.decode("utf-8")
-        json_data = json.loads(decoded)
-
-        watched_items = [models.WatchedItem.model_validate(item) for item in json_data]
-        (
-            data_store.filtered_json_data,
-            data_store.removed_video_count,
-        ) = data_processing.filter_data(watched_items)
+        cached = not incremental and await attach_cached_result(
+            session_id, data_store, upload_hash
+        )
+        if not cached:
+            parsed = await ingestion.parse_upload_async(
+                raw, data_store.high_water_mark if incremental else None
+            )
+            has_new_entries = apply_upload(
+                data_store, parsed, parsed.history_bytes, upload_hash
+            )
 
         await save_store(session_id, data_store)
-        background_tasks.add_task(process_data_pipeline, session_id)
+        if not cached and has_new_entries:
+            await schedule_pipeline(session_id, background_tasks)
 
         return _json_with_cookie(
             request,
@@ -69,7 +113,10 @@ async def api_load_data(
             {
                 "status": "ok",
                 "sessionId": session_id,
-                "state": DataStoreState.REQUESTING_DATA.value,
+                "state": data_store.current_state().value,
+                "incremental": incremental,
+                "cached": cached,
+                "newEntryCount": len(data_store.filtered_json_data),
                 "removedVideoCount": data_store.removed_video_count,
             },
         )
@@ -89,6 +136,9 @@ async def api_load_data(
             {"status": "error", "error": error_message},
             status_code=400,
         )
+    except StaleGenerationError:
+        # A newer upload owns the session; answered with 409 by the handler
+        raise
     except Exception as exc:  # pragma: no cover - defensive logging
         error_message = "An unexpected error occurred while loading data."
         logger.exception("Unexpected API error in load_data: %s", exc)
@@ -120,6 +170,8 @@ async def api_status(request: Request, session_id: Optional[str] = None):
         "sessionId": resolved_session,
         "state": current_state.value,
         "removedVideoCount": store.removed_video_count,
+        "missingVideoCount": store.missing_video_count,
+        "skippedMissingCount": store.skipped_missing_count,
         "hasFilteredData": bool(store.filtered_json_data),
         "error": store.error_message or None,
     }
@@ -127,16 +179,25 @@ async def api_status(request: Request, session_id: Optional[str] = None):
     if store.error_message:
         return JSONResponse(payload, status_code=400)
 
+    if current_state == DataStoreState.QUEUED:
+        payload["queuePosition"] = await asyncio.to_thread(
+            get_queue_position, resolved_session
+        )
+
     if current_state == DataStoreState.COMPLETE:
-        store.process_next_state()
-        await save_store(resolved_session, store)
+        # COMPLETE stays queued so /api/analytics can still be fetched
         payload["ready"] = True
 
     return _json_with_cookie(request, resolved_session, payload)
 
 
 @router.get("/analytics")
-async def api_analytics(request: Request, session_id: Optional[str] = None):
+async def api_analytics(
+    request: Request,
+    session_id: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+):
     resolved_session = session_id or request.cookies.get(SESSION_COOKIE_NAME)
     if not resolved_session:
         raise HTTPException(status_code=400, detail="Session not found. Upload data first.")
@@ -145,6 +206,17 @@ async def api_analytics(request: Request, session_id: Optional[str] = None):
     if not store or store.current_state() != DataStoreState.COMPLETE:
         raise HTTPException(status_code=409, detail="Analytics are not ready yet.")
 
+    if date_from is not None or date_to is not None:
+        # Date ranges are answered from the watch cube, without charts
+        first, last = _parse_day_range(date_from, date_to)
+        cube, channel_names = await load_watch_cube(store)
+        summary = analytics.summarize_date_range(cube, channel_names, first, last)
+        return _json_with_cookie(
+            request,
+            resolved_session,
+            {"sessionId": resolved_session, "analytics": summary},
+        )
+
     context = await generate_analytics_context(resolved_session)
     return _json_with_cookie(
         request,
@@ -153,14 +225,68 @@ async def api_analytics(request: Request, session_id: Optional[str] = None):
     )
 
 
+@router.get("/analytics/trends")
+async def api_analytics_trends(
+    request: Request,
+    resolution: str = "month",
+    channel: Optional[List[str]] = Query(None),
+    top: int = Query(5, ge=1, le=50),
+    session_id: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+):
+    resolved_session = session_id or request.cookies.get(SESSION_COOKIE_NAME)
+    if not resolved_session:
+        raise HTTPException(status_code=400, detail="Session not found. Upload data first.")
+
+    if resolution not in analytics.CUBE_RESOLUTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"resolution must be one of {', '.join(analytics.CUBE_RESOLUTIONS)}.",
+        )
+    first, last = _parse_day_range(date_from, date_to)
+
+    store = await load_store(resolved_session)
+    if not store or store.current_state() != DataStoreState.COMPLETE:
+        raise HTTPException(status_code=409, detail="Analytics are not ready yet.")
+
+    cube, channel_names = await load_watch_cube(store)
+    trends = analytics.channel_trends(
+        cube,
+        channel_names,
+        resolution,
+        first,
+        last,
+        channel,
+        top,
+    )
+    return _json_with_cookie(
+        request,
+        resolved_session,
+        {"sessionId": resolved_session, "trends": trends},
+    )
+
+
 @router.get("/videos")
 async def api_videos(
-    request: Request, page: int = 1, session_id: Optional[str] = None
+    request: Request,
+    page: int = 1,
+    sort: str = "first_seen",
+    order: Optional[str] = None,
+    channel: Optional[str] = None,
+    session_id: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
 ):
     resolved_session = session_id or request.cookies.get(SESSION_COOKIE_NAME)
     if not resolved_session:
         raise HTTPException(status_code=400, detail="Session not found. Upload data first.")
 
+    if order not in (None, "asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'.")
+    first, last = _parse_day_range(date_from, date_to)
+    date_bounded = first is not None or last is not None
+
     store = await load_store(resolved_session)
     store = ensure_datastore(store)
 
@@ -171,22 +297,99 @@ async def api_videos(
             {"sessionId": resolved_session, "videos": [], "page": 1, "totalPages": 0},
         )
 
-    total_pages = max(store.num_of_pages, 1)
+    index = store.video_index
+    if index:
+        try:
+            rows, start, stop, reverse = video_index.select_rows(
+                index, sort, channel, None if order is None else order == "asc"
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    elif sort == "first_seen" and channel is None and order != "desc":
+        # Sessions processed before the index existed can still page in file order
+        rows = range(len(store.unique_vids))
+        start, stop, reverse = 0, len(rows), False
+    else:
+        raise HTTPException(
+            status_code=409, detail="Sorting is not available for this session."
+        )
+
+    if date_bounded:
+        # Only videos watched in the range; the history is cut by binary search
+        # when it is sorted by watch date
+        history_rows = data_processing.rows_between(
+            store.complete_data, first, last, store.watch_dates_sorted
+        )
+        rows, start, stop = video_index.restrict_rows(
+            rows,
+            start,
+            stop,
+            video_index.watched_rows(store.unique_vids, history_rows),
+        )
+
+    total_records = stop - start
+    total_pages = max((total_records + store.max_rows - 1) // store.max_rows, 1)
     current_page = max(1, min(page, total_pages))
     start_index = (current_page - 1) * store.max_rows
-    end_index = min(start_index + store.max_rows, len(store.unique_vids))
 
-    store.page_num = current_page
-    await save_store(resolved_session, store)
+    if sort == "first_seen" and channel is None and order is None and not date_bounded:
+        store.page_num = current_page
+        await save_store(resolved_session, store)
 
     items = [
+        _video_item(store, int(row), absolute_index + 1)
+        for absolute_index, row in enumerate(
+            video_index.page_rows(
+                rows, start, stop, reverse, start_index, store.max_rows
+            ),
+            start=start_index,
+        )
+    ]
+
+    return _json_with_cookie(
+        request,
+        resolved_session,
         {
-            "index": absolute_index + 1,
-            "title": video[0],
-            "channel": video[1],
-        }
-        for absolute_index, video in enumerate(
-            store.unique_vids[start_index:end_index], start=start_index
+            "sessionId": resolved_session,
+            "videos": items,
+            "page": current_page,
+            "totalPages": total_pages,
+            "pageSize": store.max_rows,
+            "totalRecords": total_records,
+            "sort": sort,
+            "channel": channel,
+            "from": first.isoformat() if first else None,
+            "to": last.isoformat() if last else None,
+        },
+    )
+
+
+@router.get("/videos/search")
+async def api_search_videos(
+    request: Request, q: str, page: int = 1, session_id: Optional[str] = None
+):
+    resolved_session = session_id or request.cookies.get(SESSION_COOKIE_NAME)
+    if not resolved_session:
+        raise HTTPException(status_code=400, detail="Session not found. Upload data first.")
+
+    store = await load_store(resolved_session)
+    store = ensure_datastore(store)
+
+    if store.unique_vids and not store.search_index:
+        raise HTTPException(
+            status_code=409, detail="Search is not available for this session."
+        )
+
+    matches = search_index.search(store.search_index, q)
+    total_records = len(matches)
+    total_pages = max((total_records + store.max_rows - 1) // store.max_rows, 1)
+    current_page = max(1, min(page, total_pages))
+    start_index = (current_page - 1) * store.max_rows
+
+    items = [
+        _video_item(store, int(row), absolute_index + 1)
+        for absolute_index, row in enumerate(
+            matches[start_index : start_index + store.max_rows], start=start_index
         )
     ]
 
@@ -195,15 +398,55 @@ async def api_videos(
         resolved_session,
         {
             "sessionId": resolved_session,
+            "query": q,
             "videos": items,
             "page": current_page,
             "totalPages": total_pages,
             "pageSize": store.max_rows,
-            "totalRecords": len(store.unique_vids),
+            "totalRecords": total_records,
         },
     )
 
 
+@router.get("/quota")
+async def api_quota():
+    """Shared YouTube API quota usage and the number of requests waiting on it."""
+    return await asyncio.to_thread(quota.get_quota_scheduler().usage)
+
+
+def _parse_day_range(
+    date_from: Optional[str], date_to: Optional[str]
+) -> Tuple[Optional[date], Optional[date]]:
+    first, last = _parse_day(date_from), _parse_day(date_to)
+    if first and last and first > last:
+        raise HTTPException(status_code=400, detail="from must not be after to.")
+    return first, last
+
+
+def _parse_day(value: Optional[str]) -> Optional[date]:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid date {value!r}; use YYYY-MM-DD."
+        )
+
+
+def _video_item(store: DataStore, row: int, index: int) -> dict:
+    title, channel = store.unique_vids[row]
+    item = {"index": index, "title": title, "channel": channel}
+    if store.video_index:
+        last_watched = int(store.video_index["last_watched"][row])
+        item["watchCount"] = int(store.video_index["watch_count"][row])
+        item["watchSeconds"] = int(store.video_index["watch_seconds"][row])
+        item["lastWatched"] = datetime.fromtimestamp(
+            last_watched, tz=timezone.utc
+        ).isoformat()
+    return item
+
+
 def _json_with_cookie(
     request: Request, session_id: str, payload: dict, status_code: int = 200
 ) -> JSONResponse:
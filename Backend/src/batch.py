@@ -0,0 +1,356 @@
+"""
+Batch Module
+
+This module runs the upload pipeline offline over a directory of Takeout
+watch-history exports, for research over many histories at once. Each
+export is parsed, filtered, merged with video metadata and summarized in a
+worker process. The merged rows are written per export as Parquet (or JSON
+lines) next to a JSON summary, and an aggregate summary covers the run.
+
+Metadata comes from a local file (JSON, JSON lines, CSV or Parquet with id,
+title, channelTitle and duration columns) or, without one, from the shared
+Redis metadata cache. No YouTube API requests are made, so videos without
+metadata are counted as missing. Run from the Backend directory:
+
+    python -m src.batch exports/ --out results/ --metadata videos.parquet --workers 8
+"""
+
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from . import analytics, data_processing, ingestion
+from .lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", os.cpu_count() or 1))
+METADATA_COLUMNS = ["id", "title", "channelTitle", "duration"]
+OUTPUT_FORMATS = ("parquet", "json")
+# Extracted watch histories and Takeout archives as downloaded
+EXPORT_SUFFIXES = (".json", ".html", ".zip", ".tgz", ".tar.gz")
+SUMMARY_NAME = "summary.json"
+# IDs per MGET when reading the shared metadata cache
+CACHE_LOOKUP_CHUNK = 1000
+AGGREGATE_TOP_CHANNELS = 20
+
+# Set in each worker by _init_worker, indexed by video ID; None means the
+# Redis metadata cache
+_metadata = None
+
+
+class ExportResult(NamedTuple):
+    path: str
+    outputs: List[str]
+    entries: int  # Watch history entries in the export
+    rows: int  # Entries left after filtering and merging with metadata
+    seconds: float
+    summary: Optional[dict]
+    channel_watch_seconds: Optional[Dict[str, int]]
+    error: Optional[str]
+
+
+def find_exports(input_dir: str, exclude: Optional[str] = None) -> List[str]:
+    """Exports and archives below input_dir, skipping anything under exclude."""
+    excluded = Path(exclude).resolve() if exclude else None
+    exports = []
+    for path in sorted(Path(input_dir).rglob("*")):
+        if not path.is_file() or not path.name.endswith(EXPORT_SUFFIXES):
+            continue
+        if excluded and path.resolve().is_relative_to(excluded):
+            continue
+        exports.append(str(path))
+    return exports
+
+
+def load_metadata(path: str):
+    """Read a local metadata file into a frame with one row per video ID."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".parquet":
+        frame = pd.read_parquet(path)
+    elif suffix == ".csv":
+        frame = pd.read_csv(path, dtype=str)
+    elif suffix in (".jsonl", ".ndjson"):
+        frame = pd.read_json(path, lines=True, dtype=False)
+    else:
+        frame = pd.read_json(path, dtype=False)
+    missing = [column for column in METADATA_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Metadata file is missing columns: {', '.join(missing)}")
+    return frame[METADATA_COLUMNS].drop_duplicates(subset="id", ignore_index=True)
+
+
+def process_export(
+    path: str, input_dir: str, out_dir: str, output_format: str
+) -> ExportResult:
+    """Run one export through the pipeline and write its results; never raises."""
+    started = time.perf_counter()
+    entries = rows = 0
+    try:
+        with open(path, "rb") as handle:
+            parsed = ingestion.parse_upload(handle.read())
+        entries = parsed.entry_count
+        videos = data_processing.json_to_youtube_videos(parsed.filtered_json_data)
+        if not videos:
+            raise ValueError("No videos available after filtering.")
+
+        complete_data = data_processing.merge_data(
+            videos, _lookup_metadata([video.id for video in videos])
+        )
+        rows = len(complete_data)
+        watch_metrics = analytics.compute_watch_metrics(complete_data)
+        summary = {
+            "total_vids": rows,
+            "total_unique_channels": analytics.unique_channels(complete_data),
+            "removed_video_count": parsed.removed_video_count,
+            "missing_video_count": len(videos) - rows,
+            "latest_watch_date": parsed.latest_watch_date,
+            "total_watch_seconds": watch_metrics["total_watch_seconds"],
+        }
+        summary = analytics.summarize_watch_metrics(watch_metrics, summary)
+
+        outputs = _write_results(
+            _output_base(path, input_dir, out_dir),
+            complete_data,
+            summary,
+            output_format,
+        )
+        channel_watch_seconds = dict(
+            zip(
+                watch_metrics["channel_names"],
+                watch_metrics["channel_watch_seconds"].tolist(),
+            )
+        )
+        return ExportResult(
+            path=path,
+            outputs=outputs,
+            entries=entries,
+            rows=rows,
+            seconds=time.perf_counter() - started,
+            summary=summary,
+            channel_watch_seconds=channel_watch_seconds,
+            error=None,
+        )
+    except Exception as exc:
+        # One malformed export should not stop a run over thousands
+        return ExportResult(
+            path=path,
+            outputs=[],
+            entries=entries,
+            rows=rows,
+            seconds=time.perf_counter() - started,
+            summary=None,
+            channel_watch_seconds=None,
+            error=f"{type(exc).__name__}: {exc}",
+        )
+
+
+def run_batch(
+    input_dir: str,
+    out_dir: str,
+    metadata_path: Optional[str] = None,
+    workers: int = BATCH_WORKERS,
+    output_format: str = "parquet",
+    progress=None,
+) -> dict:
+    """
+    Process every export below input_dir and write the aggregate summary.
+
+    :param input_dir: Directory searched recursively for exports (see
+        EXPORT_SUFFIXES).
+    :param out_dir: Directory the results are written to, mirroring input_dir.
+    :param metadata_path: Local metadata file; the Redis cache is used without one.
+    :param workers: Worker processes; 1 runs everything in this process.
+    :param output_format: "parquet" or "json" (JSON lines) for the merged rows.
+    :param progress: Optional callable taking (done, total, elapsed, rows).
+    :return: The aggregate summary that was written to out_dir.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}.")
+    exports = find_exports(input_dir, exclude=out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    results = []
+    rows = 0
+
+    def record(result):
+        nonlocal rows
+        results.append(result)
+        rows += result.entries
+        if progress:
+            progress(len(results), len(exports), time.perf_counter() - started, rows)
+
+    if workers <= 1:
+        _init_worker(metadata_path)
+        for path in exports:
+            record(process_export(path, input_dir, out_dir, output_format))
+    else:
+        # Spawned like the ingestion pool, so workers start from a clean
+        # interpreter and only load what an export needs
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(metadata_path,),
+        ) as executor:
+            futures = [
+                executor.submit(process_export, path, input_dir, out_dir, output_format)
+                for path in exports
+            ]
+            for future in as_completed(futures):
+                record(future.result())
+
+    summary = _aggregate(
+        sorted(results, key=lambda result: result.path),
+        time.perf_counter() - started,
+        workers,
+    )
+    with open(os.path.join(out_dir, SUMMARY_NAME), "w", encoding="utf-8") as handle:
+        json.dump(summary, handle, indent=2)
+    return summary
+
+
+def _init_worker(metadata_path: Optional[str]) -> None:
+    global _metadata
+    _metadata = (
+        load_metadata(metadata_path).set_index("id", drop=False)
+        if metadata_path
+        else None
+    )
+
+
+def _lookup_metadata(video_ids: List[str]):
+    unique_ids = list(dict.fromkeys(video_ids))
+    if _metadata is not None:
+        # Only the export's own videos, so merge_data scans a table the size
+        # of the export rather than the whole metadata file
+        return _metadata.loc[_metadata.index.intersection(unique_ids)].reset_index(
+            drop=True
+        )
+
+    from .metadata_cache import get_metadata_cache
+
+    cache = get_metadata_cache()
+    records = []
+    for start in range(0, len(unique_ids), CACHE_LOOKUP_CHUNK):
+        found, _ = cache.lookup(unique_ids[start : start + CACHE_LOOKUP_CHUNK])
+        records.extend(found.values())
+    return pd.DataFrame(records, columns=METADATA_COLUMNS)
+
+
+def _output_base(path: str, input_dir: str, out_dir: str) -> str:
+    # Results mirror the input tree: exports/a/watch-history.json becomes
+    # out/a/watch-history.parquet and out/a/watch-history.summary.json
+    relative = os.path.relpath(path, input_dir)
+    suffix = next(suffix for suffix in EXPORT_SUFFIXES if relative.endswith(suffix))
+    return os.path.join(out_dir, relative[: -len(suffix)])
+
+
+def _write_results(base, complete_data, summary, output_format) -> List[str]:
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    if output_format == "parquet":
+        rows_path = base + ".parquet"
+        complete_data.to_parquet(rows_path, index=False)
+    else:
+        rows_path = base + ".rows.jsonl"
+        complete_data.to_json(rows_path, orient="records", lines=True)
+    summary_path = base + ".summary.json"
+    with open(summary_path, "w", encoding="utf-8") as handle:
+        json.dump(summary, handle, indent=2)
+    return [rows_path, summary_path]
+
+
+def _aggregate(results: List[ExportResult], elapsed: float, workers: int) -> dict:
+    succeeded = [result for result in results if result.error is None]
+    channel_seconds = Counter()
+    for result in succeeded:
+        channel_seconds.update(result.channel_watch_seconds)
+    entries = sum(result.entries for result in results)
+    return {
+        "files": len(results),
+        "failedFiles": len(results) - len(succeeded),
+        "workers": workers,
+        "entries": entries,
+        "rows": sum(result.rows for result in succeeded),
+        "removedVideos": sum(r.summary["removed_video_count"] for r in succeeded),
+        "missingVideos": sum(r.summary["missing_video_count"] for r in succeeded),
+        "totalWatchSeconds": sum(r.summary["total_watch_seconds"] for r in succeeded),
+        "topChannelsByWatchTime": channel_seconds.most_common(AGGREGATE_TOP_CHANNELS),
+        "elapsedSeconds": round(elapsed, 3),
+        "filesPerSecond": round(len(results) / elapsed, 2) if elapsed else None,
+        "rowsPerSecond": round(entries / elapsed, 1) if elapsed else None,
+        "exports": [
+            {
+                "path": result.path,
+                "outputs": result.outputs,
+                "entries": result.entries,
+                "rows": result.rows,
+                "seconds": round(result.seconds, 3),
+                "error": result.error,
+            }
+            for result in results
+        ],
+    }
+
+
+def _print_progress(done, total, elapsed, rows):
+    if done == total or done % max(1, total // 20) == 0:
+        print(
+            f"{done}/{total} files, {done / elapsed:.1f} files/s, "
+            f"{rows / elapsed:,.0f} rows/s",
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the analytics pipeline over a directory of Takeout exports."
+    )
+    parser.add_argument(
+        "input_dir",
+        help="directory searched for .json and .html exports and Takeout archives",
+    )
+    parser.add_argument("--out", required=True, help="directory for the results")
+    parser.add_argument(
+        "--metadata",
+        help="local metadata file (.json, .jsonl, .csv or .parquet); "
+        "without it the shared Redis metadata cache is used",
+    )
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="parquet")
+    args = parser.parse_args()
+
+    if args.format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        parser.error(
+            "Parquet output needs pyarrow (the batch extra); or use --format json"
+        )
+
+    summary = run_batch(
+        args.input_dir,
+        args.out,
+        metadata_path=args.metadata,
+        workers=args.workers,
+        output_format=args.format,
+        progress=_print_progress,
+    )
+    print(
+        f"{summary['files']} files ({summary['failedFiles']} failed), "
+        f"{summary['entries']:,} entries in {summary['elapsedSeconds']:.1f}s: "
+        f"{summary['filesPerSecond']} files/s, {summary['rowsPerSecond']:,} rows/s"
+    )
+    for export in summary["exports"]:
+        if export["error"]:
+            print(f"  {export['path']}: {export['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,15 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
 SESSION_COOKIE_NAME = "session_id"
 
+# How long a session's DataStore is kept in Redis. Matches the session cookie
+# lifetime so re-uploads can be merged incrementally into the existing history.
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 60 * 60 * 24 * 7))
+
+# "background" runs the data pipeline in the web worker's BackgroundTasks;
+# "queue" hands it to the Redis job queue consumed by `python -m src.worker`.
+PIPELINE_EXECUTION = os.getenv("PIPELINE_EXECUTION", "background")
@@ -1,8 +1,13 @@
+from __future__ import annotations
+
 import re
 from typing import List, Optional
-from . import models
-import pandas as pd
-from datetime import datetime
+from . import analytics, models
+from datetime import date, datetime
+from .lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
 
 def extract_video_id(titleUrl: str) -> Optional[str]:
@@ -39,45 +44,148 @@ def parse_timestamp(timestamp):
     return None
 
 
-def filter_data(watched_items):
-    # Filter watched items based on conditions
-    filtered_data = [
-        models.YouTubeVideo(
-            watchDate=parse_timestamp(item.time),
-            id=str(extract_video_id(item.titleUrl)),
-        ).to_json()
-        for item in watched_items
-        if (
-            item.time is not None and item.titleUrl is not None and item.details is None
-        )
-    ]
+def filter_data(watched_items, since: Optional[datetime] = None):
+    # Filter watched items based on conditions, optionally keeping only
+    # entries newer than `since` (used for incremental re-uploads)
+    filtered_data = []
+    removed_videos_count = 0
+    for item in watched_items:
+        watch_date = parse_timestamp(item.time) if item.time is not None else None
+        if since is not None and (watch_date is None or watch_date <= since):
+            continue
 
-    # Count removed videos
-    removed_videos_count = sum(
-        1
-        for item in watched_items
-        if item.title == "Watched a video that has been removed"
-    )
+        # Count removed videos
+        if item.title == "Watched a video that has been removed":
+            removed_videos_count += 1
+
+        if item.time is not None and item.titleUrl is not None and item.details is None:
+            filtered_data.append(
+                models.YouTubeVideo(
+                    watchDate=watch_date,
+                    id=str(extract_video_id(item.titleUrl)),
+                ).to_json()
+            )
 
     return filtered_data, removed_videos_count
 
 
+def latest_watch_date(watched_items) -> Optional[datetime]:
+    # Newest timestamp in an export, used as the incremental high-water mark
+    timestamps = pd.to_datetime(
+        [item.time for item in watched_items],
+        format="ISO8601",
+        errors="coerce",
+        utc=True,
+    )
+    latest = timestamps.max()
+    return None if pd.isna(latest) else latest.tz_localize(None).to_pydatetime()
+
+
+def known_video_metadata(complete_data: pd.DataFrame) -> pd.DataFrame:
+    # Metadata already fetched for a session, one row per video ID
+    columns = ["id", "title", "channelTitle", "duration"]
+    if complete_data is None or not set(columns).issubset(complete_data.columns):
+        return pd.DataFrame(columns=columns)
+    return complete_data[columns].drop_duplicates(subset="id")
+
+
 def merge_data(
     videos: List[models.YouTubeVideo], vid_info_df: pd.DataFrame
 ) -> pd.DataFrame:
-    video_data = [{"id": video.id, "watch_date": video.watchDate} for video in videos]
-    df = pd.DataFrame(video_data)
-
-    merged_df = pd.merge(df, vid_info_df, on="id", how="left")
-    merged_df = merged_df.loc[
-        merged_df["title"].notna()
-        & merged_df["channelTitle"].notna()
-        & merged_df["duration"].notna()
-    ]
-    youtube_df = merged_df.reset_index(drop=True)
+    # Join the watch history to the video metadata on integer codes: video IDs
+    # of both tables are factorized together once, each code maps to its
+    # metadata row (-1 for IDs without complete metadata), and the history
+    # picks its rows with a single take. Rows without metadata drop out of the
+    # same indexer, so no merged frame is built and then masked.
+    video_ids = np.array([video.id for video in videos], dtype=object)
+    watch_dates = pd.DatetimeIndex(
+        [video.watchDate for video in videos], dtype="datetime64[ns]"
+    )
+
+    metadata_ids = vid_info_df["id"].to_numpy(dtype=object)
+    codes, unique_ids = pd.factorize(np.concatenate([metadata_ids, video_ids]))
+    metadata_codes = codes[: len(metadata_ids)]
+    history_codes = codes[len(metadata_ids) :]
+
+    complete = (
+        vid_info_df["title"].notna()
+        & vid_info_df["channelTitle"].notna()
+        & vid_info_df["duration"].notna()
+    ).to_numpy()
+    metadata_rows = np.full(len(unique_ids), -1, dtype=np.int64)
+    # The first complete row of a duplicated ID wins
+    complete_rows = np.flatnonzero(complete)
+    complete_codes, first = np.unique(metadata_codes[complete_rows], return_index=True)
+    metadata_rows[complete_codes] = complete_rows[first]
+
+    matched_rows = metadata_rows[history_codes]
+    kept = np.flatnonzero(matched_rows >= 0)
+    # Newest first, as Takeout lists them; a stable sort keeps the file order
+    # of ties, and rows_between can binary search the result. Inverting the
+    # bits sorts descending without overflow and puts missing dates last.
+    order = np.argsort(~watch_dates.asi8[kept], kind="stable")
+    kept = kept[order]
+    taken_rows = matched_rows[kept]
+
+    youtube_df = pd.DataFrame({"id": video_ids[kept], "watch_date": watch_dates[kept]})
+    for column in vid_info_df.columns:
+        if column != "id":
+            youtube_df[column] = vid_info_df[column].array.take(taken_rows)
+    # Durations are parsed once per watched video rather than once per watch
+    watched = np.zeros(len(vid_info_df), dtype=bool)
+    watched[taken_rows] = True
+    duration_seconds = np.zeros(len(vid_info_df), dtype=np.int64)
+    duration_seconds[watched] = analytics.duration_to_seconds(
+        vid_info_df["duration"].to_numpy()[watched].tolist()
+    )
+    youtube_df["duration_seconds"] = duration_seconds[taken_rows]
 
     return youtube_df
 
 
+def continues_newest_first(newer_rows: pd.DataFrame, older_rows: pd.DataFrame) -> bool:
+    # Whether newer_rows placed ahead of older_rows keeps the history newest
+    # first, given both are sorted on their own
+    if newer_rows.empty or older_rows.empty:
+        return True
+    return bool(newer_rows["watch_date"].iloc[-1] >= older_rows["watch_date"].iloc[0])
+
+
+def rows_between(
+    complete_data: pd.DataFrame,
+    first: Optional[date] = None,
+    last: Optional[date] = None,
+    newest_first: bool = False,
+) -> pd.DataFrame:
+    # Rows watched between two days, both included. A history sorted newest
+    # first by merge_data is cut with two binary searches instead of a mask
+    # over every row.
+    start = None if first is None else pd.Timestamp(first)
+    end = None if last is None else pd.Timestamp(last) + pd.Timedelta(days=1)
+    if not newest_first:
+        watch_dates = complete_data["watch_date"]
+        mask = watch_dates.notna()
+        if start is not None:
+            mask &= watch_dates >= start
+        if end is not None:
+            mask &= watch_dates < end
+        return complete_data.loc[mask]
+
+    # Reversed, the column ascends; as integers, missing dates are the
+    # smallest values and come first
+    ascending = (
+        complete_data["watch_date"]
+        .to_numpy(dtype="datetime64[ns]")
+        .view(np.int64)[::-1]
+    )
+    row_count = len(ascending)
+    if start is None:
+        lower = np.searchsorted(ascending, pd.NaT.value, "right")
+    else:
+        lower = np.searchsorted(ascending, start.value, "left")
+    upper = row_count if end is None else np.searchsorted(ascending, end.value, "left")
+    return complete_data.iloc[row_count - upper : row_count - lower]
+
+
 def json_to_youtube_videos(json_list: List[str]) -> List[models.YouTubeVideo]:
     return [models.YouTubeVideo.from_json(json_str) for json_str in json_list]
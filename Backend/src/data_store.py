@@ -1,45 +1,125 @@
+import base64
 from io import StringIO
 from typing import List
-import pandas as pd
 from enum import Enum
 from collections import deque
+from .lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+def pack_arrays(value):
+    """Recursively encode NumPy arrays as base64 so they survive JSON serialization."""
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        return {
+            "__ndarray__": base64.b64encode(array.tobytes()).decode("ascii"),
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+        }
+    if isinstance(value, dict):
+        return {key: pack_arrays(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [pack_arrays(item) for item in value]
+    return value
+
+
+def unpack_arrays(value):
+    """Inverse of pack_arrays: rebuild NumPy arrays from their base64 encoding."""
+    if isinstance(value, dict):
+        if "__ndarray__" in value:
+            array = np.frombuffer(
+                base64.b64decode(value["__ndarray__"]), dtype=np.dtype(value["dtype"])
+            )
+            return array.reshape(value["shape"])
+        return {key: unpack_arrays(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [unpack_arrays(item) for item in value]
+    return value
 
 
 class DataStoreState(Enum):
     NOT_STARTED = "not_started"
+    QUEUED = "queued"
     REQUESTING_DATA = "requesting_data"
     GENERATING_ANALYTICS = "generating_analytics"
     COMPLETE = "complete"
     ERROR = "error"
 
 
+# Fields a finished pipeline produces for an upload; shared through the
+# result cache by every session that uploads the same file
+RESULT_FIELDS = (
+    "complete_data",
+    "watch_dates_sorted",
+    "removed_video_count",
+    "missing_video_count",
+    "skipped_missing_count",
+    "unique_vids",
+    "video_index",
+    "search_index",
+    "watch_metrics",
+    "high_water_mark",
+    "num_of_pages",
+)
+# The bulky ones, left out of the session's own payload while it holds a
+# cached result
+SHARED_RESULT_FIELDS = (
+    "complete_data",
+    "unique_vids",
+    "video_index",
+    "search_index",
+    "watch_metrics",
+)
+
+
 class DataStore:
     def __init__(self):
         self.filtered_json_data: List[str] = []  # List of JSON strings
         self.complete_data = pd.DataFrame()
+        self.watch_dates_sorted = False  # complete_data is newest first by watch_date
         self.removed_video_count = 0
+        self.missing_video_count = 0  # Entries whose video is deleted or private
+        self.skipped_missing_count = 0  # IDs not requested, known to be unavailable
         self.page_num = 1
         self.unique_vids = []
+        self.video_index = {}  # Sort/filter indexes over unique_vids
+        self.search_index = {}  # Inverted index over unique_vids titles/channels
+        self.watch_metrics = {}  # Per-channel/per-video aggregates from analytics
+        self.high_water_mark = None  # ISO timestamp of the newest ingested entry
+        self.incremental_update = False  # Pending work only covers new entries
+        self.new_row_count = 0  # Rows at the head of complete_data not yet analyzed
+        self.generation = 0  # Upload generation that owns this store
+        self.upload_bytes = 0  # Size of the upload, for the pipeline memory estimate
+        self.upload_hash = None  # SHA-256 of a full upload, its result cache key
+        self.result_hash = None  # Cached result this store's results come from
         self.num_of_pages = 0
         self.max_rows = 500
         self.state_queue = deque()  # Initialize as empty
         self.error_message = ""
 
-    def to_dict(self):
-        """Serialize the DataStore object to a dictionary."""
-        if "watch_date" in self.complete_data.columns:
-            self.complete_data["watch_date"] = self.complete_data[
-                "watch_date"
-            ].dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    def to_dict(self, include_results: bool = True):
+        """
+        Serialize the DataStore object to a dictionary.
 
-        return {
+        :param include_results: False leaves out SHARED_RESULT_FIELDS, for a
+            store whose results are kept in the result cache.
+        """
+        data = {
             "filtered_json_data": self.filtered_json_data,
-            "complete_data": self.complete_data.to_json(
-                orient="split"
-            ),  # Convert DataFrame to JSON string
+            "watch_dates_sorted": self.watch_dates_sorted,
             "removed_video_count": self.removed_video_count,
+            "missing_video_count": self.missing_video_count,
+            "skipped_missing_count": self.skipped_missing_count,
             "page_num": self.page_num,
-            "unique_vids": self.unique_vids,
+            "high_water_mark": self.high_water_mark,
+            "incremental_update": self.incremental_update,
+            "new_row_count": self.new_row_count,
+            "generation": self.generation,
+            "upload_bytes": self.upload_bytes,
+            "upload_hash": self.upload_hash,
+            "result_hash": self.result_hash,
             "num_of_pages": self.num_of_pages,
             "max_rows": self.max_rows,
             "state_queue": [
@@ -47,6 +127,31 @@ class DataStore:
             ],  # Serialize state queue
             "error_message": self.error_message,  # Include error_message in the dictionary
         }
+        if not include_results:
+            return data
+
+        complete_data = self.complete_data
+        if "watch_date" in complete_data.columns:
+            # Converted on a shallow copy so the store keeps its datetimes
+            complete_data = complete_data.copy(deep=False)
+            complete_data["watch_date"] = complete_data["watch_date"].dt.strftime(
+                "%Y-%m-%dT%H:%M:%S.%fZ"
+            )
+        data.update(
+            complete_data=complete_data.to_json(
+                orient="split"
+            ),  # Convert DataFrame to JSON string
+            unique_vids=self.unique_vids,
+            video_index=pack_arrays(self.video_index),
+            search_index=pack_arrays(self.search_index),
+            watch_metrics=pack_arrays(self.watch_metrics),
+        )
+        return data
+
+    def results(self) -> dict:
+        """The serialized RESULT_FIELDS, as stored in the result cache."""
+        data = self.to_dict()
+        return {field: data[field] for field in RESULT_FIELDS}
 
     def update_state(self, new_state: DataStoreState):
         """Update the state and add it to the state queue."""
@@ -81,9 +186,22 @@ class DataStore:
         instance = cls()
         instance.filtered_json_data = data.get("filtered_json_data", [])
         instance.complete_data = complete_data
+        instance.watch_dates_sorted = data.get("watch_dates_sorted", False)
         instance.removed_video_count = data.get("removed_video_count", 0)
+        instance.missing_video_count = data.get("missing_video_count", 0)
+        instance.skipped_missing_count = data.get("skipped_missing_count", 0)
         instance.page_num = data["page_num"]
         instance.unique_vids = data["unique_vids"]
+        instance.video_index = unpack_arrays(data.get("video_index", {}))
+        instance.search_index = unpack_arrays(data.get("search_index", {}))
+        instance.watch_metrics = unpack_arrays(data.get("watch_metrics", {}))
+        instance.high_water_mark = data.get("high_water_mark")
+        instance.incremental_update = data.get("incremental_update", False)
+        instance.new_row_count = data.get("new_row_count", 0)
+        instance.generation = data.get("generation", 0)
+        instance.upload_bytes = data.get("upload_bytes", 0)
+        instance.upload_hash = data.get("upload_hash")
+        instance.result_hash = data.get("result_hash")
         instance.num_of_pages = data["num_of_pages"]
         instance.max_rows = data["max_rows"]
         # Deserialize state queue
@@ -0,0 +1,197 @@
+"""
+Ingestion Module
+
+This module parses uploaded watch history off the event loop. Decoding,
+validation and filtering are CPU-bound, so they run in a process pool (or a
+thread pool on free-threaded Python) and hand back a compact, picklable
+result for the request handler to store.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from . import data_processing, models, takeout_archive, takeout_html
+from .metrics import PIPELINE_STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# "auto" picks threads when the GIL is disabled and processes otherwise;
+# "inline" parses on the event loop, which is only sensible for tests.
+INGEST_EXECUTOR = os.getenv("INGEST_EXECUTOR", "auto")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", min(4, os.cpu_count() or 1)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+_executor: Optional[Executor] = None
+
+
+class ParsedUpload(NamedTuple):
+    filtered_json_data: List[str]
+    removed_video_count: int
+    latest_watch_date: Optional[str]  # ISO timestamp of the newest entry
+    since: Optional[str]  # High-water mark the upload was filtered against
+    # Seconds per parsing step, measured in the worker and recorded by the caller
+    timings: Optional[Dict[str, float]] = None
+    entry_count: int = 0  # Entries in the upload before filtering
+    # Size of the watch history JSON, after decompressing an archive upload
+    history_bytes: int = 0
+
+
+def parse_upload(raw: bytes, since: Optional[str] = None) -> ParsedUpload:
+    """
+    Decode, validate and filter an uploaded watch history.
+
+    Runs inside a worker, so it only takes and returns picklable values.
+    Takeout archives are decompressed here as well, so only the compressed
+    upload is sent to the worker. JSON and HTML exports are both accepted.
+
+    :param raw: Raw bytes of the uploaded file or Takeout archive.
+    :param since: Optional ISO timestamp; only newer entries are kept.
+    :return: ParsedUpload with the filtered entries and upload statistics.
+    """
+    started = time.perf_counter()
+    with takeout_archive.open_watch_history(raw) as history:
+        if history.is_html:
+            return _parse_html_upload(history.stream, since, started)
+        data = history.stream.read()
+    extracted = time.perf_counter()
+    json_data = json.loads(data.decode("utf-8"))
+    if not isinstance(json_data, list):
+        raise ValueError("Expected a JSON array of watch history entries.")
+    decoded = time.perf_counter()
+
+    watched_items = [models.WatchedItem.model_validate(item) for item in json_data]
+    validated = time.perf_counter()
+    filtered_json_data, removed_video_count = data_processing.filter_data(
+        watched_items,
+        since=datetime.fromisoformat(since) if since else None,
+    )
+    latest = data_processing.latest_watch_date(watched_items)
+
+    timings = {
+        "decode": decoded - extracted,
+        "validate": validated - decoded,
+        "filter_data": time.perf_counter() - validated,
+    }
+    if data is not raw:
+        timings["extract"] = extracted - started
+
+    return ParsedUpload(
+        filtered_json_data=filtered_json_data,
+        removed_video_count=removed_video_count,
+        latest_watch_date=latest.isoformat() if latest else None,
+        since=since,
+        timings=timings,
+        entry_count=len(json_data),
+        history_bytes=len(data),
+    )
+
+
+def _parse_html_upload(stream, since: Optional[str], started: float) -> ParsedUpload:
+    # Entries are filtered as the parser yields them, so the export is never
+    # held in memory as a whole
+    entry_count = 0
+    latest = None
+
+    def watched_items():
+        nonlocal entry_count, latest
+        for item in takeout_html.iter_watched_items(stream):
+            entry_count += 1
+            # HTML timestamps all share one UTC format, so they sort as strings
+            if latest is None or item.time > latest:
+                latest = item.time
+            yield item
+
+    filtered_json_data, removed_video_count = data_processing.filter_data(
+        watched_items(),
+        since=datetime.fromisoformat(since) if since else None,
+    )
+    latest_date = data_processing.parse_timestamp(latest) if latest else None
+
+    return ParsedUpload(
+        filtered_json_data=filtered_json_data,
+        removed_video_count=removed_video_count,
+        latest_watch_date=latest_date.isoformat() if latest_date else None,
+        since=since,
+        timings={"parse_html": time.perf_counter() - started},
+        entry_count=entry_count,
+        history_bytes=stream.tell(),
+    )
+
+
+async def read_upload(upload) -> Tuple[bytes, str]:
+    """
+    Read an uploaded file chunk by chunk, hashing it as it arrives.
+
+    :param upload: The request's UploadFile.
+    :return: Tuple of (the file's bytes, its SHA-256 hex digest).
+    """
+    digest = hashlib.sha256()
+    chunks = []
+    while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
+async def parse_upload_async(raw: bytes, since: Optional[str] = None) -> ParsedUpload:
+    """Run parse_upload on the configured executor without blocking the event loop."""
+    with PIPELINE_STAGE_SECONDS.time(stage="parse"):
+        executor = get_executor()
+        if executor is None:
+            parsed = parse_upload(raw, since)
+        else:
+            loop = asyncio.get_running_loop()
+            parsed = await loop.run_in_executor(executor, parse_upload, raw, since)
+    for stage, seconds in (parsed.timings or {}).items():
+        PIPELINE_STAGE_SECONDS.observe(seconds, stage=stage)
+    return parsed
+
+
+def get_executor() -> Optional[Executor]:
+    """Return the shared ingestion executor, creating it on first use."""
+    global _executor
+    if _executor is not None or INGEST_EXECUTOR == "inline":
+        return _executor
+
+    use_threads = INGEST_EXECUTOR == "thread" or (
+        INGEST_EXECUTOR == "auto" and not _gil_enabled()
+    )
+    if use_threads:
+        _executor = ThreadPoolExecutor(
+            max_workers=INGEST_WORKERS, thread_name_prefix="ingest"
+        )
+    else:
+        # Forking a process that already runs the event loop's threads is
+        # unsafe, so workers are spawned fresh
+        _executor = ProcessPoolExecutor(
+            max_workers=INGEST_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    logger.info(
+        "Ingestion executor: %s with %d workers",
+        type(_executor).__name__,
+        INGEST_WORKERS,
+    )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Stop the ingestion executor; called when the app shuts down."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _gil_enabled() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_gil_enabled is None else is_gil_enabled()
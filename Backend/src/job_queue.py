@@ -0,0 +1,231 @@
+"""
+Job Queue Module
+
+This module provides a Redis-backed queue for data pipeline jobs so they can
+run in dedicated worker processes (see src/worker.py) instead of inside the
+web worker's BackgroundTasks.
+
+Each enqueue creates a job for a session; at most one job per session waits
+on the pending list at a time. A dequeued job is moved to a processing list
+and given a lease; a worker that dies mid-run stops renewing the lease, and
+the reaper puts the job back on the pending list once its visibility timeout
+expires, up to a maximum number of attempts. Every attempt is tracked under
+its own token ("<job id>#<attempt>"), so a worker that finishes late can only
+ever acknowledge its own attempt.
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+from . import redis_utils
+
+logger = logging.getLogger(__name__)
+
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", 300))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# Job records outlive any realistic run; this only bounds abandoned ones
+JOB_RECORD_TTL = 60 * 60 * 24
+
+_job_queue = None
+
+# Re-queue an attempt whose lease expired, unless another reaper already did.
+# KEYS: leases, processing, pending, dead letters
+# ARGV: attempt token, now, next attempt token ("" once out of attempts), session id
+_REQUEUE_EXPIRED_SCRIPT = """
+local lease = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not lease or tonumber(lease) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('LREM', KEYS[2], 1, ARGV[1])
+if ARGV[3] == '' then
+    redis.call('LPUSH', KEYS[4], ARGV[4])
+    return 2
+end
+redis.call('RPUSH', KEYS[3], ARGV[3])
+return 1
+"""
+
+
+class JobQueue:
+    def __init__(
+        self,
+        client,
+        name: str = "pipeline",
+        visibility_timeout: int = JOB_VISIBILITY_TIMEOUT,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ):
+        self.client = client
+        self.name = name
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.pending_key = f"{name}:jobs:pending"
+        self.processing_key = f"{name}:jobs:processing"
+        self.leases_key = f"{name}:jobs:leases"
+        self.queued_key = f"{name}:jobs:queued"
+        self.dead_key = f"{name}:jobs:dead"
+        self._requeue_expired = client.register_script(_REQUEUE_EXPIRED_SCRIPT)
+
+    def job_key(self, job_id: str) -> str:
+        return f"{self.name}:job:{job_id}"
+
+    def enqueue(
+        self, session_id: str, options: Optional[dict] = None, generation: int = 0
+    ) -> bool:
+        """
+        Queue a pipeline run for a session. Returns False if one is already pending.
+
+        :param generation: Upload generation the run is for; a pending run
+            takes over the options and generation of a duplicate.
+        """
+        job_id = f"{session_id}:{uuid.uuid4().hex}"
+        fields = {"options": json.dumps(options or {}), "generation": generation}
+        self.client.hset(
+            self.job_key(job_id),
+            mapping={"session_id": session_id, "enqueued_at": time.time(), **fields},
+        )
+        self.client.expire(self.job_key(job_id), JOB_RECORD_TTL)
+        if not self.client.hsetnx(self.queued_key, session_id, job_id):
+            self.client.delete(self.job_key(job_id))
+            pending_job = self.client.hget(self.queued_key, session_id)
+            if pending_job is not None:
+                self.client.hset(self.job_key(_decode(pending_job)), mapping=fields)
+            return False
+        self.client.lpush(self.pending_key, f"{job_id}#1")
+        return True
+
+    def dequeue(self, timeout: int = 5) -> Optional[dict]:
+        """
+        Block until a job is available and lease it to the caller.
+
+        :param timeout: Seconds to wait for a job before returning None.
+        :return: Job dictionary with session_id, generation, options, attempts
+            and the attempt token to pass to extend_lease, ack and fail.
+        """
+        token = self.client.blmove(
+            self.pending_key, self.processing_key, timeout, "RIGHT", "LEFT"
+        )
+        if token is None:
+            return None
+        token = _decode(token)
+        job_id, session_id, _ = _parse_token(token)
+
+        self.client.zadd(
+            self.leases_key, {token: time.time() + self.visibility_timeout}
+        )
+        # Retried attempts are not the session's pending job; a newer one may be
+        pending_job = self.client.hget(self.queued_key, session_id)
+        if pending_job is not None and _decode(pending_job) == job_id:
+            self.client.hdel(self.queued_key, session_id)
+        return self._job(token)
+
+    def extend_lease(self, token: str) -> None:
+        """Push the visibility deadline of a running attempt further out."""
+        self.client.zadd(
+            self.leases_key,
+            {token: time.time() + self.visibility_timeout},
+            xx=True,
+        )
+
+    def ack(self, token: str) -> None:
+        """Mark an attempt as finished and forget its job."""
+        pipe = self.client.pipeline()
+        pipe.lrem(self.processing_key, 1, token)
+        pipe.zrem(self.leases_key, token)
+        _, leased = pipe.execute()
+        # An attempt whose lease expired has already been handed back to the queue
+        if leased:
+            self.client.delete(self.job_key(_parse_token(token)[0]))
+
+    def fail(self, token: str) -> bool:
+        """Give a failed attempt back to the queue. Returns False once it is dead-lettered."""
+        self.client.zadd(self.leases_key, {token: 0}, xx=True)
+        return self._requeue(token, time.time()) != 2
+
+    def reap_expired(self) -> Tuple[List[str], List[dict]]:
+        """
+        Re-queue jobs whose workers stopped renewing their lease.
+
+        :return: Tuple of (re-queued session IDs, dead-lettered jobs, shaped
+            like the ones dequeue returns).
+        """
+        now = time.time()
+        # Attempts moved to processing by a worker that died before leasing them
+        for token in self.client.lrange(self.processing_key, 0, -1):
+            self.client.zadd(
+                self.leases_key,
+                {_decode(token): now + self.visibility_timeout},
+                nx=True,
+            )
+
+        requeued, dead = [], []
+        for token in self.client.zrangebyscore(self.leases_key, "-inf", now):
+            token = _decode(token)
+            session_id = _parse_token(token)[1]
+            outcome = self._requeue(token, now)
+            if outcome == 1:
+                requeued.append(session_id)
+                logger.warning("Re-queued expired pipeline job %s", session_id)
+            elif outcome == 2:
+                dead.append(self._job(token))
+                logger.error("Pipeline job %s exhausted its retries", session_id)
+        return requeued, dead
+
+    def stats(self) -> dict:
+        """Queue depth, in-flight and dead-lettered job counts."""
+        pipe = self.client.pipeline()
+        pipe.llen(self.pending_key)
+        pipe.llen(self.processing_key)
+        pipe.llen(self.dead_key)
+        pending, processing, dead = pipe.execute()
+        return {"pending": pending, "processing": processing, "dead": dead}
+
+    def _job(self, token: str) -> dict:
+        job_id, session_id, attempts = _parse_token(token)
+        options, generation = self.client.hmget(
+            self.job_key(job_id), "options", "generation"
+        )
+        return {
+            "session_id": session_id,
+            "generation": int(generation or 0),
+            "options": json.loads(_decode(options)) if options else {},
+            "attempts": attempts,
+            "token": token,
+        }
+
+    def _requeue(self, token: str, now: float) -> int:
+        job_id, session_id, attempts = _parse_token(token)
+        next_token = f"{job_id}#{attempts + 1}" if attempts < self.max_attempts else ""
+        return int(
+            self._requeue_expired(
+                keys=[
+                    self.leases_key,
+                    self.processing_key,
+                    self.pending_key,
+                    self.dead_key,
+                ],
+                args=[token, now, next_token, session_id],
+            )
+        )
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _parse_token(token: str) -> Tuple[str, str, int]:
+    """Split an attempt token into its job ID, session ID and attempt number."""
+    job_id, attempt = token.rsplit("#", 1)
+    return job_id, job_id.rsplit(":", 1)[0], int(attempt)
+
+
+def get_job_queue() -> JobQueue:
+    """Return the shared pipeline job queue on the app's Redis connection."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(redis_utils.get_client())
+    return _job_queue
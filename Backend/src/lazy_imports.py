@@ -0,0 +1,45 @@
+"""
+Lazy Imports Module
+
+This module defers importing heavy libraries (pandas, NumPy, plotly) until
+an attribute of the module is first used. Importing the app or a worker
+then stays cheap, and the libraries load when the first upload needs them.
+
+Names used at import time, such as type annotations outside functions or
+module-level constants built with the library, load the module at once and
+undo the saving; modules importing this way use postponed annotations.
+"""
+
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Return the module, loading it on first attribute access.
+
+    Modules that are already imported are returned as they are. Parent
+    packages of a dotted name are imported right away.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def is_loaded(name: str) -> bool:
+    """Whether a module is imported and, if it was imported lazily, loaded."""
+    module = sys.modules.get(name)
+    # LazyLoader swaps the module's class back once the module is loaded
+    return module is not None and type(module) is ModuleType
@@ -1,28 +1,55 @@
+import asyncio
 import json
 import logging
+import os
+from contextlib import asynccontextmanager
 from typing import Optional
 
-from fastapi import BackgroundTasks, FastAPI, Request, UploadFile
-from fastapi.responses import HTMLResponse
+from fastapi import BackgroundTasks, FastAPI, Form, HTTPException, Request, UploadFile
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+)
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pydantic import ValidationError
 
-from . import data_processing, models
+from . import ingestion, metrics, profiling, redis_utils
+from .admission import PIPELINE_RETRY_AFTER_SECONDS
 from .api_routes import router as api_router
 from .constants import SESSION_COOKIE_NAME
 from .data_store import DataStore, DataStoreState
+from .redis_utils import StaleGenerationError
 from .session_pipeline import (
+    apply_upload,
+    attach_cached_result,
     delete_store,
     ensure_datastore,
     generate_analytics_context,
     load_store,
     new_session_id,
-    process_data_pipeline,
+    pipeline_queue_full,
+    release_result,
     save_store,
+    schedule_pipeline,
+    start_generation,
+    supports_incremental,
 )
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connect here rather than at import so a slow or restarting Redis delays
+    # readiness (see /health) instead of failing the process
+    await asyncio.to_thread(redis_utils.connect)
+    yield
+    ingestion.shutdown_executor()
+    redis_utils.disconnect()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount the "static" directory at the path "/static"
 app.mount("/static", StaticFiles(directory="../Frontend/static"), name="static")
@@ -33,17 +60,44 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 app.include_router(api_router)
+
+
+@app.exception_handler(StaleGenerationError)
+async def stale_generation_handler(request: Request, exc: StaleGenerationError):
+    # The session was replaced by a newer upload while this request ran
+    return JSONResponse(
+        {"detail": "This session was replaced by a newer upload."}, status_code=409
+    )
+
+
 # Middleware to manage session ID
 @app.middleware("http")
 async def add_session_id(request: Request, call_next):
     session_id = request.cookies.get(SESSION_COOKIE_NAME)
     response = await call_next(request)
-    if not session_id:
-        session_id = str(uuid.uuid4())
+    # Routes that create a session set the cookie themselves; keep theirs
+    issued = any(
+        header.startswith(f"{SESSION_COOKIE_NAME}=")
+        for header in response.headers.getlist("set-cookie")
+    )
+    if not session_id and not issued:
+        session_id = new_session_id()
         response.set_cookie(key=SESSION_COOKIE_NAME, value=session_id, httponly=True)
     return response
 
 
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    # Opt-in per request (see profiling); a no-op unless PROFILING_ENABLED
+    with profiling.request_profile(
+        request.headers, f"{request.method} {request.url.path}"
+    ) as profile_id:
+        response = await call_next(request)
+    if profile_id:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     context = {"request": request}
@@ -76,14 +130,37 @@ def _template_with_cookie(
 
 @app.post("/loadData", response_class=HTMLResponse)
 async def load_data(
-    file_input: UploadFile, request: Request, background_tasks: BackgroundTasks
+    file_input: UploadFile,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    incremental: bool = Form(False),
 ):
     # 1) Ensure session_id exists
     session_id = request.cookies.get(SESSION_COOKIE_NAME) or new_session_id()
 
-    # 2) If a store exists for this session, delete it so we start fresh
+    # Turn the upload away while this worker's pipeline queue is full
+    if await pipeline_queue_full():
+        response = _template_with_cookie(
+            "partials/steps/verify_and_extract.html",
+            request,
+            session_id,
+            {
+                "error": "Too many uploads are being processed right now. "
+                "Please try again shortly."
+            },
+        )
+        response.status_code = 429
+        response.headers["Retry-After"] = str(PIPELINE_RETRY_AFTER_SECONDS)
+        return response
+
+    # 2) If a store exists for this session, delete it so we start fresh,
+    #    unless the upload can be merged into the existing history
     existing_store = await load_store(session_id)
-    if existing_store:
+    incremental = incremental and supports_incremental(existing_store)
+    # Supersede any pipeline still running for an earlier upload
+    generation = await start_generation(session_id)
+    await release_result(session_id, existing_store)
+    if existing_store and not incremental:
         try:
             await delete_store(session_id)
         except Exception as e:
@@ -94,8 +171,9 @@ async def load_data(
                 e,
             )
 
-    # 3) Create a fresh store
-    data_store = DataStore()
+    # 3) Create a fresh store (or reuse the existing one for incremental uploads)
+    data_store = existing_store if incremental else DataStore()
+    data_store.generation = generation
     data_store.error_message = ""
     # Ensure queue exists before clear
     if hasattr(data_store, "state_queue"):
@@ -107,29 +185,36 @@ async def load_data(
         if not file_input:
             raise ValueError("No file provided.")
 
-        # 4) Read and parse the input file
-        raw = await file_input.read()
+        # 4) Read the input file, hashing it as it streams in
+        raw, upload_hash = await ingestion.read_upload(file_input)
         if not raw:
             raise ValueError("Uploaded file is empty.")
-        decoded = raw.decode("utf-8")
-        json_data = json.loads(decoded)
-
-        # Validate and normalize items
-        watched_items = [models.WatchedItem.model_validate(item) for item in json_data]
-
-        # 5) Filter/preprocess
-        (
-            data_store.filtered_json_data,
-            data_store.removed_video_count,
-        ) = data_processing.filter_data(watched_items)
+        # 5) The same export uploaded before completes from its cached result
+        if not incremental and await attach_cached_result(
+            session_id, data_store, upload_hash
+        ):
+            await save_store(session_id, data_store)
+            return _template_with_cookie(
+                "partials/steps/verify_and_extract.html",
+                request,
+                session_id,
+            )
+        # 6) Decode, validate and filter off the event loop
+        parsed = await ingestion.parse_upload_async(
+            raw, data_store.high_water_mark if incremental else None
+        )
+        has_new_entries = apply_upload(
+            data_store, parsed, parsed.history_bytes, upload_hash
+        )
 
-        # 6) Persist initial store state
+        # 7) Persist initial store state
         await save_store(session_id, data_store)
 
-        # 7) Kick off the background pipeline
-        background_tasks.add_task(process_data_pipeline, session_id)
+        # 8) Kick off the background pipeline
+        if has_new_entries:
+            await schedule_pipeline(session_id, background_tasks)
 
-        # 8) Return next-step template; set cookie if needed
+        # 9) Return next-step template; set cookie if needed
         return _template_with_cookie(
             "partials/steps/verify_and_extract.html",
             request,
@@ -152,6 +237,9 @@ async def load_data(
             session_id,
             {"error": error_message},
         )
+    except StaleGenerationError:
+        # A newer upload owns the session; answered with 409 by the handler
+        raise
     except Exception as e:
         # Unexpected failures
         error_message = "An unexpected error occurred while loading data."
@@ -316,3 +404,46 @@ async def prev_table_page(request: Request):
     }
 
     return templates.TemplateResponse("partials/vids_table.html", context=context)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_endpoint():
+    """Pipeline and Redis metrics of this process for Prometheus to scrape."""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Readiness check: 200 while Redis answers, 503 otherwise."""
+    if not await asyncio.to_thread(redis_utils.ping):
+        return JSONResponse({"redis": "unavailable"}, status_code=503)
+    return {"redis": "ok"}
+
+
+@app.get("/debug/profiles", include_in_schema=False)
+async def list_profiles(request: Request):
+    """Recent request and pipeline profiles, newest first."""
+    _check_profiling_access(request)
+    return {"profiles": await asyncio.to_thread(profiling.recent_profiles)}
+
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(request: Request, profile_id: str, format: str = "json"):
+    """A profile's JSON report, or its pstats dump with format=pstats."""
+    _check_profiling_access(request)
+    if format == "pstats":
+        path = profiling.profile_path(profile_id, ".prof")
+        if path is None or not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="Profile not found.")
+        return FileResponse(path, filename=f"{profile_id}.prof")
+    record = await asyncio.to_thread(profiling.load_profile, profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return record
+
+
+def _check_profiling_access(request: Request) -> None:
+    if not profiling.PROFILING_ENABLED or not profiling.authorized(request.headers):
+        raise HTTPException(status_code=404, detail="Not found.")
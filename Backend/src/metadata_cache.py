@@ -0,0 +1,187 @@
+"""
+Metadata Cache Module
+
+This module shares YouTube video metadata between sessions and processes
+through Redis. Fetched records are cached per video ID, IDs the API returned
+nothing for (deleted or private videos) are cached as missing, and IDs that
+are being fetched carry an owner marker so other processes can wait for the
+result instead of requesting the same videos again.
+
+An owner keeps a short-lived heartbeat key alive while it fetches; markers
+whose owner stopped heartbeating are treated as abandoned and can be taken
+over.
+"""
+
+import json
+import logging
+import os
+import uuid
+from typing import Dict, Iterable, List, Tuple
+
+from . import redis_utils
+
+logger = logging.getLogger(__name__)
+
+VIDEO_METADATA_TTL = int(os.getenv("VIDEO_METADATA_TTL", 60 * 60 * 24 * 7))
+# Deleted and private videos rarely come back, so they are remembered longer
+MISSING_VIDEO_TTL = int(os.getenv("MISSING_VIDEO_TTL", 60 * 60 * 24 * 30))
+# Markers outlive any fetch; ownership really ends when the heartbeat stops
+FETCH_MARKER_TTL = 60 * 60
+OWNER_HEARTBEAT_TTL = 30
+
+_metadata_cache = None
+
+# Claim every ID that is not being fetched by a live owner.
+# KEYS: fetch markers; ARGV: owner token, marker ttl, owner key prefix
+_CLAIM_SCRIPT = """
+local claimed = {}
+for i, key in ipairs(KEYS) do
+    local owner = redis.call('GET', key)
+    if not owner or redis.call('EXISTS', ARGV[3] .. owner) == 0 then
+        redis.call('SET', key, ARGV[1], 'EX', ARGV[2])
+        claimed[#claimed + 1] = i
+    end
+end
+return claimed
+"""
+
+# Delete the markers this owner still holds.
+# KEYS: fetch markers; ARGV: owner token
+_RELEASE_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('DEL', key)
+    end
+end
+return 0
+"""
+
+# 1: known (cached or missing), 0: still being fetched by a live owner,
+# -1: nobody has it.
+# KEYS: (cache key, missing key, fetch marker) triples; ARGV: owner key prefix
+_STATUS_SCRIPT = """
+local status = {}
+for i = 1, #KEYS, 3 do
+    if redis.call('EXISTS', KEYS[i], KEYS[i + 1]) > 0 then
+        status[#status + 1] = 1
+    else
+        local owner = redis.call('GET', KEYS[i + 2])
+        if owner and redis.call('EXISTS', ARGV[1] .. owner) == 1 then
+            status[#status + 1] = 0
+        else
+            status[#status + 1] = -1
+        end
+    end
+end
+return status
+"""
+
+
+class MetadataCache:
+    def __init__(self, client, name: str = "ytmeta", ttl: int = VIDEO_METADATA_TTL):
+        self.client = client
+        self.name = name
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex
+        self.owner_prefix = f"{name}:owner:"
+        self._claim = client.register_script(_CLAIM_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+        self._status = client.register_script(_STATUS_SCRIPT)
+
+    def video_key(self, video_id: str) -> str:
+        return f"{self.name}:video:{video_id}"
+
+    def marker_key(self, video_id: str) -> str:
+        return f"{self.name}:fetching:{video_id}"
+
+    def missing_key(self, video_id: str) -> str:
+        return f"{self.name}:missing:{video_id}"
+
+    def lookup(self, video_ids: List[str]) -> Tuple[Dict[str, dict], List[str]]:
+        """
+        Look up IDs in the positive and negative caches.
+
+        :return: Tuple of (cached records by ID, IDs known to be missing).
+        """
+        if not video_ids:
+            return {}, []
+        values = self.client.mget(
+            [self.video_key(video_id) for video_id in video_ids]
+            + [self.missing_key(video_id) for video_id in video_ids]
+        )
+        records, missing = {}, []
+        for video_id, value, is_missing in zip(
+            video_ids, values[: len(video_ids)], values[len(video_ids) :]
+        ):
+            if value is not None:
+                records[video_id] = json.loads(value)
+            elif is_missing is not None:
+                missing.append(video_id)
+        return records, missing
+
+    def store(self, records: Iterable[dict]) -> None:
+        """Cache fetched metadata records under their video ID."""
+        pipe = self.client.pipeline(transaction=False)
+        for record in records:
+            pipe.set(self.video_key(record["id"]), json.dumps(record), ex=self.ttl)
+        pipe.execute()
+
+    def store_missing(self, video_ids: Iterable[str]) -> None:
+        """Remember IDs the API returned nothing for."""
+        pipe = self.client.pipeline(transaction=False)
+        for video_id in video_ids:
+            pipe.set(self.missing_key(video_id), 1, ex=MISSING_VIDEO_TTL)
+        pipe.execute()
+
+    def heartbeat(self) -> None:
+        """Keep this process's fetch markers alive."""
+        self.client.set(self.owner_prefix + self.token, 1, ex=OWNER_HEARTBEAT_TTL)
+
+    def claim(self, video_ids: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Mark IDs as being fetched by this process.
+
+        :return: Tuple of (IDs claimed by us, IDs another live owner is fetching).
+        """
+        if not video_ids:
+            return [], []
+        self.heartbeat()
+        claimed = set(
+            self._claim(
+                keys=[self.marker_key(video_id) for video_id in video_ids],
+                args=[self.token, FETCH_MARKER_TTL, self.owner_prefix],
+            )
+        )
+        owned, elsewhere = [], []
+        for position, video_id in enumerate(video_ids, start=1):
+            (owned if position in claimed else elsewhere).append(video_id)
+        return owned, elsewhere
+
+    def release(self, video_ids: List[str]) -> None:
+        """Drop this process's markers once the IDs are fetched (or failed)."""
+        if video_ids:
+            self._release(
+                keys=[self.marker_key(video_id) for video_id in video_ids],
+                args=[self.token],
+            )
+
+    def status(self, video_ids: List[str]) -> List[int]:
+        """Per ID: 1 known, 0 being fetched elsewhere, -1 abandoned or unknown."""
+        if not video_ids:
+            return []
+        keys = []
+        for video_id in video_ids:
+            keys += [
+                self.video_key(video_id),
+                self.missing_key(video_id),
+                self.marker_key(video_id),
+            ]
+        return [int(code) for code in self._status(keys=keys, args=[self.owner_prefix])]
+
+
+def get_metadata_cache() -> MetadataCache:
+    """Return the shared metadata cache on the app's Redis connection."""
+    global _metadata_cache
+    if _metadata_cache is None:
+        _metadata_cache = MetadataCache(redis_utils.get_client())
+    return _metadata_cache
@@ -0,0 +1,187 @@
+"""
+Metrics Module
+
+This module keeps in-process counters and histograms for the pipeline and
+Redis calls and renders them in the Prometheus text format for /metrics.
+
+Each process has its own registry, so with several web processes or
+pipeline workers every process is scraped separately. With METRICS_ENABLED
+off, timers return a shared no-op context and observations return at once.
+"""
+
+import os
+import resource
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+DURATION_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+# 1 KiB to 256 MiB in powers of four
+SIZE_BUCKETS = tuple(1024 * 4**power for power in range(10))
+
+_NOOP = nullcontext()
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(key)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series: Dict[Tuple, list] = {}  # labels -> [bucket counts, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            # Index of the first bucket whose upper bound holds the value
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def time(self, **labels):
+        """Context manager that observes the seconds its block took."""
+        if not METRICS_ENABLED:
+            return _NOOP
+        return self._timer(labels)
+
+    @contextmanager
+    def _timer(self, labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [
+                (key, list(counts), total)
+                for key, (counts, total) in self._series.items()
+            ]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                yield f"{self.name}_bucket{_labels(key + (('le', le),))} {cumulative}"
+            yield f"{self.name}_sum{_labels(key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(key)} {cumulative}"
+
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds",
+    "Time spent in each stage of the upload and analytics pipeline.",
+    DURATION_BUCKETS,
+)
+PIPELINE_RUNS = Counter("pipeline_runs_total", "Finished pipeline runs by outcome.")
+REDIS_OPERATION_SECONDS = Histogram(
+    "redis_operation_seconds",
+    "Time spent in redis_utils calls, including (de)serialization.",
+    DURATION_BUCKETS,
+)
+REDIS_PAYLOAD_BYTES = Histogram(
+    "redis_payload_bytes",
+    "Size of session stores written to and read from Redis.",
+    SIZE_BUCKETS,
+)
+YOUTUBE_API_REQUESTS = Counter(
+    "youtube_api_requests_total", "videos.list requests by HTTP status."
+)
+
+_REGISTRY = [
+    PIPELINE_STAGE_SECONDS,
+    PIPELINE_RUNS,
+    REDIS_OPERATION_SECONDS,
+    REDIS_PAYLOAD_BYTES,
+    YOUTUBE_API_REQUESTS,
+]
+
+
+def render() -> str:
+    """All metrics of this process in the Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(_memory_lines())
+    return "\n".join(lines) + "\n"
+
+
+def _memory_lines() -> Iterable[str]:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = peak if sys.platform == "darwin" else peak * 1024
+    yield "# HELP process_peak_resident_memory_bytes Peak resident set size."
+    yield "# TYPE process_peak_resident_memory_bytes gauge"
+    yield f"process_peak_resident_memory_bytes {peak}"
+    try:
+        with open("/proc/self/statm") as statm:
+            resident = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return
+    yield "# HELP process_resident_memory_bytes Current resident set size."
+    yield "# TYPE process_resident_memory_bytes gauge"
+    yield f"process_resident_memory_bytes {resident}"
+
+
+def _labels(items: Tuple) -> str:
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
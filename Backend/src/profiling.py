@@ -0,0 +1,228 @@
+"""
+Profiling Module
+
+This module captures opt-in CPU profiles and tracemalloc allocation reports
+for single requests and the background pipelines they start. It is off
+unless PROFILING_ENABLED is set; then a request is profiled when it sends
+the profile header (with the profiling token, if one is configured) or is
+picked by PROFILE_SAMPLE_RATE.
+
+Only one profile runs at a time. cProfile and tracemalloc see the whole
+process, so work from concurrent requests shows up in the same report.
+Each profile is written to PROFILE_DIR as a pstats dump (for snakeviz or
+pstats) next to a JSON summary. The files are written by a background
+thread, so a profiled request does not hold up the event loop on disk IO.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Share of requests (or of queue worker pipelines) profiled without the header
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+# Required in the profile header and to read profiles when set
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 50))
+PROFILE_HEADER = "X-Profile"
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_TOP_ALLOCATIONS = 20
+
+_PROFILE_ID = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$")
+_NOOP = nullcontext()
+_active = threading.Lock()
+# One writer, so reports are written and pruned in the order they finished
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+# True/False once a request decided whether to profile; None outside requests
+_pipeline_requested: ContextVar[Optional[bool]] = ContextVar(
+    "profile_pipeline", default=None
+)
+
+
+def authorized(headers) -> bool:
+    """Whether a request carries the profiling token (always true without one)."""
+    if not PROFILING_TOKEN:
+        return True
+    return hmac.compare_digest(headers.get(PROFILE_TOKEN_HEADER, ""), PROFILING_TOKEN)
+
+
+def request_profile(headers, name: str):
+    """
+    Profile a request if it asked for it or was sampled.
+
+    The decision is remembered in the request's context, so a background
+    pipeline the request starts is profiled along with it.
+    """
+    if not PROFILING_ENABLED:
+        return _NOOP
+    requested = headers.get(PROFILE_HEADER) == "1" and authorized(headers)
+    selected = requested or random.random() < PROFILE_SAMPLE_RATE
+    _pipeline_requested.set(selected)
+    return profile(name) if selected else _NOOP
+
+
+def pipeline_profile(session_id: str):
+    """Profile a pipeline run started by a profiled request, or sampled in a worker."""
+    if not PROFILING_ENABLED:
+        return _NOOP
+    requested = _pipeline_requested.get()
+    if requested is None:
+        requested = random.random() < PROFILE_SAMPLE_RATE
+    return profile(f"pipeline {session_id}") if requested else _NOOP
+
+
+@contextmanager
+def profile(name: str):
+    """Profile the block; yields the profile ID, or None if it was skipped."""
+    if not _active.acquire(blocking=False):
+        logger.info("Not profiling %s: another profile is running", name)
+        yield None
+        return
+
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    profiler = cProfile.Profile()
+    started_tracing = not tracemalloc.is_tracing()
+    try:
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError as exc:  # another profiler, e.g. a debugger, is active
+            logger.warning("Not profiling %s: %s", name, exc)
+            yield None
+            return
+        try:
+            yield profile_id
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            _writer.submit(
+                _write, profile_id, name, elapsed, peak - baseline, profiler, snapshot
+            ).add_done_callback(_log_write_error)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _active.release()
+
+
+def flush() -> None:
+    """Wait until every finished profile has been written."""
+    _writer.submit(lambda: None).result()
+
+
+def recent_profiles(limit: int = PROFILE_KEEP) -> List[dict]:
+    """Summaries of the newest profiles, newest first."""
+    profiles = []
+    for path in _profile_paths(".json")[:limit]:
+        try:
+            with open(path, encoding="utf-8") as handle:
+                record = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        profiles.append(
+            {
+                key: record[key]
+                for key in ("id", "name", "startedAt", "durationMs", "peakBytes")
+            }
+        )
+    return profiles
+
+
+def load_profile(profile_id: str) -> Optional[dict]:
+    """Full JSON report of a profile, or None if there is no such profile."""
+    path = profile_path(profile_id, ".json")
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def profile_path(profile_id: str, suffix: str) -> Optional[str]:
+    """File of a profile; None for IDs that are not profile IDs."""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    return os.path.join(PROFILE_DIR, profile_id + suffix)
+
+
+def _write(profile_id, name, elapsed, peak, profiler, snapshot) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(profile_path(profile_id, ".prof"))
+
+    functions = io.StringIO()
+    pstats.Stats(profiler, stream=functions).sort_stats("cumulative").print_stats(
+        PROFILE_TOP_FUNCTIONS
+    )
+    allocations = [
+        {
+            "location": str(stat.traceback[0]),
+            "sizeBytes": stat.size,
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]
+    ]
+    record = {
+        "id": profile_id,
+        "name": name,
+        "startedAt": time.strftime(
+            "%Y-%m-%dT%H:%M:%S", time.localtime(time.time() - elapsed)
+        ),
+        "durationMs": round(elapsed * 1000, 1),
+        "peakBytes": peak,
+        "topAllocations": allocations,
+        "topFunctions": functions.getvalue(),
+    }
+    with open(profile_path(profile_id, ".json"), "w", encoding="utf-8") as handle:
+        json.dump(record, handle)
+    logger.info("Wrote profile %s for %s", profile_id, name)
+
+    for path in _profile_paths(".json")[PROFILE_KEEP:]:
+        for suffix in (".json", ".prof"):
+            try:
+                os.remove(path[: -len(".json")] + suffix)
+            except OSError:
+                pass
+
+
+def _log_write_error(future) -> None:
+    if future.exception() is not None:
+        logger.error("Failed to write profile: %s", future.exception())
+
+
+def _profile_paths(suffix: str) -> List[str]:
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except OSError:
+        return []
+    # IDs start with a timestamp, so name order is age order
+    return [
+        os.path.join(PROFILE_DIR, name)
+        for name in sorted(names, reverse=True)
+        if name.endswith(suffix)
+    ]
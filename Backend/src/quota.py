@@ -0,0 +1,221 @@
+"""
+Quota Module
+
+This module schedules YouTube Data API requests across every session, web
+worker and pipeline worker that shares a Redis instance.
+
+A token bucket caps the request rate, a per-day counter enforces the daily
+quota budget, and a round-robin ring of waiting sessions makes sure a small
+history gets its turn between the chunks of a very large one.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from . import redis_utils
+
+logger = logging.getLogger(__name__)
+
+YOUTUBE_API_RATE = float(os.getenv("YOUTUBE_API_RATE", 10))  # requests per second
+YOUTUBE_API_BURST = int(os.getenv("YOUTUBE_API_BURST", 20))
+YOUTUBE_API_DAILY_QUOTA = int(os.getenv("YOUTUBE_API_DAILY_QUOTA", 10000))
+# Every videos.list call costs one unit regardless of how many IDs it carries
+VIDEOS_LIST_COST = 1
+# Waiting sessions that stop polling for this long drop out of the ring
+WAITER_TTL_SECONDS = 30
+# The YouTube quota resets at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+_quota_scheduler = None
+
+
+class QuotaExceededError(Exception):
+    """Raised when the daily YouTube API quota has been used up."""
+
+
+# KEYS: ring, waiting key of the session
+# ARGV: session id, number of requests, waiter ttl
+_REGISTER_SCRIPT = """
+local waiting = redis.call('INCRBY', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if waiting > 0 and not redis.call('LPOS', KEYS[1], ARGV[1]) then
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+return waiting
+"""
+
+# Grant one request to the session at the head of the ring if the bucket and
+# the daily budget allow it. Returns {status, wait seconds}: 1 granted,
+# 0 not yet (not this session's turn or bucket empty), -1 budget exhausted.
+# A session further back is told to wait until the sessions ahead of it can
+# have taken their turns, so waiting workers do not poll Redis flat out.
+# KEYS: ring, bucket, used today, waiting key of the session
+# ARGV: session id, now, rate, burst, budget, waiting key prefix, waiter ttl,
+#       cost, used ttl
+_ACQUIRE_SCRIPT = """
+redis.call('EXPIRE', KEYS[4], ARGV[7])
+
+local now = tonumber(ARGV[2])
+local rate = tonumber(ARGV[3])
+local burst = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[2], 'tokens', 'updated')
+local tokens = tonumber(bucket[1] or ARGV[4])
+local updated = tonumber(bucket[2] or ARGV[2])
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+
+local head = redis.call('LINDEX', KEYS[1], 0)
+while head do
+    local waiting = tonumber(redis.call('GET', ARGV[6] .. head) or '0')
+    if waiting > 0 then
+        break
+    end
+    redis.call('LPOP', KEYS[1])
+    head = redis.call('LINDEX', KEYS[1], 0)
+end
+if head ~= ARGV[1] then
+    local position = redis.call('LPOS', KEYS[1], ARGV[1]) or 0
+    return {0, tostring(math.max(1, position + 1 - tokens) / rate)}
+end
+
+local used = tonumber(redis.call('GET', KEYS[3]) or '0')
+if used + tonumber(ARGV[8]) > tonumber(ARGV[5]) then
+    return {-1, '0'}
+end
+
+if tokens < 1 then
+    redis.call('HSET', KEYS[2], 'tokens', tostring(tokens), 'updated', ARGV[2])
+    return {0, tostring((1 - tokens) / rate)}
+end
+redis.call('HSET', KEYS[2], 'tokens', tostring(tokens - 1), 'updated', ARGV[2])
+redis.call('INCRBY', KEYS[3], ARGV[8])
+redis.call('EXPIRE', KEYS[3], ARGV[9])
+
+-- Hand the turn to the next session; rejoin at the back if more is pending
+redis.call('LPOP', KEYS[1])
+if redis.call('DECR', KEYS[4]) > 0 then
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+return {1, '0'}
+"""
+
+
+class QuotaScheduler:
+    def __init__(
+        self,
+        client,
+        name: str = "youtube",
+        rate: float = YOUTUBE_API_RATE,
+        burst: int = YOUTUBE_API_BURST,
+        daily_budget: int = YOUTUBE_API_DAILY_QUOTA,
+    ):
+        self.client = client
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.daily_budget = daily_budget
+        self.ring_key = f"{name}:quota:ring"
+        self.bucket_key = f"{name}:quota:bucket"
+        self.waiting_prefix = f"{name}:quota:waiting:"
+        self._register = client.register_script(_REGISTER_SCRIPT)
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+
+    def used_key(self, day: Optional[str] = None) -> str:
+        day = day or datetime.now(QUOTA_TIMEZONE).date().isoformat()
+        return f"{self.name}:quota:used:{day}"
+
+    def register(self, session_id: str, requests: int) -> int:
+        """Announce that a session has `requests` API calls waiting for quota."""
+        return int(
+            self._register(
+                keys=[self.ring_key, self.waiting_prefix + session_id],
+                args=[session_id, requests, WAITER_TTL_SECONDS],
+            )
+        )
+
+    def release(self, session_id: str, requests: int) -> None:
+        """Withdraw requests a session no longer needs (finished early or failed)."""
+        if requests > 0:
+            key = self.waiting_prefix + session_id
+            if self.client.decrby(key, requests) <= 0:
+                self.client.delete(key)
+
+    def try_acquire(self, session_id: str, cost: int = VIDEOS_LIST_COST) -> float:
+        """
+        Try to take one request slot for a session.
+
+        :return: 0 when granted, otherwise seconds to wait before retrying.
+        :raises QuotaExceededError: if the daily budget is used up.
+        """
+        status, wait = self._acquire(
+            keys=[
+                self.ring_key,
+                self.bucket_key,
+                self.used_key(),
+                self.waiting_prefix + session_id,
+            ],
+            args=[
+                session_id,
+                time.time(),
+                self.rate,
+                self.burst,
+                self.daily_budget,
+                self.waiting_prefix,
+                WAITER_TTL_SECONDS,
+                cost,
+                60 * 60 * 48,
+            ],
+        )
+        status = int(status)
+        if status == -1:
+            raise QuotaExceededError("YouTube API daily quota exhausted.")
+        return 0.0 if status == 1 else float(wait)
+
+    async def acquire(self, session_id: str, cost: int = VIDEOS_LIST_COST) -> None:
+        """Wait for this session's turn and a free request slot."""
+        while True:
+            wait = await asyncio.to_thread(self.try_acquire, session_id, cost)
+            if wait == 0:
+                return
+            await asyncio.sleep(min(wait, 1.0))
+
+    def mark_exhausted(self) -> None:
+        """Record that the API itself reported the quota as used up today."""
+        self.client.set(self.used_key(), self.daily_budget, ex=60 * 60 * 48)
+
+    def usage(self) -> dict:
+        """Current quota usage and the number of requests waiting for it."""
+        pipe = self.client.pipeline()
+        pipe.get(self.used_key())
+        pipe.lrange(self.ring_key, 0, -1)
+        used, ring = pipe.execute()
+        waiting = (
+            self.client.mget([self.waiting_prefix + _decode(sid) for sid in ring])
+            if ring
+            else []
+        )
+        queue_depth = sum(max(int(count or 0), 0) for count in waiting)
+        used = int(used or 0)
+        return {
+            "used": used,
+            "dailyBudget": self.daily_budget,
+            "remaining": max(self.daily_budget - used, 0),
+            "waitingSessions": len(ring),
+            "queueDepth": queue_depth,
+        }
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def get_quota_scheduler() -> QuotaScheduler:
+    """Return the shared quota scheduler on the app's Redis connection."""
+    global _quota_scheduler
+    if _quota_scheduler is None:
+        _quota_scheduler = QuotaScheduler(redis_utils.get_client())
+    return _quota_scheduler
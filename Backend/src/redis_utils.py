@@ -1,37 +1,206 @@
 import redis
 import json
+import logging
+import threading
+import time
 from typing import Optional
 from dotenv import load_dotenv
 import os
+from . import result_cache
+from .constants import SESSION_TTL_SECONDS
 from .data_store import DataStore
+from .metrics import REDIS_OPERATION_SECONDS, REDIS_PAYLOAD_BYTES
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Prefer Upstash connection URL when available, otherwise fall back to the local Redis host.
-upstash_url = os.getenv("UPSTASH_REDIS_URL")
-if upstash_url:
-    # Upstash issues TLS URLs, so redis.from_url will negotiate SSL automatically for rediss:// URIs.
-    redis_client = redis.from_url(upstash_url, db=0)
-else:
-    redis_host = os.getenv("REDIS_HOST", "localhost")
-    redis_port = int(os.getenv("REDIS_PORT", 6379))
-    redis_client = redis.Redis(host=redis_host, port=redis_port, db=0)
+logger = logging.getLogger(__name__)
 
+# Idle pooled connections are pinged before reuse after this many seconds
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+# Startup pings before giving up, doubling the delay after each failure
+REDIS_CONNECT_RETRIES = int(os.getenv("REDIS_CONNECT_RETRIES", 5))
+REDIS_CONNECT_BACKOFF_SECONDS = float(os.getenv("REDIS_CONNECT_BACKOFF_SECONDS", 0.5))
 
-def save_data_store(session_id: str, data_store: DataStore, expire: int = 3600):
-    """Serialize and save the DataStore object in Redis."""
-    redis_client.set(session_id, json.dumps(data_store.to_dict()), ex=expire)
+# Created by connect() in the app lifespan, or on first use in other processes
+redis_client: Optional[redis.Redis] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> redis.Redis:
+    """Return the shared Redis client, creating its connection pool if needed."""
+    global redis_client
+    if redis_client is None:
+        with _client_lock:
+            if redis_client is None:
+                redis_client = redis.Redis(connection_pool=_create_pool())
+    return redis_client
+
+
+def _create_pool() -> redis.ConnectionPool:
+    # Prefer Upstash connection URL when available, otherwise fall back to the local Redis host.
+    upstash_url = os.getenv("UPSTASH_REDIS_URL")
+    if upstash_url:
+        # Upstash issues TLS URLs, so from_url will negotiate SSL automatically for rediss:// URIs.
+        return redis.ConnectionPool.from_url(
+            upstash_url, db=0, health_check_interval=REDIS_HEALTH_CHECK_INTERVAL
+        )
+    return redis.ConnectionPool(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        db=0,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    )
+
+
+def ping() -> bool:
+    """Whether Redis answers right now."""
+    try:
+        return bool(get_client().ping())
+    except redis.RedisError:
+        return False
+
+
+def connect(
+    retries: int = REDIS_CONNECT_RETRIES,
+    backoff: float = REDIS_CONNECT_BACKOFF_SECONDS,
+) -> bool:
+    """
+    Create the connection pool and wait for Redis to answer a ping.
+
+    Redis that is briefly unavailable, e.g. during a rolling restart, is
+    retried with exponential backoff. If it stays down the failure is only
+    logged: the pool reconnects on the next command, and the health check
+    reports the outage in the meantime.
+
+    :return: Whether Redis answered.
+    """
+    for attempt in range(retries + 1):
+        if ping():
+            return True
+        if attempt < retries:
+            delay = backoff * 2**attempt
+            logger.warning("Redis is not reachable, retrying in %.1fs", delay)
+            time.sleep(delay)
+    logger.error("Redis is not reachable after %d attempts", retries + 1)
+    return False
+
+
+def disconnect():
+    """Close the pooled connections, e.g. at shutdown."""
+    if redis_client is not None:
+        redis_client.connection_pool.disconnect()
+
+
+class StaleGenerationError(Exception):
+    """Raised when a write comes from an upload that a newer one superseded."""
+
+
+def generation_key(session_id: str) -> str:
+    return f"{session_id}:generation"
+
+
+def next_generation(session_id: str, expire: int = SESSION_TTL_SECONDS) -> int:
+    """Start a new upload generation for a session and return its number."""
+    with REDIS_OPERATION_SECONDS.time(operation="next_generation"):
+        pipe = get_client().pipeline()
+        pipe.incr(generation_key(session_id))
+        pipe.expire(generation_key(session_id), expire)
+        generation, _ = pipe.execute()
+    return int(generation)
+
+
+def current_generation(session_id: str) -> int:
+    """Return the session's latest upload generation (0 before the first one)."""
+    with REDIS_OPERATION_SECONDS.time(operation="current_generation"):
+        return int(get_client().get(generation_key(session_id)) or 0)
+
+
+def set_queue_position(
+    session_id: str, position: Optional[int], expire: int = SESSION_TTL_SECONDS
+):
+    """Record where a session's pipeline waits for admission (None clears it)."""
+    key = f"{session_id}:queue_position"
+    with REDIS_OPERATION_SECONDS.time(operation="set_queue_position"):
+        if position is None:
+            get_client().delete(key)
+        else:
+            get_client().set(key, position, ex=expire)
+
+
+def get_queue_position(session_id: str) -> Optional[int]:
+    with REDIS_OPERATION_SECONDS.time(operation="get_queue_position"):
+        position = get_client().get(f"{session_id}:queue_position")
+    return int(position) if position is not None else None
+
+
+def save_data_store(
+    session_id: str, data_store: DataStore, expire: int = SESSION_TTL_SECONDS
+):
+    """
+    Serialize and save the DataStore object in Redis.
+
+    The write only goes through while the store's generation is still the
+    session's current one, so a pipeline of a superseded upload can never
+    overwrite the newer session. A store holding a cached result only saves
+    its reference to it, which is renewed with the session.
+
+    :raises StaleGenerationError: if a newer upload started in the meantime.
+    """
+    result_hash = data_store.result_hash
+    with REDIS_OPERATION_SECONDS.time(operation="serialize"):
+        payload = json.dumps(data_store.to_dict(include_results=not result_hash))
+    REDIS_PAYLOAD_BYTES.observe(len(payload), operation="save")
+    key = generation_key(session_id)
+
+    def compare_and_set(pipe):
+        current = int(pipe.get(key) or 0)
+        if current != data_store.generation:
+            raise StaleGenerationError(
+                f"Generation {data_store.generation} of session {session_id} "
+                f"was superseded by generation {current}."
+            )
+        pipe.multi()
+        pipe.set(session_id, payload, ex=expire)
+        pipe.expire(key, expire)
+        if result_hash:
+            pipe.zadd(
+                result_cache.get_result_cache().references_key(result_hash),
+                {session_id: time.time() + expire},
+            )
+
+    # Retried if the generation changes between WATCH and EXEC, which then
+    # fails the comparison above
+    with REDIS_OPERATION_SECONDS.time(operation="save"):
+        get_client().transaction(compare_and_set, key)
 
 
 def load_data_store(session_id: str) -> Optional[DataStore]:
     """Load and deserialize the DataStore object from Redis."""
-    data = redis_client.get(session_id)
-    if data:
-        return DataStore.from_dict(json.loads(data))
-    return None
+    with REDIS_OPERATION_SECONDS.time(operation="load"):
+        data = get_client().get(session_id)
+    if not data:
+        return None
+    REDIS_PAYLOAD_BYTES.observe(len(data), operation="load")
+    with REDIS_OPERATION_SECONDS.time(operation="deserialize"):
+        fields = json.loads(data)
+    result_hash = fields.get("result_hash")
+    if result_hash:
+        with REDIS_OPERATION_SECONDS.time(operation="load_result"):
+            results = result_cache.get_result_cache().load(result_hash)
+        if results is None:
+            # Referenced results are never evicted, but Redis may still drop
+            # them under memory pressure
+            logger.warning(
+                "Cached result %s of session %s is gone", result_hash, session_id
+            )
+            return None
+        fields.update(results)
+    with REDIS_OPERATION_SECONDS.time(operation="deserialize"):
+        return DataStore.from_dict(fields)
 
 
 def delete_data_store(session_id: str):
     """Delete the DataStore object from Redis."""
-    redis_client.delete(session_id)
+    with REDIS_OPERATION_SECONDS.time(operation="delete"):
+        get_client().delete(session_id)
@@ -0,0 +1,177 @@
+"""
+Result Cache Module
+
+This module shares finished pipeline results between sessions that upload
+the same export, e.g. after a refresh, from another device or once their
+session expired. Results are keyed by the SHA-256 of the upload, so a
+repeated upload skips parsing, metadata requests and analytics entirely:
+its session only stores a reference to the cached result.
+
+Every session holding a result is recorded as a reference that expires with
+the session. Once the cache outgrows RESULT_CACHE_MAX_BYTES, the least
+recently used results without live references are evicted.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from . import redis_utils
+from .constants import SESSION_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Total size of cached results before unreferenced ones are evicted; 0 disables
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Bump when the stored result format or the pipeline output changes
+RESULT_CACHE_VERSION = 1
+
+_result_cache = None
+
+# Reference a cached result and mark it as recently used. Returns the result,
+# or nil when it is not cached.
+# KEYS: result, references, lru; ARGV: digest, session id, now, reference expiry
+_ACQUIRE_SCRIPT = """
+local result = redis.call('GET', KEYS[1])
+if result then
+    redis.call('ZADD', KEYS[2], ARGV[4], ARGV[2])
+    redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+end
+return result
+"""
+
+# Store a result with a reference from its session, then evict the least
+# recently used unreferenced results until the cache fits its budget again.
+# Returns the number of results evicted.
+# KEYS: result, references, lru, sizes
+# ARGV: digest, session id, now, reference expiry, payload, max bytes, key prefix
+_PUBLISH_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[5], 'NX') then
+    redis.call('HSET', KEYS[4], ARGV[1], string.len(ARGV[5]))
+end
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[2])
+redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+
+local total = 0
+for _, size in ipairs(redis.call('HVALS', KEYS[4])) do
+    total = total + tonumber(size)
+end
+local evicted = 0
+local max_bytes = tonumber(ARGV[6])
+if total <= max_bytes then
+    return evicted
+end
+for _, digest in ipairs(redis.call('ZRANGE', KEYS[3], 0, -1)) do
+    local references = ARGV[7] .. digest .. ':refs'
+    redis.call('ZREMRANGEBYSCORE', references, '-inf', ARGV[3])
+    if redis.call('ZCARD', references) == 0 then
+        total = total - tonumber(redis.call('HGET', KEYS[4], digest) or '0')
+        redis.call('DEL', ARGV[7] .. digest, references)
+        redis.call('HDEL', KEYS[4], digest)
+        redis.call('ZREM', KEYS[3], digest)
+        evicted = evicted + 1
+        if total <= max_bytes then
+            break
+        end
+    end
+end
+return evicted
+"""
+
+
+class ResultCache:
+    def __init__(
+        self,
+        client,
+        name: str = f"results:v{RESULT_CACHE_VERSION}",
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+    ):
+        self.client = client
+        self.name = name
+        self.max_bytes = max_bytes
+        self.lru_key = f"{name}:lru"
+        self.sizes_key = f"{name}:sizes"
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+        self._publish = client.register_script(_PUBLISH_SCRIPT)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def result_key(self, digest: str) -> str:
+        return f"{self.name}:{digest}"
+
+    def references_key(self, digest: str) -> str:
+        return f"{self.name}:{digest}:refs"
+
+    def acquire(
+        self, digest: str, session_id: str, expire: int = SESSION_TTL_SECONDS
+    ) -> Optional[dict]:
+        """
+        Reference the cached result of an upload from a session.
+
+        :return: The result's fields, or None when the upload has no result.
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        payload = self._acquire(
+            keys=[self.result_key(digest), self.references_key(digest), self.lru_key],
+            args=[digest, session_id, now, now + expire],
+        )
+        return json.loads(payload) if payload is not None else None
+
+    def publish(
+        self,
+        digest: str,
+        results: dict,
+        session_id: str,
+        expire: int = SESSION_TTL_SECONDS,
+    ) -> bool:
+        """
+        Cache the finished result of an upload, referenced by its session.
+
+        :return: Whether the result was cached (False when the cache is off).
+        """
+        if not self.enabled:
+            return False
+        now = time.time()
+        evicted = self._publish(
+            keys=[
+                self.result_key(digest),
+                self.references_key(digest),
+                self.lru_key,
+                self.sizes_key,
+            ],
+            args=[
+                digest,
+                session_id,
+                now,
+                now + expire,
+                json.dumps(results),
+                self.max_bytes,
+                f"{self.name}:",
+            ],
+        )
+        if evicted:
+            logger.info("Evicted %d cached results", evicted)
+        return True
+
+    def load(self, digest: str) -> Optional[dict]:
+        """The cached result's fields, or None if it is gone."""
+        payload = self.client.get(self.result_key(digest))
+        return json.loads(payload) if payload is not None else None
+
+    def release(self, digest: str, session_id: str) -> None:
+        """Drop a session's reference, e.g. when it uploads something else."""
+        self.client.zrem(self.references_key(digest), session_id)
+
+
+def get_result_cache() -> ResultCache:
+    """Return the shared result cache on the app's Redis connection."""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache(redis_utils.get_client())
+    return _result_cache
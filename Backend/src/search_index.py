@@ -0,0 +1,123 @@
+"""
+Search Index Module
+
+This module builds a compact inverted index over the titles and channel names
+of a session's unique videos and answers search queries from it without
+scanning the watch history.
+"""
+
+import re
+from bisect import bisect_left
+
+from .lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Prefix spans wider than this are merged once instead of probed per token
+MAX_PREFIX_EXPANSION = 64
+
+
+def tokenize(text):
+    """Function to split text into lowercase word tokens."""
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def build_search_index(unique_vids):
+    """
+    Build an inverted index mapping tokens to sorted arrays of unique video rows.
+
+    :param unique_vids: List of (title, channelTitle) pairs, one per unique video.
+    :return: Dictionary holding the sorted vocabulary, CSR-style posting offsets
+        and the concatenated posting array.
+    """
+    documents = pd.Series(
+        [f"{title} {channel}" for title, channel in unique_vids], dtype="object"
+    )
+    tokens = documents.str.lower().str.findall(TOKEN_PATTERN.pattern).explode()
+    pairs = pd.DataFrame(
+        {"token": tokens.to_numpy(), "row": tokens.index.to_numpy(dtype=np.int64)}
+    ).dropna()
+    pairs = pairs.drop_duplicates()
+
+    codes, vocabulary = pd.factorize(pairs["token"], sort=True)
+    rows = pairs["row"].to_numpy(dtype=np.int32)
+
+    # Group postings by token, keeping rows ascending inside each posting list
+    order = np.lexsort((rows, codes))
+    postings = rows[order]
+    offsets = np.searchsorted(codes[order], np.arange(len(vocabulary) + 1)).astype(
+        np.int64
+    )
+
+    return {
+        "vocabulary": [str(token) for token in vocabulary],
+        "offsets": offsets,
+        "postings": postings,
+    }
+
+
+def search(index, query):
+    """
+    Return the unique video rows matching every token of the query.
+
+    The final query token is treated as a prefix so results update while the
+    user is still typing.
+
+    :param index: Index produced by build_search_index.
+    :param query: Free-text search query.
+    :return: Sorted int32 array of matching rows in unique_vids.
+    """
+    query_tokens = tokenize(query)
+    if not index or not query_tokens:
+        return np.empty(0, dtype=np.int32)
+
+    vocabulary = index["vocabulary"]
+    offsets = index["offsets"]
+    postings = index["postings"]
+
+    spans = []
+    for position, token in enumerate(query_tokens):
+        first = bisect_left(vocabulary, token)
+        if position == len(query_tokens) - 1:
+            last = bisect_left(vocabulary, token + "\uffff", lo=first)
+        else:
+            found = first < len(vocabulary) and vocabulary[first] == token
+            last = first + 1 if found else first
+
+        if first == last:
+            return np.empty(0, dtype=np.int32)
+        spans.append((first, last))
+
+    # Start from the shortest exact posting list; the prefix span goes last
+    spans.sort(
+        key=lambda span: (span[1] - span[0] > 1, offsets[span[1]] - offsets[span[0]])
+    )
+
+    first, last = spans[0]
+    matches = postings[offsets[first] : offsets[last]]
+    if last - first > 1:
+        matches = np.unique(matches)
+
+    for first, last in spans[1:]:
+        if len(matches) == 0:
+            break
+        if last - first > MAX_PREFIX_EXPANSION:
+            # Very short prefixes cover too many tokens to probe one by one
+            merged = np.unique(postings[offsets[first] : offsets[last]])
+            keep = _contains(merged, matches)
+        else:
+            keep = np.zeros(len(matches), dtype=bool)
+            for code in range(first, last):
+                keep |= _contains(postings[offsets[code] : offsets[code + 1]], matches)
+        matches = matches[keep]
+
+    return matches
+
+
+def _contains(sorted_rows, candidates):
+    """Vectorized membership test of candidates against a sorted posting list."""
+    positions = np.searchsorted(sorted_rows, candidates)
+    positions[positions == len(sorted_rows)] = len(sorted_rows) - 1
+    return sorted_rows[positions] == candidates
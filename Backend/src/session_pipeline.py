@@ -2,14 +2,44 @@ import asyncio
 import json
 import logging
 import uuid
-from typing import Optional
-
-from . import analytics, api_handling, data_processing, visualization
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from . import (
+    analytics,
+    api_handling,
+    data_processing,
+    ingestion,
+    profiling,
+    search_index,
+    video_index,
+    visualization,
+)
+from .admission import MAX_QUEUED_PIPELINES, get_admission_controller
+from .constants import PIPELINE_EXECUTION
 from .data_store import DataStore, DataStoreState
-from .redis_utils import delete_data_store, load_data_store, save_data_store
+from .job_queue import get_job_queue
+from .metrics import PIPELINE_RUNS, PIPELINE_STAGE_SECONDS
+from .redis_utils import (
+    StaleGenerationError,
+    current_generation,
+    delete_data_store,
+    get_queue_position,
+    load_data_store,
+    next_generation,
+    save_data_store,
+    set_queue_position,
+)
+from .result_cache import get_result_cache
+from .lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
 
 logger = logging.getLogger(__name__)
 
+# How often a running pipeline checks whether a newer upload superseded it
+GENERATION_POLL_SECONDS = 1.0
+
 
 async def load_store(session_id: str) -> Optional[DataStore]:
     """Fetch a DataStore object from Redis on a worker thread."""
@@ -35,19 +65,210 @@ def new_session_id() -> str:
     return str(uuid.uuid4())
 
 
-async def process_data_pipeline(session_id: str) -> None:
-    """Run the data ingestion + analytics pipeline."""
+async def start_generation(session_id: str) -> int:
+    """Begin a new upload generation, superseding any pipeline still running."""
+    return await asyncio.to_thread(next_generation, session_id)
+
+
+def supports_incremental(store: Optional[DataStore]) -> bool:
+    """Whether an upload can be merged into this store instead of replacing it."""
+    return bool(
+        store is not None
+        and not store.error_message
+        and store.high_water_mark
+        and store.watch_metrics
+        and not store.complete_data.empty
+        and store.current_state()
+        not in (
+            DataStoreState.QUEUED,
+            DataStoreState.REQUESTING_DATA,
+            DataStoreState.GENERATING_ANALYTICS,
+        )
+    )
+
+
+def apply_upload(
+    store: DataStore,
+    parsed: ingestion.ParsedUpload,
+    upload_bytes: int = 0,
+    upload_hash: Optional[str] = None,
+) -> bool:
+    """
+    Copy a parsed upload into the store.
+
+    Uploads parsed against a high-water mark (parsed.since) are merged into
+    the existing history. Returns False when there is nothing new for the
+    pipeline to do.
+    """
+    incremental = parsed.since is not None
+
+    store.filtered_json_data = parsed.filtered_json_data
+    store.incremental_update = incremental
+    store.upload_bytes = upload_bytes
+    # The result of a merged upload depends on the history before it, so only
+    # full uploads are cached
+    store.upload_hash = None if incremental else upload_hash
+    if incremental:
+        store.removed_video_count += parsed.removed_video_count
+    else:
+        store.removed_video_count = parsed.removed_video_count
+
+    latest = parsed.latest_watch_date
+    if latest is not None and (
+        not incremental
+        or datetime.fromisoformat(latest) > datetime.fromisoformat(parsed.since)
+    ):
+        store.high_water_mark = latest
+
+    if incremental and not parsed.filtered_json_data:
+        # Nothing newer than what the session already holds
+        store.state_queue.clear()
+        store.update_state(DataStoreState.COMPLETE)
+        return False
+    return True
+
+
+async def attach_cached_result(
+    session_id: str, store: DataStore, upload_hash: str
+) -> bool:
+    """
+    Point the store at the result of an identical earlier upload.
+
+    The store completes at once, without parsing or running the pipeline.
+    Returns False when no result is cached for the upload.
+    """
+    results = await asyncio.to_thread(
+        get_result_cache().acquire, upload_hash, session_id
+    )
+    if results is None:
+        return False
+
+    store.result_hash = upload_hash
+    store.watch_dates_sorted = results.get("watch_dates_sorted", False)
+    store.removed_video_count = results["removed_video_count"]
+    store.missing_video_count = results["missing_video_count"]
+    store.skipped_missing_count = results.get("skipped_missing_count", 0)
+    store.high_water_mark = results["high_water_mark"]
+    store.num_of_pages = results["num_of_pages"]
+    store.state_queue.clear()
+    store.update_state(DataStoreState.COMPLETE)
+    PIPELINE_RUNS.inc(outcome="cached")
+    return True
+
+
+async def release_result(session_id: str, store: Optional[DataStore]) -> None:
+    """Drop the store's reference to a cached result before it changes."""
+    if store is not None and store.result_hash:
+        await asyncio.to_thread(
+            get_result_cache().release, store.result_hash, session_id
+        )
+        # The store keeps the loaded results and saves them as its own
+        store.result_hash = None
+
+
+async def pipeline_queue_full() -> bool:
+    """Whether new uploads should be turned away until pipelines drain."""
+    if PIPELINE_EXECUTION == "queue":
+        stats = await asyncio.to_thread(get_job_queue().stats)
+        return stats["pending"] >= MAX_QUEUED_PIPELINES
+    return get_admission_controller().is_full()
+
+
+async def schedule_pipeline(session_id: str, background_tasks) -> None:
+    """Start the pipeline for a session in the configured execution backend."""
+    if PIPELINE_EXECUTION == "queue":
+        generation = await asyncio.to_thread(current_generation, session_id)
+        await asyncio.to_thread(
+            get_job_queue().enqueue, session_id, generation=generation
+        )
+    else:
+        background_tasks.add_task(process_data_pipeline, session_id)
+
+
+async def process_data_pipeline(session_id: str, retry: bool = False) -> None:
+    """
+    Run the data ingestion + analytics pipeline.
+
+    The run belongs to the upload generation stored with the session. If the
+    user uploads again meanwhile, the run is cancelled, and any save it still
+    attempts is rejected.
+
+    Errors the user can act on (invalid data, exhausted quota) are stored on
+    the session. Unexpected ones, such as a YouTube API or Redis outage, mark
+    the session failed; with retry=True they are raised instead and the
+    session is left as it was, so the caller can run the pipeline again.
+    """
+    store = await load_store(session_id)
+    generation = store.generation if store is not None else 0
+
+    with profiling.pipeline_profile(session_id):
+        await _supervise_pipeline(session_id, store, generation, retry)
+
+
+async def _supervise_pipeline(
+    session_id: str, store: Optional[DataStore], generation: int, retry: bool
+) -> None:
+    run = asyncio.create_task(_run_pipeline(session_id, store, generation, retry))
+    watcher = asyncio.create_task(_cancel_when_superseded(session_id, generation, run))
     try:
-        data_ready = await request_data(session_id)
+        with PIPELINE_STAGE_SECONDS.time(stage="pipeline"):
+            finished = await run
+        PIPELINE_RUNS.inc(outcome="finished" if finished else "failed")
+    except asyncio.CancelledError:
+        if not (watcher.done() and not watcher.cancelled() and watcher.result()):
+            raise
+        PIPELINE_RUNS.inc(outcome="superseded")
+        logger.info("Pipeline for session %s cancelled by a newer upload", session_id)
+    except StaleGenerationError as e:
+        PIPELINE_RUNS.inc(outcome="superseded")
+        logger.info("Pipeline for session %s superseded: %s", session_id, e)
+    except Exception:
+        PIPELINE_RUNS.inc(outcome="failed")
+        raise
+    finally:
+        watcher.cancel()
+
+
+async def _run_pipeline(
+    session_id: str, store: Optional[DataStore], generation: int, retry: bool
+) -> bool:
+    """Run the pipeline stages. Returns False when the session ends up failed."""
+    try:
+        resuming = (
+            store is not None
+            and store.current_state() == DataStoreState.GENERATING_ANALYTICS
+        )
+        admission = get_admission_controller()
+        cost = admission.estimate_cost(store.upload_bytes if store else 0)
 
-        if not data_ready:
-            return
+        queued = False
 
-        await generate_analytics(session_id)
-    except Exception as e:  # pragma: no cover - defensive logging
+        async def on_queued(position: int) -> None:
+            nonlocal queued
+            await asyncio.to_thread(set_queue_position, session_id, position)
+            if not queued:
+                queued = True
+                await _mark_queued(session_id, generation)
+
+        async with admission.admit(session_id, cost, on_queued):
+            await _mark_admitted(session_id, generation)
+
+            # A retried job whose metadata was already fetched resumes at analytics
+            data_ready = resuming or await request_data(session_id, generation)
+
+            if not data_ready:
+                return False
+
+            return await generate_analytics(session_id, generation)
+    except StaleGenerationError:
+        raise
+    except Exception as e:
         logger.exception("Pipeline error for session %s: %s", session_id, e)
+        if retry:
+            raise
         store = await load_store(session_id)
         store = ensure_datastore(store)
+        _check_generation(store, generation)
         store.error_message = "Failed to process data pipeline."
         try:
             await save_store(session_id, store)
@@ -57,11 +278,51 @@ async def process_data_pipeline(session_id: str) -> None:
                 session_id,
                 persist_err,
             )
+        return False
+
 
+async def _cancel_when_superseded(
+    session_id: str, generation: int, run: asyncio.Task
+) -> bool:
+    # Polls the generation so chunk fetches stop as soon as the user re-uploads
+    while not run.done():
+        await asyncio.sleep(GENERATION_POLL_SECONDS)
+        if await asyncio.to_thread(current_generation, session_id) != generation:
+            run.cancel()
+            return True
+    return False
 
-async def request_data(session_id: str) -> bool:
+
+async def _mark_queued(session_id: str, generation: int) -> None:
+    store = ensure_datastore(await load_store(session_id))
+    _check_generation(store, generation)
+    if store.current_state() != DataStoreState.QUEUED:
+        store.state_queue.appendleft(DataStoreState.QUEUED)
+        await save_store(session_id, store)
+
+
+async def _mark_admitted(session_id: str, generation: int) -> None:
+    if await asyncio.to_thread(get_queue_position, session_id) is None:
+        return
+    await asyncio.to_thread(set_queue_position, session_id, None)
+    store = ensure_datastore(await load_store(session_id))
+    _check_generation(store, generation)
+    if store.current_state() == DataStoreState.QUEUED:
+        store.process_next_state()
+        await save_store(session_id, store)
+
+
+def _check_generation(store: DataStore, generation: Optional[int]) -> None:
+    if generation is not None and store.generation != generation:
+        raise StaleGenerationError(
+            f"Generation {generation} was superseded by generation {store.generation}."
+        )
+
+
+async def request_data(session_id: str, generation: Optional[int] = None) -> bool:
     store = await load_store(session_id)
     store = ensure_datastore(store)
+    _check_generation(store, generation)
 
     try:
         if not getattr(store, "filtered_json_data", None):
@@ -74,11 +335,52 @@ async def request_data(session_id: str) -> bool:
         if not youtube_videos:
             raise ValueError("No videos available after filtering.")
 
-        vid_info_df = await api_handling.request_data(youtube_videos)
-
-        store.complete_data = data_processing.merge_data(
-            vid_info_df=vid_info_df, videos=youtube_videos
-        )
+        if store.incremental_update and not store.complete_data.empty:
+            # Only IDs the session has never seen need an API lookup
+            known_metadata = data_processing.known_video_metadata(store.complete_data)
+            known_ids = set(known_metadata["id"])
+            with PIPELINE_STAGE_SECONDS.time(stage="fetch_metadata"):
+                fetched_df, skipped = await api_handling.request_data(
+                    [video for video in youtube_videos if video.id not in known_ids],
+                    session_id=session_id,
+                )
+            with PIPELINE_STAGE_SECONDS.time(stage="merge_data"):
+                new_rows = data_processing.merge_data(
+                    vid_info_df=pd.concat(
+                        [known_metadata, fetched_df], ignore_index=True
+                    ),
+                    videos=youtube_videos,
+                )
+            # Takeout lists newest first, so the new rows go ahead of the old ones
+            store.watch_dates_sorted = (
+                store.watch_dates_sorted
+                and data_processing.continues_newest_first(
+                    new_rows, store.complete_data
+                )
+            )
+            store.complete_data = pd.concat(
+                [new_rows, store.complete_data], ignore_index=True
+            )
+            store.new_row_count = len(new_rows)
+            store.missing_video_count += len(youtube_videos) - len(new_rows)
+            store.skipped_missing_count += skipped
+        else:
+            with PIPELINE_STAGE_SECONDS.time(stage="fetch_metadata"):
+                vid_info_df, skipped = await api_handling.request_data(
+                    youtube_videos, session_id=session_id
+                )
+
+            with PIPELINE_STAGE_SECONDS.time(stage="merge_data"):
+                store.complete_data = data_processing.merge_data(
+                    vid_info_df=vid_info_df, videos=youtube_videos
+                )
+            if store.complete_data.empty:
+                raise ValueError("No videos with available metadata.")
+            store.watch_dates_sorted = True
+            # Entries whose video is deleted or private get no metadata
+            store.missing_video_count = len(youtube_videos) - len(store.complete_data)
+            store.skipped_missing_count = skipped
+            store.incremental_update = False
 
         store.process_next_state()
         store.update_state(DataStoreState.GENERATING_ANALYTICS)
@@ -86,29 +388,35 @@ async def request_data(session_id: str) -> bool:
         await save_store(session_id, store)
         return True
 
+    except StaleGenerationError:
+        raise
+
     except json.JSONDecodeError as e:
         logger.error("JSON decoding error during request_data: %s", e)
         store.error_message = "Invalid JSON encountered while requesting data."
         await save_store(session_id, store)
         return False
 
-    except ValueError as e:
-        logger.error("Validation error during request_data: %s", e)
-        store.error_message = str(e)
+    except api_handling.QuotaExceededError as e:
+        logger.warning("YouTube API quota exhausted for session %s: %s", session_id, e)
+        store.error_message = (
+            "The daily YouTube API quota has been used up. Please try again tomorrow."
+        )
         await save_store(session_id, store)
         return False
 
-    except Exception as e:  # pragma: no cover - defensive logging
-        logger.exception("Error during request_data: %s", e)
-        store.error_message = f"Request step failed: {e}"
+    except ValueError as e:
+        logger.error("Validation error during request_data: %s", e)
+        store.error_message = str(e)
         await save_store(session_id, store)
         return False
 
 
-async def generate_analytics(session_id: str) -> None:
-    """Generates analytics and updates Redis."""
+async def generate_analytics(session_id: str, generation: Optional[int] = None) -> bool:
+    """Generates analytics and updates Redis. Returns False if they failed."""
     store = await load_store(session_id)
     store = ensure_datastore(store)
+    _check_generation(store, generation)
 
     try:
         complete_data = getattr(store, "complete_data", None)
@@ -128,12 +436,35 @@ async def generate_analytics(session_id: str) -> None:
             )
 
         store.page_num = 1
-        store.unique_vids = (
-            complete_data[["title", "channelTitle"]]
-            .drop_duplicates()
-            .to_records(index=False)
-            .tolist()
-        )
+        with PIPELINE_STAGE_SECONDS.time(stage="analytics"):
+            if store.incremental_update and store.watch_metrics and store.video_index:
+                # Fold only the newly merged rows into the existing aggregates
+                new_rows = complete_data.iloc[: store.new_row_count]
+                unique_table = video_index.merge_unique_video_tables(
+                    video_index.build_unique_video_table(new_rows),
+                    video_index.unique_table_from_index(
+                        store.unique_vids, store.video_index
+                    ),
+                )
+                store.watch_metrics = analytics.merge_watch_metrics(
+                    store.watch_metrics, analytics.compute_watch_metrics(new_rows)
+                )
+            else:
+                unique_table = video_index.build_unique_video_table(complete_data)
+                store.watch_metrics = analytics.compute_watch_metrics(complete_data)
+            # Prefix sums cannot be merged cheaply, so the cube is rebuilt over
+            # the whole history; it is one vectorized pass
+            store.watch_metrics["watch_cube"] = analytics.build_watch_cube(
+                complete_data, store.watch_metrics["channel_names"]
+            )
+
+            store.unique_vids = (
+                unique_table[["title", "channelTitle"]].to_records(index=False).tolist()
+            )
+            store.video_index = video_index.build_video_index(unique_table)
+            store.search_index = search_index.build_search_index(store.unique_vids)
+        store.incremental_update = False
+        store.new_row_count = 0
         store.num_of_pages = (
             len(store.unique_vids) + store.max_rows - 1
         ) // store.max_rows
@@ -141,17 +472,58 @@ async def generate_analytics(session_id: str) -> None:
         store.process_next_state()
         store.update_state(DataStoreState.COMPLETE)
 
+        if store.upload_hash:
+            await _publish_result(session_id, store)
         await save_store(session_id, store)
+        return True
+
+    except StaleGenerationError:
+        raise
 
     except ValueError as e:
         logger.error("Validation error generating analytics: %s", e)
         store.error_message = str(e)
         await save_store(session_id, store)
+        return False
 
+
+async def _publish_result(session_id: str, store: DataStore) -> None:
+    def publish():
+        return get_result_cache().publish(
+            store.upload_hash, store.results(), session_id
+        )
+
+    try:
+        with PIPELINE_STAGE_SECONDS.time(stage="publish_result"):
+            published = await asyncio.to_thread(publish)
     except Exception as e:  # pragma: no cover - defensive logging
-        logger.exception("Error generating analytics: %s", e)
-        store.error_message = "Failed to generate analytics."
-        await save_store(session_id, store)
+        # The session keeps its own copy; only later identical uploads lose out
+        logger.warning("Failed to cache the result of session %s: %s", session_id, e)
+        return
+    if published:
+        store.result_hash = store.upload_hash
+
+
+async def load_watch_cube(store: DataStore) -> Tuple[dict, List[str]]:
+    """
+    Return the store's watch cube and the channel names it is keyed by.
+
+    Sessions analyzed before the cube, or before watch metrics were kept,
+    get them built on demand.
+    """
+    if not store.watch_metrics:
+        store.watch_metrics = await asyncio.to_thread(
+            analytics.compute_watch_metrics, store.complete_data
+        )
+    cube = store.watch_metrics.get("watch_cube")
+    if cube is None:
+        cube = await asyncio.to_thread(
+            analytics.build_watch_cube,
+            store.complete_data,
+            store.watch_metrics["channel_names"],
+        )
+        store.watch_metrics["watch_cube"] = cube
+    return cube, store.watch_metrics["channel_names"]
 
 
 async def generate_analytics_context(session_id: str) -> dict:
@@ -174,9 +546,18 @@ async def generate_analytics_context(session_id: str) -> dict:
         "unique_vids": store.unique_vids[: store.max_rows],
         "total_vids": int(getattr(store.complete_data, "shape", [0, 0])[0]),
         "total_unique_channels": analytics.unique_channels(store.complete_data),
+        "removed_video_count": store.removed_video_count,
+        "missing_video_count": store.missing_video_count,
+        "skipped_missing_count": store.skipped_missing_count,
     }
 
-    updated_context = visualization.prepare_visualizations(store.complete_data, context)
+    cube, channel_names = await load_watch_cube(store)
+    context = analytics.summarize_watch_metrics(store.watch_metrics, context)
+
+    with PIPELINE_STAGE_SECONDS.time(stage="render_charts"):
+        updated_context = visualization.prepare_visualizations(
+            store.complete_data, context, cube, channel_names
+        )
     final_context = analytics.calculate_total_watch_time(
         store.complete_data["duration"].tolist(), updated_context
     )
@@ -0,0 +1,234 @@
+"""
+Synthetic History Module
+
+This module generates deterministic, Takeout-shaped watch histories for
+tests, benchmarks and load tests. Video popularity and channel sizes follow
+Zipf distributions like real histories do, and a share of the entries are
+ads or removed videos.
+
+Video IDs encode their channel, so the metadata of any generated video can
+be reproduced from the ID alone (see video_metadata), which is what the
+YouTube API stub serves.
+
+    python -m src.synthetic_history --entries 300000 --out watch-history.json
+    python -m src.synthetic_history --entries 300000 --out watch-history.html
+"""
+
+import argparse
+import html
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+REMOVED_VIDEO_TITLE = "Watched a video that has been removed"
+ACTIVITY_CONTROLS = ["YouTube watch history"]
+# IDs look like "c0a3fv01b2c": channel and video number in hex, 11 characters
+# like real YouTube IDs
+_ID_PREFIX_CHANNEL = "c"
+_ID_PREFIX_VIDEO = "v"
+
+
+def generate_watch_history(
+    size: int,
+    seed: int = 0,
+    ad_ratio: float = 0.05,
+    removed_ratio: float = 0.02,
+    video_count: Optional[int] = None,
+    channel_count: Optional[int] = None,
+    video_zipf: float = 1.1,
+    channel_zipf: float = 1.2,
+    start: datetime = datetime(2020, 1, 1, tzinfo=timezone.utc),
+    end: datetime = datetime(2025, 1, 1, tzinfo=timezone.utc),
+) -> List[dict]:
+    """
+    Generate a watch-history.json entry list, newest entry first.
+
+    :param size: Number of entries.
+    :param seed: Random seed; the same arguments always give the same history.
+    :param ad_ratio: Share of entries watched from ads (they carry `details`).
+    :param removed_ratio: Share of entries for videos that have been removed.
+    :param video_count: Distinct videos to draw from (default size // 4).
+    :param channel_count: Distinct channels (default video_count // 20).
+    :param video_zipf: Zipf exponent of video popularity.
+    :param channel_zipf: Zipf exponent of how videos spread over channels.
+    :param start: Earliest watch time.
+    :param end: Latest watch time.
+    :return: List of dictionaries matching models.WatchedItem.
+    """
+    rng = np.random.default_rng(seed)
+    video_count = video_count or max(size // 4, 1)
+    channel_count = channel_count or max(video_count // 20, 1)
+
+    video_channels = rng.choice(
+        channel_count, size=video_count, p=_zipf_weights(channel_count, channel_zipf)
+    )
+    videos = rng.choice(
+        video_count, size=size, p=_zipf_weights(video_count, video_zipf)
+    )
+    kinds = rng.random(size)
+
+    start_ms = int(start.timestamp() * 1000)
+    end_ms = int(end.timestamp() * 1000)
+    # Takeout lists the newest entry first
+    watched_ms = np.sort(rng.integers(start_ms, end_ms, size=size))[::-1]
+    times = (
+        pd.to_datetime(watched_ms, unit="ms")
+        .strftime("%Y-%m-%dT%H:%M:%S.%f")
+        .str[:-3]
+        .to_numpy()
+    )
+
+    history = []
+    for time, video, kind in zip(times, videos.tolist(), kinds.tolist()):
+        item = {"header": "YouTube", "time": f"{time}Z", "products": ["YouTube"]}
+        if kind < removed_ratio:
+            item["title"] = REMOVED_VIDEO_TITLE
+        else:
+            video_id = video_id_for(int(video_channels[video]), video)
+            item["title"] = f"Watched {video_title(video_id)}"
+            item["titleUrl"] = f"https://www.youtube.com/watch?v={video_id}"
+            if kind < removed_ratio + ad_ratio:
+                item["details"] = [{"name": "From Google Ads"}]
+        item["activityControls"] = ACTIVITY_CONTROLS
+        history.append(item)
+    return history
+
+
+def to_takeout_html(history: List[dict]) -> str:
+    """Render a generated history as Takeout's watch-history.html markup."""
+    cells = []
+    for item in history:
+        title = html.escape(item["title"])
+        if "titleUrl" in item:
+            url = html.escape(item["titleUrl"], quote=True)
+            name = title.removeprefix("Watched ")
+            video_id = item["titleUrl"].rsplit("=", 1)[-1]
+            channel = html.escape(video_metadata(video_id)["channelTitle"])
+            body = (
+                f'Watched\xa0<a href="{url}">{name}</a><br>'
+                f'<a href="https://www.youtube.com/channel/UC">{channel}</a><br>'
+            )
+        else:
+            body = f"{title}<br>"
+        watched = datetime.fromisoformat(item["time"].replace("Z", "+00:00"))
+        hour = watched.hour % 12 or 12
+        body += (
+            f"{watched:%b} {watched.day}, {watched.year}, "
+            f"{hour}:{watched:%M:%S}\u202f{watched:%p} UTC<br>"
+        )
+        caption = "<b>Products:</b><br>&emsp;YouTube<br>"
+        for detail in item.get("details") or []:
+            caption += f"<b>Details:</b><br>&emsp;{html.escape(detail['name'])}<br>"
+        cells.append(
+            '<div class="outer-cell mdl-cell mdl-cell--12-col mdl-shadow--2dp">'
+            '<div class="mdl-grid">'
+            '<div class="header-cell mdl-cell mdl-cell--12-col">'
+            '<p class="mdl-typography--title">YouTube<br></p></div>'
+            '<div class="content-cell mdl-cell mdl-cell--6-col '
+            f'mdl-typography--body-1">{body}</div>'
+            '<div class="content-cell mdl-cell mdl-cell--6-col '
+            'mdl-typography--body-1 mdl-typography--text-right"></div>'
+            '<div class="content-cell mdl-cell mdl-cell--12-col '
+            f'mdl-typography--caption">{caption}</div>'
+            "</div></div>\n"
+        )
+    return (
+        '<html><head><meta charset="UTF-8"><title>Watch history</title></head>'
+        '<body><div class="mdl-grid">\n' + "".join(cells) + "</div></body></html>\n"
+    )
+
+
+def video_id_for(channel: int, video: int) -> str:
+    return f"{_ID_PREFIX_CHANNEL}{channel:04x}{_ID_PREFIX_VIDEO}{video:05x}"
+
+
+def video_title(video_id: str) -> str:
+    return f"Synthetic video {video_id}"
+
+
+def video_metadata(video_id: str) -> dict:
+    """
+    Deterministic metadata for any video ID.
+
+    Generated IDs map back to their channel; other IDs get a channel and
+    duration derived from a hash of the ID.
+    """
+    checksum = zlib.crc32(video_id.encode("utf-8"))
+    channel = _channel_of(video_id)
+    if channel is None:
+        channel = checksum % 1000
+    # Mostly short videos with a long tail, between 30 seconds and 3 hours
+    seconds = 30 + int((checksum % 10_000 / 10_000) ** 3 * 10_770)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    duration = "PT" + "".join(
+        f"{value}{unit}"
+        for value, unit in ((hours, "H"), (minutes, "M"), (seconds, "S"))
+        if value
+    )
+    return {
+        "id": video_id,
+        "title": video_title(video_id),
+        "channelTitle": f"Synthetic channel {channel}",
+        "duration": duration,
+    }
+
+
+def video_metadata_frame(video_ids) -> pd.DataFrame:
+    """Metadata for a batch of IDs, shaped like api_handling.request_data's DataFrame."""
+    return pd.DataFrame(
+        [video_metadata(video_id) for video_id in dict.fromkeys(video_ids)],
+        columns=["id", "title", "channelTitle", "duration"],
+    )
+
+
+def _channel_of(video_id: str) -> Optional[int]:
+    if (
+        len(video_id) == 11
+        and video_id[0] == _ID_PREFIX_CHANNEL
+        and video_id[5] == _ID_PREFIX_VIDEO
+    ):
+        try:
+            return int(video_id[1:5], 16)
+        except ValueError:
+            return None
+    return None
+
+
+def _zipf_weights(count: int, exponent: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, count + 1, dtype=np.float64) ** exponent
+    return weights / weights.sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic watch history.")
+    parser.add_argument("--entries", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ad-ratio", type=float, default=0.05)
+    parser.add_argument("--removed-ratio", type=float, default=0.02)
+    parser.add_argument(
+        "--out",
+        default="watch-history.json",
+        help="output file; a .html name writes Takeout's HTML format",
+    )
+    args = parser.parse_args()
+
+    history = generate_watch_history(
+        args.entries,
+        seed=args.seed,
+        ad_ratio=args.ad_ratio,
+        removed_ratio=args.removed_ratio,
+    )
+    with open(args.out, "w", encoding="utf-8") as handle:
+        if args.out.endswith(".html"):
+            handle.write(to_takeout_html(history))
+        else:
+            json.dump(history, handle)
+
+
+if __name__ == "__main__":
+    main()
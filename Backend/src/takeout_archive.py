@@ -0,0 +1,159 @@
+"""
+Takeout Archive Module
+
+This module lets users upload the Google Takeout archive as downloaded
+(.zip or .tgz) instead of the extracted watch history, which is several
+times larger on the wire. The archive is read from memory as a stream: only
+the watch-history entry is decompressed, chunk by chunk, as the parser reads
+it, and nothing is written to disk.
+
+Uploads are recognised by their leading bytes rather than their file name,
+so a plain JSON or HTML upload passes through untouched.
+"""
+
+import gzip
+import io
+import os
+import tarfile
+import zipfile
+import zlib
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, NamedTuple
+
+from . import takeout_html
+
+# Entry names searched for, preferred first; JSON parses faster than HTML
+WATCH_HISTORY_NAMES = ("watch-history.json", "watch-history.html")
+# Decompressed size above which an archive entry is rejected (zip bombs)
+MAX_WATCH_HISTORY_BYTES = int(os.getenv("MAX_WATCH_HISTORY_BYTES", 1024 * 1024 * 1024))
+READ_CHUNK_BYTES = 1024 * 1024
+
+_ZIP_MAGIC = b"PK\x03\x04"
+_GZIP_MAGIC = b"\x1f\x8b"
+# bzip2 and xz Takeout exports are tarballs too
+_TAR_MAGICS = (_GZIP_MAGIC, b"BZh", b"\xfd7zXZ\x00")
+_USTAR_OFFSET = 257
+
+
+class WatchHistory(NamedTuple):
+    stream: BinaryIO
+    is_html: bool
+
+
+def is_archive(raw: bytes) -> bool:
+    """Whether an upload is a zip, tar or gzip file."""
+    return (
+        raw.startswith(_ZIP_MAGIC)
+        or raw.startswith(_TAR_MAGICS)
+        or raw[_USTAR_OFFSET : _USTAR_OFFSET + 5] == b"ustar"
+    )
+
+
+@contextmanager
+def open_watch_history(raw: bytes) -> Iterator[WatchHistory]:
+    """
+    Open the watch history of an upload for reading.
+
+    Archives are searched for a watch-history entry, which is decompressed
+    as it is read; other uploads are read as they are. Reading the whole
+    stream of a plain upload returns the upload itself, without a copy.
+
+    :raises ValueError: if the archive is corrupt, has no watch history or the
+        entry exceeds MAX_WATCH_HISTORY_BYTES.
+    """
+    if not is_archive(raw):
+        yield WatchHistory(
+            io.BytesIO(raw), takeout_html.is_html(raw[: takeout_html.SNIFF_BYTES])
+        )
+        return
+
+    opener = _open_zip_entry if raw.startswith(_ZIP_MAGIC) else _open_tar_entry
+    try:
+        with opener(raw) as entry:
+            yield WatchHistory(
+                _LimitedReader(entry),
+                takeout_html.is_html(entry.peek(takeout_html.SNIFF_BYTES)),
+            )
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, zlib.error, OSError) as exc:
+        raise ValueError(f"The uploaded archive is corrupt: {exc}") from exc
+
+
+@contextmanager
+def _open_zip_entry(raw: bytes):
+    with zipfile.ZipFile(io.BytesIO(raw)) as archive:
+        entries = {}
+        for info in archive.infolist():
+            entries.setdefault(_entry_name(info.filename), info)
+        info = next(
+            (entries[name] for name in WATCH_HISTORY_NAMES if name in entries), None
+        )
+        if info is None:
+            raise _not_found()
+        # Checked again while reading; the header can lie
+        _check_size(info.file_size)
+        with archive.open(info) as entry:
+            yield entry
+
+
+@contextmanager
+def _open_tar_entry(raw: bytes):
+    try:
+        # Stream mode reads the archive front to back without seeking, so the
+        # first watch-history entry found is used
+        archive = tarfile.open(fileobj=io.BytesIO(raw), mode="r|*")
+    except tarfile.ReadError:
+        if not raw.startswith(_GZIP_MAGIC):
+            raise ValueError("The uploaded archive is not a readable tar archive.")
+        # A gzipped watch history on its own rather than a tarball
+        with gzip.GzipFile(fileobj=io.BytesIO(raw)) as entry:
+            yield entry
+        return
+
+    with archive:
+        for member in archive:
+            if member.isfile() and _entry_name(member.name) in WATCH_HISTORY_NAMES:
+                _check_size(member.size)
+                yield archive.extractfile(member)
+                return
+    raise _not_found()
+
+
+class _LimitedReader:
+    """Reads an archive entry, rejecting it once it exceeds MAX_WATCH_HISTORY_BYTES."""
+
+    def __init__(self, entry):
+        self._entry = entry
+        self._size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is not None and size >= 0:
+            chunk = self._entry.read(size)
+            self._size += len(chunk)
+            _check_size(self._size)
+            return chunk
+        buffer = bytearray()
+        while chunk := self.read(READ_CHUNK_BYTES):
+            buffer += chunk
+        # The JSON parser takes a bytearray as it is, which saves a copy
+        return buffer
+
+    def tell(self) -> int:
+        return self._size
+
+
+def _entry_name(path: str) -> str:
+    return path.replace("\\", "/").rsplit("/", 1)[-1]
+
+
+def _check_size(size: int) -> None:
+    if size > MAX_WATCH_HISTORY_BYTES:
+        raise ValueError(
+            "The watch history in the archive is larger than "
+            f"{MAX_WATCH_HISTORY_BYTES // (1024 * 1024)} MB."
+        )
+
+
+def _not_found() -> ValueError:
+    return ValueError(
+        f"No {' or '.join(WATCH_HISTORY_NAMES)} found in the uploaded archive."
+    )
@@ -0,0 +1,295 @@
+"""
+Takeout HTML Module
+
+This module reads the HTML variant of the Takeout watch history
+(watch-history.html, the default export format) into the same WatchedItem
+records as the JSON export, so filter_data treats both alike.
+
+The file is read in chunks and tokenized into start tag, end tag and text
+events, and each entry is yielded as soon as its closing tag is seen.
+Memory stays constant however large the export is; only the entry being
+read is kept. Takeout's markup is regular enough for a tag pattern, which
+is several times faster than html.parser on large exports.
+
+Only English exports are understood. Watch times are local times with a
+time zone abbreviation; common abbreviations are converted to UTC, unknown
+ones are read as UTC.
+"""
+
+import codecs
+import html
+import re
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+from . import models
+
+SNIFF_BYTES = 512
+READ_CHUNK_BYTES = 1024 * 1024
+
+TIME_FORMATS = (
+    "%b %d, %Y, %I:%M:%S %p",  # Jan 30, 2024, 9:52:57 PM
+    "%d %b %Y, %H:%M:%S",  # 30 Jan 2024, 21:52:57
+    "%b %d, %Y, %H:%M:%S",  # Jan 30, 2024, 21:52:57
+)
+# Hours from UTC of the abbreviations Takeout writes after the watch time
+TIME_ZONE_OFFSETS = {
+    "UTC": 0,
+    "GMT": 0,
+    "EST": -5,
+    "EDT": -4,
+    "CST": -6,
+    "CDT": -5,
+    "MST": -7,
+    "MDT": -6,
+    "PST": -8,
+    "PDT": -7,
+    "AKST": -9,
+    "AKDT": -8,
+    "HST": -10,
+    "BST": 1,
+    "CET": 1,
+    "CEST": 2,
+    "EET": 2,
+    "EEST": 3,
+    "IST": 5.5,
+    "JST": 9,
+    "AEST": 10,
+    "AEDT": 11,
+}
+# The English 12-hour form, parsed without strptime as it is most common
+_TWELVE_HOUR_TIME = re.compile(
+    r"^([A-Z][a-z]{2}) (\d{1,2}), (\d{4}), (\d{1,2}):(\d{2}):(\d{2}) ([AP]M)$"
+)
+_MONTHS = {
+    name: number
+    for number, name in enumerate(
+        "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split(), start=1
+    )
+}
+_OFFSET_PATTERN = re.compile(r"^(?:UTC|GMT)([+-])(\d{1,2})(?::?(\d{2}))?$")
+# Text up to a tag, then the tag
+_TOKEN = re.compile(r"([^<]*)<(/?)([a-zA-Z][a-zA-Z0-9]*)([^>]*)>")
+_CLASS = re.compile(r'class="([^"]*)"')
+_HREF = re.compile(r'href="([^"]*)"')
+# Takeout separates the time from AM/PM with narrow or regular no-break spaces
+_SPACES = str.maketrans({"\u202f": " ", "\xa0": " ", "\u2003": " "})
+
+
+def is_html(head: bytes) -> bool:
+    """Whether the first bytes of an upload look like HTML rather than JSON."""
+    return head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<")
+
+
+def iter_watched_items(stream) -> Iterator[models.WatchedItem]:
+    """
+    Parse a watch-history.html stream entry by entry.
+
+    :param stream: Binary file-like object with the UTF-8 encoded HTML.
+    :return: Iterator of WatchedItem records, in the order of the file.
+    """
+    parser = _WatchHistoryParser()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    while chunk := stream.read(READ_CHUNK_BYTES):
+        parser.feed(decoder.decode(chunk))
+        yield from parser.drain()
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield from parser.drain()
+
+
+def parse_watch_time(text: str) -> Optional[str]:
+    """Convert a Takeout HTML watch time to the JSON export's UTC timestamp."""
+    text = " ".join(text.translate(_SPACES).split())
+    value, _, zone = text.rpartition(" ")
+    offset = _utc_offset(zone)
+    if offset is None:
+        # No recognised zone, so the whole text is the time
+        value, offset = text, timedelta(0)
+    local = _parse_twelve_hour(value)
+    if local is None:
+        for time_format in TIME_FORMATS:
+            try:
+                local = datetime.strptime(value, time_format)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    watched = local - offset
+    return watched.isoformat() + "Z"
+
+
+def _parse_twelve_hour(value: str) -> Optional[datetime]:
+    match = _TWELVE_HOUR_TIME.match(value)
+    if match is None or match.group(1) not in _MONTHS:
+        return None
+    month, day, year, hour, minute, second, meridiem = match.groups()
+    hour = int(hour) % 12 + (12 if meridiem == "PM" else 0)
+    try:
+        return datetime(
+            int(year), _MONTHS[month], int(day), hour, int(minute), int(second)
+        )
+    except ValueError:
+        return None
+
+
+def _utc_offset(zone: str) -> Optional[timedelta]:
+    if zone in TIME_ZONE_OFFSETS:
+        return timedelta(hours=TIME_ZONE_OFFSETS[zone])
+    match = _OFFSET_PATTERN.match(zone)
+    if match:
+        sign = -1 if match.group(1) == "-" else 1
+        return sign * timedelta(
+            hours=int(match.group(2)), minutes=int(match.group(3) or 0)
+        )
+    if zone.isalpha() and zone.isupper() and 2 < len(zone) < 6:
+        # An abbreviation missing from the table
+        return timedelta(0)
+    return None
+
+
+class _Entry:
+    def __init__(self):
+        self.header: List[str] = []
+        self.lines: List[List[str]] = [[]]  # Body text split at <br>
+        self.links: List[str] = []  # hrefs in the body's first line
+        self.caption: dict = {}  # Caption section label -> its lines
+        self.section: Optional[str] = None
+
+
+class _WatchHistoryParser:
+    """
+    Collect entries from the Takeout markup.
+
+    Every entry is an "outer-cell" div holding a header cell, a body cell
+    ("Watched <a>title</a><br><a>channel</a><br>time") and a caption cell
+    listing products and details such as "From Google Ads".
+    """
+
+    def __init__(self):
+        self._pending = ""  # Unparsed tail of the last chunk (a partial tag)
+        self._depth = 0  # Open divs
+        self._entry_depth = None  # Depth of the current entry's outer div
+        self._cell = None  # "header", "body", "caption" or None
+        self._entry: Optional[_Entry] = None
+        self._done: List[models.WatchedItem] = []
+
+    def feed(self, text: str) -> None:
+        text = self._pending + text
+        # Text after the last tag may be a partial tag or entity, so it waits
+        # for the next chunk
+        cut = text.rfind(">") + 1
+        self._pending = text[cut:]
+
+        for data, closing, tag, attrs in _TOKEN.findall(text, 0, cut):
+            if data:
+                self.handle_data(data)
+            if closing:
+                self.handle_endtag(tag.lower())
+            else:
+                self.handle_starttag(tag.lower(), attrs)
+
+    def close(self) -> None:
+        if self._pending:
+            self.handle_data(self._pending)
+            self._pending = ""
+
+    def drain(self) -> List[models.WatchedItem]:
+        done, self._done = self._done, []
+        return done
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "div":
+            self._depth += 1
+            match = _CLASS.search(attrs)
+            classes = match.group(1).split() if match else ()
+            if "outer-cell" in classes:
+                self._entry = _Entry()
+                self._entry_depth = self._depth
+                self._cell = None
+            elif self._entry is not None and "content-cell" in classes:
+                if "mdl-typography--caption" in classes:
+                    self._cell = "caption"
+                elif "mdl-typography--text-right" in classes:
+                    self._cell = None
+                else:
+                    self._cell = "body"
+            elif self._entry is not None and "header-cell" in classes:
+                self._cell = "header"
+            if attrs.endswith("/"):
+                self.handle_endtag(tag)
+        elif self._entry is None:
+            return
+        elif tag == "br":
+            self._line_break()
+        elif tag == "a" and self._cell == "body" and len(self._entry.lines) == 1:
+            match = _HREF.search(attrs)
+            if match:
+                self._entry.links.append(html.unescape(match.group(1)))
+        elif tag == "b" and self._cell == "caption":
+            self._entry.section = ""
+
+    def handle_endtag(self, tag):
+        if tag == "b" and self._entry is not None and self._entry.section == "":
+            self._entry.section = None
+        if tag != "div":
+            return
+        if self._entry is not None and self._depth == self._entry_depth:
+            self._finish_entry()
+        elif self._entry is not None and self._cell is not None:
+            self._cell = None
+        self._depth -= 1
+
+    def handle_data(self, data):
+        entry = self._entry
+        if entry is None or self._cell is None:
+            return
+        data = html.unescape(data)
+        if self._cell == "header":
+            entry.header.append(data)
+        elif self._cell == "body":
+            entry.lines[-1].append(data)
+        elif entry.section == "":
+            # Text of a <b> label such as "Details:"
+            entry.section = data.strip().rstrip(":")
+            entry.caption[entry.section] = []
+        elif entry.section:
+            text = data.translate(_SPACES).strip()
+            if text:
+                entry.caption[entry.section].append(text)
+
+    def _line_break(self):
+        if self._cell == "body":
+            self._entry.lines.append([])
+
+    def _finish_entry(self):
+        entry, self._entry, self._entry_depth = self._entry, None, None
+        self._cell = None
+        lines = [
+            " ".join("".join(parts).translate(_SPACES).split()) for parts in entry.lines
+        ]
+        lines = [line for line in lines if line]
+        if not lines:
+            return
+        watched_at = parse_watch_time(lines[-1])
+        if watched_at is None:
+            raise ValueError(
+                f"Unrecognised watch time {lines[-1]!r}; "
+                "only English HTML exports are supported."
+            )
+        details = entry.caption.get("Details")
+        self._done.append(
+            models.WatchedItem.model_validate(
+                {
+                    "header": "".join(entry.header).strip() or "YouTube",
+                    "title": lines[0],
+                    "titleUrl": entry.links[0] if entry.links else None,
+                    "time": watched_at,
+                    "products": entry.caption.get("Products") or ["YouTube"],
+                    "details": [{"name": name} for name in details]
+                    if details
+                    else None,
+                }
+            )
+        )
@@ -0,0 +1,173 @@
+"""
+Video Index Module
+
+This module builds the unique video table for a session and the precomputed
+sort-order permutations and channel ranges that let /api/videos answer sorted
+and channel-filtered pages without touching the full history.
+"""
+
+from bisect import bisect_left
+
+from . import analytics
+from .lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Sort keys exposed on /api/videos. "first_seen" keeps the original Takeout
+# order, the others default to descending (most watched / most recent first).
+SORT_KEYS = ("first_seen", "watch_count", "watch_time", "last_watched")
+DESCENDING_SORT_KEYS = ("watch_count", "watch_time", "last_watched")
+
+
+def build_unique_video_table(complete_data):
+    """Collapse the watch history into one row per (title, channelTitle) in first-seen order."""
+    history = pd.DataFrame(
+        {
+            "title": complete_data["title"].to_numpy(),
+            "channelTitle": complete_data["channelTitle"].to_numpy(),
+            "watch_seconds": analytics.watch_seconds(complete_data),
+            "watched_at": _epoch_seconds(complete_data),
+        }
+    )
+
+    grouped = history.groupby(["title", "channelTitle"], sort=False)
+    table = grouped.agg(
+        watch_count=("watch_seconds", "size"),
+        watch_seconds=("watch_seconds", "sum"),
+        last_watched=("watched_at", "max"),
+    ).reset_index()
+
+    return table
+
+
+def unique_table_from_index(unique_vids, video_index):
+    """Rebuild the unique video table that a stored video index was built from."""
+    titles, channels = zip(*unique_vids) if unique_vids else ((), ())
+    return pd.DataFrame(
+        {
+            "title": list(titles),
+            "channelTitle": list(channels),
+            "watch_count": video_index["watch_count"].astype(np.int64),
+            "watch_seconds": video_index["watch_seconds"],
+            "last_watched": video_index["last_watched"],
+        }
+    )
+
+
+def merge_unique_video_tables(newer_table, older_table):
+    """Combine unique video tables of two batches, keeping newest-first first-seen order."""
+    combined = pd.concat([newer_table, older_table], ignore_index=True)
+    grouped = combined.groupby(["title", "channelTitle"], sort=False)
+    return grouped.agg(
+        watch_count=("watch_count", "sum"),
+        watch_seconds=("watch_seconds", "sum"),
+        last_watched=("last_watched", "max"),
+    ).reset_index()
+
+
+def build_video_index(unique_table):
+    """Precompute sort permutations and channel row ranges over the unique video table."""
+    row_count = len(unique_table)
+    channel_codes, channels = pd.factorize(unique_table["channelTitle"], sort=True)
+
+    sort_values = {
+        "first_seen": np.arange(row_count, dtype=np.int64),
+        "watch_count": unique_table["watch_count"].to_numpy(dtype=np.int64),
+        "watch_time": unique_table["watch_seconds"].to_numpy(dtype=np.int64),
+        "last_watched": unique_table["last_watched"].to_numpy(dtype=np.int64),
+    }
+
+    orders = {}
+    channel_orders = {}
+    for key, values in sort_values.items():
+        # Negate descending keys so a stable sort keeps first-seen order on ties
+        ranked = -values if key in DESCENDING_SORT_KEYS else values
+        orders[key] = np.argsort(ranked, kind="stable").astype(np.int32)
+        # lexsort sorts by the last key first: channel, then the sort value
+        channel_orders[key] = np.lexsort((ranked, channel_codes)).astype(np.int32)
+
+    grouped_codes = channel_codes[channel_orders["first_seen"]]
+    channel_starts = np.searchsorted(
+        grouped_codes, np.arange(len(channels) + 1)
+    ).astype(np.int32)
+
+    return {
+        "watch_count": sort_values["watch_count"].astype(np.int32),
+        "watch_seconds": sort_values["watch_time"],
+        "last_watched": sort_values["last_watched"],
+        "channels": [str(channel) for channel in channels],
+        "channel_starts": channel_starts,
+        "orders": orders,
+        "channel_orders": channel_orders,
+    }
+
+
+def select_rows(video_index, sort="first_seen", channel=None, ascending=None):
+    """
+    Resolve the row permutation and range for a sort key and optional channel filter.
+
+    :param video_index: Index produced by build_video_index.
+    :param sort: One of SORT_KEYS.
+    :param channel: Exact channel title to filter on, or None for all channels.
+    :param ascending: Override the default direction of the sort key.
+    :return: Tuple of (order, start, stop, reverse) describing the selected rows.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(
+            f"Unknown sort '{sort}'. Expected one of: {', '.join(SORT_KEYS)}."
+        )
+
+    reverse = ascending is not None and ascending == (sort in DESCENDING_SORT_KEYS)
+
+    if channel is None:
+        order = video_index["orders"][sort]
+        return order, 0, len(order), reverse
+
+    channels = video_index["channels"]
+    code = bisect_left(channels, channel)
+    order = video_index["channel_orders"][sort]
+    if code >= len(channels) or channels[code] != channel:
+        return order, 0, 0, reverse
+
+    starts = video_index["channel_starts"]
+    return order, int(starts[code]), int(starts[code + 1]), reverse
+
+
+def watched_rows(unique_vids, history_rows):
+    """Mark the unique video rows watched at least once in a slice of the history."""
+    titles, channels = zip(*unique_vids) if unique_vids else ((), ())
+    keys = pd.MultiIndex.from_arrays([list(titles), list(channels)])
+    codes = keys.get_indexer(
+        pd.MultiIndex.from_arrays(
+            [history_rows["title"].to_numpy(), history_rows["channelTitle"].to_numpy()]
+        )
+    )
+    watched = np.zeros(len(unique_vids), dtype=bool)
+    watched[codes[codes >= 0]] = True
+    return watched
+
+
+def restrict_rows(order, start, stop, keep):
+    """Narrow a selected range to the rows marked in keep, preserving its order."""
+    selected = np.asarray(order[start:stop])
+    selected = selected[keep[selected]]
+    return selected, 0, len(selected)
+
+
+def page_rows(order, start, stop, reverse, page_start, page_size):
+    """Slice one page of row numbers out of a selected range in O(page_size)."""
+    total = stop - start
+    page_start = max(0, min(page_start, total))
+    page_stop = min(page_start + page_size, total)
+    if not reverse:
+        return order[start + page_start : start + page_stop]
+    # Walk the range backwards without materializing the reversed permutation
+    return order[stop - page_stop : stop - page_start][::-1]
+
+
+def _epoch_seconds(complete_data):
+    if "watch_date" not in complete_data.columns:
+        return np.zeros(len(complete_data), dtype=np.int64)
+    watch_dates = pd.to_datetime(complete_data["watch_date"])
+    return watch_dates.to_numpy(dtype="datetime64[s]").astype(np.int64)
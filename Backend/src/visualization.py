@@ -1,22 +1,33 @@
-import plotly.express as px
-import pandas as pd
-
-
-def plot_time_series_line_chart(youtube_df):
-    # Sort the DataFrame by watch date
-    youtube_df = youtube_df.sort_values(by="watch_date")
-
-    # Reset the index after sorting
-    youtube_df = youtube_df.reset_index(drop=True)
-
-    # Plot the time series line chart with hover data including the "title" column
-    fig = px.line(
-        youtube_df,
-        x="watch_date",
-        y=youtube_df.index + 1,
-        hover_data={"watch_date": True, "title": True},
+from . import analytics
+from .lazy_imports import lazy_import
+
+px = lazy_import("plotly.express")
+pd = lazy_import("pandas")
+
+DAY_NAMES = (
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+)
+
+
+def plot_time_series_line_chart(watch_cube):
+    # Running total of watches at the end of each day, read from the cube
+    days = watch_cube["day"]
+    chart_df = pd.DataFrame(
+        {
+            "watch_date": days["bucket_edges"][:-1].astype("datetime64[D]"),
+            "total_watched": days["cumulative_counts"][1:],
+        }
     )
 
+    # Plot the time series line chart
+    fig = px.line(chart_df, x="watch_date", y="total_watched")
+
     # Adjust the layout to make the figure smaller
     fig.update_layout(
         width=400,  # Set the width of the figure (in pixels)
@@ -63,19 +74,14 @@ def plot_top_videos_chart(youtube_df):
     return fig
 
 
-def plot_top_channels_chart(youtube_df):
-    # Group by title and count the number of times each title appears
-    counts = youtube_df["channelTitle"].value_counts()
-
-    # Sort the DataFrame by count in descending order to plot the top videos
-    counts = counts.sort_values(ascending=False)
+def plot_top_channels_chart(watch_cube, channel_names):
+    # Take the top 10 channels by watches over the whole history from the cube
+    top_channels = analytics.summarize_date_range(watch_cube, channel_names)[
+        "top_channels"
+    ]
 
-    # Take only the top 10 titles
-    df_top_10 = counts.head(10)
-
-    # Create a DataFrame from top_titles series
-    top_titles_df = df_top_10.reset_index()
-    top_titles_df.columns = ["channelTitle", "count"]
+    # Create a DataFrame from the (channel, count) pairs
+    top_titles_df = pd.DataFrame(top_channels, columns=["channelTitle", "count"])
 
     # Plot the bar chart
     fig = px.bar(top_titles_df, x="channelTitle", y="count")
@@ -95,14 +101,9 @@ def plot_top_channels_chart(youtube_df):
     return fig
 
 
-def plot_heatmap(youtube_df, date_column="watch_date"):
-    # Create a DataFrame with day of the week and hour of the day
-    df = pd.DataFrame(youtube_df[date_column], columns=[date_column])
-    df["DayOfWeek"] = df[date_column].dt.dayofweek
-    df["HourOfDay"] = df[date_column].dt.hour
-
-    # Group data by day of the week and hour of the day
-    heatmap_data = df.groupby(["DayOfWeek", "HourOfDay"]).size().unstack(fill_value=0)
+def plot_heatmap(watch_cube):
+    # Watches per day of the week (rows) and hour of the day (columns)
+    heatmap_data = pd.DataFrame(watch_cube["hour_of_week"].reshape(7, 24))
 
     fig = px.imshow(heatmap_data, text_auto=True)
 
@@ -110,15 +111,7 @@ def plot_heatmap(youtube_df, date_column="watch_date"):
     fig.update_layout(
         xaxis=dict(
             tickmode="array",
-            ticktext=[
-                "Monday",
-                "Tuesday",
-                "Wednesday",
-                "Thursday",
-                "Friday",
-                "Saturday",
-                "Sunday",
-            ],
+            ticktext=list(DAY_NAMES),
         ),
         width=600,  # Set the width of the figure (in pixels)
         height=300,  # Set the height of the figure (in pixels)
@@ -133,14 +126,16 @@ def plot_heatmap(youtube_df, date_column="watch_date"):
     return fig
 
 
-def prepare_visualizations(data, context):
-    context["time_series_line_chart"] = plot_time_series_line_chart(data).to_html(
+def prepare_visualizations(data, context, watch_cube, channel_names):
+    # Charts over time and channels read the precomputed cube; only the top
+    # videos chart needs the rows
+    context["time_series_line_chart"] = plot_time_series_line_chart(watch_cube).to_html(
         full_html=False
     )
     context["top_videos_chart"] = plot_top_videos_chart(data).to_html(full_html=False)
-    context["top_channels_chart"] = plot_top_channels_chart(data).to_html(
-        full_html=False
-    )
-    context["heatmap"] = plot_heatmap(data).to_html(full_html=False)
+    context["top_channels_chart"] = plot_top_channels_chart(
+        watch_cube, channel_names
+    ).to_html(full_html=False)
+    context["heatmap"] = plot_heatmap(watch_cube).to_html(full_html=False)
 
     return context
@@ -0,0 +1,145 @@
+"""
+Pipeline Worker
+
+Consumes data pipeline jobs from the Redis job queue. Run one or more of
+these alongside the web server (on any host that can reach Redis) with
+PIPELINE_EXECUTION=queue:
+
+    python -m src.worker --concurrency 4
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+from . import redis_utils
+from .job_queue import JobQueue, get_job_queue
+from .redis_utils import StaleGenerationError
+from .session_pipeline import load_store, process_data_pipeline, save_store
+
+logger = logging.getLogger(__name__)
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 2))
+# How often the reaper looks for jobs whose worker stopped renewing its lease
+REAP_INTERVAL_SECONDS = 10
+# How long a consumer waits before taking jobs again after a Redis error
+CONSUME_BACKOFF_SECONDS = 5
+
+
+async def run_job(queue: JobQueue, job: dict) -> None:
+    """
+    Run one pipeline job, renewing its lease until it finishes.
+
+    A run that fails unexpectedly goes back to the queue until it has used up
+    JOB_MAX_ATTEMPTS, then the session is marked failed.
+    """
+    session_id = job["session_id"]
+    logger.info("Starting pipeline job %s (attempt %d)", session_id, job["attempts"])
+
+    heartbeat = asyncio.create_task(_renew_lease(queue, job["token"]))
+    try:
+        await process_data_pipeline(session_id, retry=True)
+    except Exception as exc:
+        logger.exception("Pipeline job %s failed: %s", session_id, exc)
+        if not await asyncio.to_thread(queue.fail, job["token"]):
+            await _mark_failed(session_id, job["generation"])
+        return
+    finally:
+        heartbeat.cancel()
+
+    await asyncio.to_thread(queue.ack, job["token"])
+    logger.info("Finished pipeline job %s", session_id)
+
+
+async def consume(queue: JobQueue, stopping: asyncio.Event) -> None:
+    """Pull and run jobs one at a time until the worker is asked to stop."""
+    while not stopping.is_set():
+        try:
+            job = await asyncio.to_thread(queue.dequeue, 1)
+            if job is not None:
+                await run_job(queue, job)
+        except Exception as exc:
+            # A job it held goes back to the queue once its lease runs out
+            logger.error("Failed to take or settle a pipeline job: %s", exc)
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=CONSUME_BACKOFF_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def reap(queue: JobQueue, stopping: asyncio.Event) -> None:
+    """Periodically re-queue jobs abandoned by crashed workers."""
+    while not stopping.is_set():
+        try:
+            _, dead = await asyncio.to_thread(queue.reap_expired)
+            for job in dead:
+                await _mark_failed(job["session_id"], job["generation"])
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logger.error("Failed to reap expired pipeline jobs: %s", exc)
+        try:
+            await asyncio.wait_for(stopping.wait(), timeout=REAP_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_worker(concurrency: int = WORKER_CONCURRENCY) -> None:
+    await asyncio.to_thread(redis_utils.connect)
+    queue = get_job_queue()
+    stopping = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    # Each consumer parks a thread on a blocking dequeue, so leave room for
+    # the Redis and pandas work the pipelines push to threads as well
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency + 8))
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        # Finish running jobs, but stop taking new ones
+        loop.add_signal_handler(signum, stopping.set)
+
+    logger.info("Pipeline worker started with concurrency %d", concurrency)
+    await asyncio.gather(
+        reap(queue, stopping),
+        *(consume(queue, stopping) for _ in range(concurrency)),
+    )
+    logger.info("Pipeline worker stopped")
+
+
+async def _renew_lease(queue: JobQueue, token: str) -> None:
+    while True:
+        await asyncio.sleep(queue.visibility_timeout / 3)
+        await asyncio.to_thread(queue.extend_lease, token)
+
+
+async def _mark_failed(session_id: str, generation: int) -> None:
+    store = await load_store(session_id)
+    if store is None or store.generation != generation:
+        # Expired, or re-uploaded since; the newer upload has its own job
+        logger.info("Not marking session %s failed: upload superseded", session_id)
+        return
+    store.error_message = "Failed to process data pipeline."
+    try:
+        await save_store(session_id, store)
+    except StaleGenerationError:
+        logger.info("Not marking session %s failed: upload superseded", session_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run data pipeline workers.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=WORKER_CONCURRENCY,
+        help="number of pipeline jobs to run at once in this process",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    asyncio.run(run_worker(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
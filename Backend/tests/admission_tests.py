@@ -0,0 +1,101 @@
+import asyncio
+import unittest
+
+from src.admission import AdmissionController
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def test_pipelines_over_the_concurrency_limit_wait_in_order(self):
+        controller = AdmissionController(
+            max_concurrent=2, memory_budget=1000, max_queued=5
+        )
+        started, positions = [], []
+
+        async def pipeline(name, release):
+            async def on_queued(position):
+                positions.append((name, position))
+
+            async with controller.admit(name, 10, on_queued):
+                started.append(name)
+                await release.wait()
+
+        async def simulate():
+            releases = {name: asyncio.Event() for name in "abcd"}
+            tasks = {
+                name: asyncio.create_task(pipeline(name, releases[name]))
+                for name in "abcd"
+            }
+            await asyncio.sleep(0.01)
+            self.assertEqual(started, ["a", "b"])
+            self.assertEqual(controller.position("d"), 2)
+
+            releases["a"].set()
+            await asyncio.sleep(0.01)
+            self.assertEqual(started, ["a", "b", "c"])
+            self.assertEqual(controller.position("d"), 1)
+
+            for release in releases.values():
+                release.set()
+            await asyncio.gather(*tasks.values())
+
+        asyncio.run(simulate())
+
+        self.assertEqual(started, ["a", "b", "c", "d"])
+        self.assertEqual(positions, [("c", 1), ("d", 2), ("d", 1)])
+        self.assertEqual(controller.stats()["running"], 0)
+
+    def test_memory_budget_limits_admission(self):
+        controller = AdmissionController(
+            max_concurrent=5, memory_budget=100, max_queued=5
+        )
+        started = []
+
+        async def pipeline(name, cost, release):
+            async with controller.admit(name, cost):
+                started.append(name)
+                await release.wait()
+
+        async def simulate():
+            big, small = asyncio.Event(), asyncio.Event()
+            # Larger than the whole budget: runs, but only on its own
+            first = asyncio.create_task(pipeline("huge", 500, big))
+            second = asyncio.create_task(pipeline("small", 10, small))
+            await asyncio.sleep(0.01)
+            self.assertEqual(started, ["huge"])
+            self.assertEqual(controller.stats()["reservedBytes"], 500)
+
+            big.set()
+            small.set()
+            await asyncio.gather(first, second)
+
+        asyncio.run(simulate())
+        self.assertEqual(started, ["huge", "small"])
+
+    def test_cancelled_waiter_leaves_the_queue(self):
+        controller = AdmissionController(max_concurrent=1, max_queued=1)
+
+        async def simulate():
+            release = asyncio.Event()
+
+            async def pipeline(name):
+                async with controller.admit(name, 0):
+                    await release.wait()
+
+            running = asyncio.create_task(pipeline("a"))
+            waiting = asyncio.create_task(pipeline("b"))
+            await asyncio.sleep(0.01)
+            self.assertTrue(controller.is_full())
+
+            waiting.cancel()
+            await asyncio.sleep(0.01)
+            self.assertFalse(controller.is_full())
+            self.assertIsNone(controller.position("b"))
+
+            release.set()
+            await running
+
+        asyncio.run(simulate())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from datetime import date
 from src import analytics
 import pandas as pd
 
@@ -38,6 +39,223 @@ class AnalyticsModuleTest(unittest.TestCase):
         self.assertEqual(context["total_hours"], 2)
         self.assertEqual(context["total_mins"], 30)
 
+    def test_duration_to_seconds(self):
+        seconds = analytics.duration_to_seconds(
+            ["PT1H30M15S", "PT15M", "P1DT2H", "P0D"]
+        )
+        self.assertListEqual(seconds.tolist(), [5415, 900, 93600, 0])
+
+    def test_compute_watch_metrics(self):
+        youtube_df = pd.DataFrame(
+            {
+                "id": ["a", "b", "a", "c"],
+                "title": ["Video A", "Video B", "Video A", "Video C"],
+                "channelTitle": ["Channel A", "Channel B", "Channel A", "Channel A"],
+                "watch_date": pd.to_datetime(
+                    [
+                        "2024-01-01 10:00",
+                        "2024-01-01 10:10",
+                        "2024-01-01 10:20",
+                        "2024-01-02 08:00",
+                    ]
+                ),
+                "duration": ["PT5M", "PT10M", "PT5M", "PT1H"],
+            }
+        )
+        metrics = analytics.compute_watch_metrics(youtube_df)
+
+        self.assertListEqual(metrics["channel_names"], ["Channel A", "Channel B"])
+        self.assertListEqual(metrics["channel_watch_counts"].tolist(), [3, 1])
+        self.assertListEqual(metrics["channel_watch_seconds"].tolist(), [4200, 600])
+        self.assertListEqual(metrics["video_titles"], ["Video A", "Video B", "Video C"])
+        self.assertListEqual(metrics["video_watch_counts"].tolist(), [2, 1, 1])
+        self.assertEqual(metrics["total_rewatches"], 1)
+        self.assertEqual(metrics["session_count"], 2)
+        # Sessions of 25 minutes and 60 minutes
+        self.assertEqual(metrics["average_session_seconds"], 2550.0)
+
+        context = analytics.summarize_watch_metrics(metrics, {}, top_n=1)
+        self.assertEqual(context["top_channels_by_watch_time"], [("Channel A", 4200)])
+        self.assertEqual(context["most_rewatched_videos"], [("Video A", 1)])
+
+    def test_detect_watch_sessions(self):
+        minute = 60
+        watch_dates = [0, 10 * minute, 20 * minute, 5 * 3600, 5 * 3600 + 5 * minute]
+        durations = [5 * minute] * 5
+        sessions = analytics.detect_watch_sessions(
+            watch_dates, durations, session_gap=30 * minute
+        )
+
+        self.assertEqual(sessions["session_count"], 2)
+        self.assertEqual(sessions["longest_session_seconds"], 25 * minute)
+        self.assertEqual(sessions["longest_session_videos"], 3)
+        self.assertEqual(sessions["longest_session_start"], 0)
+        self.assertListEqual(sessions["session_lengths"].tolist(), [1500, 600])
+        self.assertListEqual(sessions["histogram"]["counts"], [1, 1, 0, 0, 0, 0])
+
+    def test_detect_watch_sessions_handles_empty_history(self):
+        sessions = analytics.detect_watch_sessions([])
+        self.assertEqual(sessions["session_count"], 0)
+        self.assertEqual(sum(sessions["histogram"]["counts"]), 0)
+
+    def test_merge_watch_metrics_matches_full_recompute(self):
+        youtube_df = pd.DataFrame(
+            {
+                "id": ["a", "b", "a", "c", "a"],
+                "title": ["Video A", "Video B", "Video A", "Video C", "Video A"],
+                "channelTitle": [
+                    "Channel A",
+                    "Channel B",
+                    "Channel A",
+                    "Channel C",
+                    "Channel A",
+                ],
+                "watch_date": pd.to_datetime(
+                    [
+                        "2024-01-01 10:00",
+                        "2024-01-01 10:10",
+                        "2024-01-01 10:30",
+                        "2024-01-01 10:40",
+                        "2024-01-03 09:00",
+                    ]
+                ),
+                "duration": ["PT5M", "PT10M", "PT5M", "PT20M", "PT5M"],
+            }
+        )
+        full = analytics.compute_watch_metrics(youtube_df)
+        merged = analytics.merge_watch_metrics(
+            analytics.compute_watch_metrics(youtube_df.iloc[:3]),
+            analytics.compute_watch_metrics(youtube_df.iloc[3:]),
+        )
+
+        self.assertListEqual(merged["channel_names"], full["channel_names"])
+        self.assertListEqual(
+            merged["channel_watch_seconds"].tolist(),
+            full["channel_watch_seconds"].tolist(),
+        )
+        self.assertListEqual(
+            merged["video_watch_counts"].tolist(), full["video_watch_counts"].tolist()
+        )
+        self.assertListEqual(merged["video_titles"], full["video_titles"])
+        self.assertEqual(merged["total_rewatches"], full["total_rewatches"])
+        for key in (
+            "session_count",
+            "longest_session_seconds",
+            "longest_session_videos",
+            "total_session_seconds",
+            "histogram",
+            "last_session",
+        ):
+            self.assertEqual(merged["sessions"][key], full["sessions"][key], key)
+
+    def test_date_range_summary_matches_filtered_rows(self):
+        youtube_df = pd.DataFrame(
+            {
+                "id": ["a", "b", "c", "d", "e"],
+                "channelTitle": [
+                    "Channel A",
+                    "Channel B",
+                    "Channel A",
+                    "Channel C",
+                    "Channel B",
+                ],
+                "watch_date": pd.to_datetime(
+                    [
+                        "2024-03-05 23:50",
+                        "2024-03-01 08:00",
+                        "2024-02-10 12:00",
+                        "2024-01-31 23:59",
+                        "2023-12-31 10:00",
+                    ]
+                ),
+                "duration": ["PT5M", "PT10M", "PT20M", "PT1H", "PT2M"],
+            }
+        )
+        channel_names = analytics.compute_watch_metrics(youtube_df.assign(title=""))[
+            "channel_names"
+        ]
+        cube = analytics.build_watch_cube(youtube_df, channel_names)
+
+        february = analytics.summarize_date_range(
+            cube, channel_names, date(2024, 2, 1), date(2024, 3, 1)
+        )
+        self.assertEqual(february["total_vids"], 2)
+        self.assertEqual(february["total_watch_seconds"], 1800)
+        self.assertEqual(february["total_unique_channels"], 2)
+        self.assertEqual(
+            february["top_channels_by_watch_time"],
+            [("Channel A", 1200), ("Channel B", 600)],
+        )
+
+        everything = analytics.summarize_date_range(cube, channel_names)
+        self.assertEqual(everything["total_vids"], 5)
+        self.assertEqual(everything["from"], "2023-12-31")
+        self.assertEqual(everything["to"], "2024-03-05")
+        self.assertEqual(everything["top_channels"][0], ("Channel A", 2))
+
+        outside = analytics.summarize_date_range(
+            cube, channel_names, date(2025, 1, 1), None
+        )
+        self.assertEqual(outside["total_vids"], 0)
+        self.assertEqual(outside["top_channels"], [])
+
+    def test_watch_cube_buckets_by_week_and_month(self):
+        youtube_df = pd.DataFrame(
+            {
+                "channelTitle": ["Channel A", "Channel B", "Channel A", "Channel A"],
+                # Sunday, Monday and Tuesday of ISO weeks 5 and 6, then March
+                "watch_date": pd.to_datetime(
+                    [
+                        "2024-02-04 23:00",
+                        "2024-02-05 01:00",
+                        "2024-02-06 13:00",
+                        "2024-03-31 10:00",
+                    ]
+                ),
+                "duration": ["PT1M", "PT2M", "PT3M", "PT4M"],
+            }
+        )
+        channel_names = ["Channel A", "Channel B"]
+        cube = analytics.build_watch_cube(youtube_df, channel_names)
+
+        weeks = analytics.channel_trends(cube, channel_names, "week", top_n=1)
+        self.assertEqual(weeks["buckets"][:2], ["2024-01-29", "2024-02-05"])
+        self.assertEqual(len(weeks["buckets"]), 9)
+        self.assertEqual(weeks["watch_counts"][:2], [1, 2])
+        self.assertEqual(weeks["watch_counts"][-1], 1)
+        self.assertEqual(weeks["channels"][0]["channel"], "Channel A")
+        self.assertEqual(weeks["channels"][0]["watch_seconds"][:2], [60, 180])
+
+        months = analytics.channel_trends(
+            cube,
+            channel_names,
+            "month",
+            first=date(2024, 2, 10),
+            channels=["Channel B", "Unknown"],
+        )
+        self.assertEqual(months["buckets"], ["2024-02-01", "2024-03-01"])
+        self.assertEqual(months["watch_counts"], [3, 1])
+        self.assertEqual(months["watch_seconds"], [360, 240])
+        self.assertEqual(
+            months["channels"],
+            [
+                {
+                    "channel": "Channel B",
+                    "watch_counts": [1, 0],
+                    "watch_seconds": [120, 0],
+                }
+            ],
+        )
+
+        # Monday is the first row and midnight the first column
+        hour_of_week = cube["hour_of_week"].reshape(7, 24)
+        self.assertEqual(hour_of_week[6, 23], 1)
+        self.assertEqual(hour_of_week[0, 1], 1)
+        self.assertEqual(hour_of_week.sum(), 4)
+
+        with self.assertRaises(ValueError):
+            analytics.channel_trends(cube, channel_names, "year")
+
     def test_unique_channels(self):
         # Test case for unique_channels function
         data = {"channelTitle": ["Channel A", "Channel B", "Channel A", "Channel C"]}
@@ -0,0 +1,101 @@
+import asyncio
+import unittest
+
+import httpx
+
+from src import api_handling
+
+
+class RecordingScheduler:
+    def __init__(self):
+        self.calls = []
+
+    def register(self, session_id, requests):
+        self.calls.append(("register", session_id, requests))
+
+    async def acquire(self, session_id):
+        self.calls.append(("acquire", session_id))
+
+
+class FetchVideoDataTest(unittest.TestCase):
+    def fetch(self, handler, ids="aaa,bbb", **kwargs):
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await api_handling.fetch_video_data("key", ids, client, **kwargs)
+
+        return asyncio.run(run())
+
+    def test_requests_go_to_configured_base_url(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={"items": []})
+
+        self.fetch(handler)
+
+        url = requests[0].url
+        self.assertEqual(
+            f"{url.scheme}://{url.host}{url.path}",
+            f"{api_handling.YOUTUBE_API_BASE_URL}/videos",
+        )
+        self.assertEqual(url.params["id"], "aaa,bbb")
+        self.assertEqual(url.params["part"], "snippet,contentDetails")
+
+    def test_rate_limited_request_is_retried(self):
+        attempts = []
+
+        def handler(request):
+            attempts.append(request)
+            if len(attempts) < 3:
+                return httpx.Response(429, headers={"Retry-After": "0"})
+            return httpx.Response(
+                200,
+                json={
+                    "items": [
+                        {
+                            "id": "aaa",
+                            "snippet": {"title": "Video A", "channelTitle": "Chan"},
+                            "contentDetails": {"duration": "PT1M"},
+                        }
+                    ]
+                },
+            )
+
+        records = self.fetch(handler, "aaa")
+
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(records[0]["title"], "Video A")
+
+    def test_persistent_rate_limit_raises(self):
+        def handler(request):
+            return httpx.Response(429, headers={"Retry-After": "0"})
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.fetch(handler)
+
+    def test_retries_wait_for_the_quota_scheduler(self):
+        responses = [
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(200, json={"items": []}),
+        ]
+        scheduler = RecordingScheduler()
+
+        self.fetch(
+            lambda request: responses.pop(0), session_id="s1", scheduler=scheduler
+        )
+
+        self.assertEqual(scheduler.calls, [("register", "s1", 1), ("acquire", "s1")])
+
+    def test_retry_after_is_clamped(self):
+        response = httpx.Response(429, headers={"Retry-After": "3600"})
+
+        self.assertEqual(
+            api_handling._retry_delay(response, 0),
+            api_handling.YOUTUBE_API_MAX_RETRY_AFTER_SECONDS,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
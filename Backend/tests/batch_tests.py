@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import batch, synthetic_history
+
+
+class BatchModuleTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.input_dir = os.path.join(self.tmp.name, "exports")
+        self.out_dir = os.path.join(self.tmp.name, "results")
+        os.makedirs(os.path.join(self.input_dir, "user"))
+
+        video_ids = set()
+        for seed, name in enumerate(
+            ["first.json", os.path.join("user", "second.json")]
+        ):
+            history = synthetic_history.generate_watch_history(300, seed=seed)
+            with open(os.path.join(self.input_dir, name), "w") as handle:
+                json.dump(history, handle)
+            video_ids.update(
+                item["titleUrl"].rsplit("=", 1)[-1]
+                for item in history
+                if "titleUrl" in item
+            )
+        with open(os.path.join(self.input_dir, "broken.json"), "w") as handle:
+            handle.write("{")
+        self.metadata = synthetic_history.video_metadata_frame(sorted(video_ids))
+
+    def test_local_metadata_run_writes_per_file_and_aggregate_results(self):
+        metadata_path = os.path.join(self.tmp.name, "videos.json")
+        self.metadata.to_json(metadata_path, orient="records")
+
+        summary = batch.run_batch(
+            self.input_dir,
+            self.out_dir,
+            metadata_path=metadata_path,
+            workers=1,
+            output_format="json",
+        )
+
+        self.assertEqual(summary["files"], 3)
+        self.assertEqual(summary["failedFiles"], 1)
+        self.assertEqual(summary["entries"], 600)
+        self.assertEqual(summary["missingVideos"], 0)
+        self.assertGreater(summary["rows"], 0)
+        with open(os.path.join(self.out_dir, "user", "second.summary.json")) as handle:
+            per_file = json.load(handle)
+        self.assertIn("top_channels_by_watch_time", per_file)
+        with open(os.path.join(self.out_dir, "first.rows.jsonl")) as handle:
+            first_rows = sum(1 for _ in handle)
+        with open(os.path.join(self.out_dir, batch.SUMMARY_NAME)) as handle:
+            written = json.load(handle)
+        exports = {os.path.basename(e["path"]): e for e in written["exports"]}
+        self.assertEqual(exports["first.json"]["rows"], first_rows)
+        self.assertIn("JSONDecodeError", exports["broken.json"]["error"])
+
+    def test_local_metadata_lookup_returns_only_the_exports_videos(self):
+        metadata_path = os.path.join(self.tmp.name, "videos.json")
+        self.metadata.to_json(metadata_path, orient="records")
+        wanted = list(self.metadata["id"][:3]) + ["unknown"]
+
+        with mock.patch.object(batch, "_metadata", None):
+            batch._init_worker(metadata_path)
+            lookup = batch._lookup_metadata(wanted + wanted)
+
+        self.assertCountEqual(lookup["id"], wanted[:3])
+        self.assertEqual(list(lookup.columns), batch.METADATA_COLUMNS)
+
+    def test_cache_lookup_counts_uncached_videos_as_missing(self):
+        records = self.metadata.to_dict(orient="records")
+        cached = {record["id"]: record for record in records[: len(records) // 2]}
+        cache = mock.Mock()
+        cache.lookup.side_effect = lambda ids: (
+            {video_id: cached[video_id] for video_id in ids if video_id in cached},
+            [],
+        )
+
+        with mock.patch("src.metadata_cache.get_metadata_cache", return_value=cache):
+            summary = batch.run_batch(
+                self.input_dir, self.out_dir, workers=1, output_format="json"
+            )
+
+        self.assertGreater(summary["missingVideos"], 0)
+        with open(os.path.join(self.out_dir, "first.rows.jsonl")) as handle:
+            merged_ids = {json.loads(line)["id"] for line in handle}
+        self.assertTrue(merged_ids)
+        self.assertLessEqual(merged_ids, set(cached))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 import json
 import unittest
-from datetime import datetime
+from datetime import date, datetime
 from pathlib import Path
 
 import pandas as pd
@@ -93,5 +93,114 @@ class DataProcessingModuleTest(unittest.TestCase):
         self.assertListEqual(merged_df["id"].tolist(), [videos[0].id, videos[1].id])
 
 
+class MergeDataTest(unittest.TestCase):
+    def test_merge_data_sorts_newest_first_for_range_lookups(self):
+        videos = [
+            models.YouTubeVideo(watchDate=datetime(2024, 1, day), id=video_id)
+            for day, video_id in ((2, "b"), (5, "a"), (1, "c"), (5, "d"), (3, "a"))
+        ]
+        vid_info_df = pd.DataFrame(
+            {
+                "id": ["a", "b", "c", "d"],
+                "title": ["A", "B", "C", "D"],
+                "channelTitle": ["X", "X", "Y", "Y"],
+                "duration": ["PT1M", "PT2M", "PT3M", "PT4M"],
+            }
+        )
+
+        merged_df = data_processing.merge_data(videos, vid_info_df)
+
+        # Ties keep the file order
+        self.assertListEqual(merged_df["id"].tolist(), ["a", "d", "a", "b", "c"])
+        for first, last in (
+            (date(2024, 1, 2), date(2024, 1, 3)),
+            (date(2024, 1, 5), None),
+            (None, date(2024, 1, 1)),
+            (date(2024, 2, 1), None),
+        ):
+            sliced = data_processing.rows_between(merged_df, first, last, True)
+            masked = data_processing.rows_between(merged_df, first, last, False)
+            self.assertListEqual(sliced.index.tolist(), masked.index.tolist())
+        self.assertListEqual(
+            data_processing.rows_between(
+                merged_df, date(2024, 1, 2), date(2024, 1, 3), True
+            )["id"].tolist(),
+            ["a", "b"],
+        )
+
+        self.assertTrue(
+            data_processing.continues_newest_first(merged_df.iloc[:2], merged_df)
+        )
+        self.assertFalse(
+            data_processing.continues_newest_first(merged_df.iloc[3:], merged_df)
+        )
+
+    def test_merge_data_joins_complete_metadata_by_id(self):
+        videos = [
+            models.YouTubeVideo(watchDate=datetime(2024, 1, day), id=video_id)
+            for day, video_id in ((4, "a"), (3, "gone"), (2, "untitled"), (1, "a"))
+        ]
+        vid_info_df = pd.DataFrame(
+            {
+                "id": ["untitled", "a", "a"],
+                "title": [None, "A", "A again"],
+                "channelTitle": ["X", "X", "X"],
+                "duration": ["PT1M", "PT1H2S", "PT1M"],
+                "categoryId": ["1", "2", "3"],
+            }
+        )
+
+        merged_df = data_processing.merge_data(videos, vid_info_df)
+
+        self.assertListEqual(merged_df["id"].tolist(), ["a", "a"])
+        # The first metadata row of an ID wins, extra columns come along
+        self.assertListEqual(merged_df["title"].tolist(), ["A", "A"])
+        self.assertListEqual(merged_df["categoryId"].tolist(), ["2", "2"])
+        self.assertListEqual(merged_df["duration_seconds"].tolist(), [3602, 3602])
+        self.assertListEqual(
+            list(merged_df.columns),
+            [
+                "id",
+                "watch_date",
+                "title",
+                "channelTitle",
+                "duration",
+                "categoryId",
+                "duration_seconds",
+            ],
+        )
+
+
+class FilterDataSinceTest(unittest.TestCase):
+    def _item(self, title, time, video_id=None):
+        return models.WatchedItem(
+            header="YouTube",
+            title=title,
+            titleUrl=f"https://www.youtube.com/watch?v={video_id}" if video_id else None,
+            time=time,
+            products=["YouTube"],
+        )
+
+    def test_filter_data_since_keeps_only_newer_entries(self):
+        watched_items = [
+            self._item("Watched new", "2024-02-01T10:00:00.000Z", "new"),
+            self._item("Watched a video that has been removed", "2024-02-01T09:00:00Z"),
+            self._item("Watched old", "2024-01-01T10:00:00.000Z", "old"),
+            self._item("Watched a video that has been removed", "2023-12-01T09:00:00Z"),
+        ]
+
+        filtered_json, removed_count = data_processing.filter_data(
+            watched_items, since=datetime(2024, 1, 15)
+        )
+
+        videos = data_processing.json_to_youtube_videos(filtered_json)
+        self.assertListEqual([video.id for video in videos], ["new"])
+        self.assertEqual(removed_count, 1)
+        self.assertEqual(
+            data_processing.latest_watch_date(watched_items),
+            datetime(2024, 2, 1, 10, 0),
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 from datetime import datetime
+import numpy as np
 import pandas as pd
 from src.data_store import DataStore
 import src.models as models
@@ -70,6 +71,21 @@ class TestDataStoreSerialization(unittest.TestCase):
         )
         self.assertEqual(self.data_store.max_rows, deserialized_data_store.max_rows)
 
+    def test_video_index_arrays_round_trip(self):
+        self.data_store.video_index = {
+            "channels": ["ThePrimeTime"],
+            "orders": {"watch_count": np.array([2, 0, 1], dtype=np.int32)},
+        }
+
+        deserialized = DataStore.from_dict(deepcopy(self.data_store).to_dict())
+
+        restored = deserialized.video_index["orders"]["watch_count"]
+        self.assertEqual(restored.dtype, np.int32)
+        np.testing.assert_array_equal(
+            restored, self.data_store.video_index["orders"]["watch_count"]
+        )
+        self.assertEqual(deserialized.video_index["channels"], ["ThePrimeTime"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,57 @@
+import json
+import unittest
+
+from src import data_processing, ingestion
+
+
+class IngestionModuleTest(unittest.TestCase):
+    def setUp(self):
+        self.raw = json.dumps(
+            [
+                {
+                    "header": "YouTube",
+                    "title": "Watched Video B",
+                    "titleUrl": "https://www.youtube.com/watch?v=bbb",
+                    "time": "2024-02-01T10:00:00.000Z",
+                    "products": ["YouTube"],
+                },
+                {
+                    "header": "YouTube",
+                    "title": "Watched Ad",
+                    "titleUrl": "https://www.youtube.com/watch?v=ad",
+                    "time": "2024-01-20T10:00:00.000Z",
+                    "products": ["YouTube"],
+                    "details": [{"name": "From Google Ads"}],
+                },
+                {
+                    "header": "YouTube",
+                    "title": "Watched Video A",
+                    "titleUrl": "https://www.youtube.com/watch?v=aaa",
+                    "time": "2024-01-01T10:00:00.000Z",
+                    "products": ["YouTube"],
+                },
+            ]
+        ).encode("utf-8")
+
+    def test_parse_upload_filters_entries(self):
+        parsed = ingestion.parse_upload(self.raw)
+
+        videos = data_processing.json_to_youtube_videos(parsed.filtered_json_data)
+        self.assertListEqual([video.id for video in videos], ["bbb", "aaa"])
+        self.assertEqual(parsed.latest_watch_date, "2024-02-01T10:00:00")
+        self.assertIsNone(parsed.since)
+
+    def test_parse_upload_since_high_water_mark(self):
+        parsed = ingestion.parse_upload(self.raw, since="2024-01-15T00:00:00")
+
+        videos = data_processing.json_to_youtube_videos(parsed.filtered_json_data)
+        self.assertListEqual([video.id for video in videos], ["bbb"])
+        self.assertEqual(parsed.since, "2024-01-15T00:00:00")
+
+    def test_parse_upload_rejects_non_array_json(self):
+        with self.assertRaises(ValueError):
+            ingestion.parse_upload(b'{"header": "YouTube"}')
+
+
+if __name__ == "__main__":
+    unittest.main()
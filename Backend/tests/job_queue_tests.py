@@ -0,0 +1,110 @@
+import os
+import time
+import unittest
+import uuid
+
+import redis
+
+from src.job_queue import JobQueue
+
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL", "redis://localhost:6379/15")
+
+
+def _local_redis():
+    client = redis.Redis.from_url(REDIS_TEST_URL)
+    try:
+        client.ping()
+    except redis.exceptions.ConnectionError:
+        return None
+    return client
+
+
+@unittest.skipIf(_local_redis() is None, f"Redis not reachable at {REDIS_TEST_URL}")
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.client = _local_redis()
+        self.queue = JobQueue(
+            self.client,
+            name=f"test-{uuid.uuid4().hex}",
+            visibility_timeout=1,
+            max_attempts=2,
+        )
+
+    def tearDown(self):
+        keys = self.client.keys(f"{self.queue.name}:*")
+        if keys:
+            self.client.delete(*keys)
+
+    def test_enqueue_is_deduplicated_per_session(self):
+        self.assertTrue(self.queue.enqueue("session-1", {"incremental": True}))
+        self.assertFalse(self.queue.enqueue("session-1"))
+        self.assertEqual(self.queue.stats()["pending"], 1)
+
+    def test_dequeue_and_ack(self):
+        self.queue.enqueue("session-1", {"incremental": True})
+
+        job = self.queue.dequeue(timeout=1)
+        self.assertEqual(job["session_id"], "session-1")
+        self.assertEqual(job["attempts"], 1)
+        self.assertEqual(self.queue.stats()["processing"], 1)
+
+        self.queue.ack(job["token"])
+        self.assertEqual(self.queue.stats(), {"pending": 0, "processing": 0, "dead": 0})
+        self.assertIsNone(self.queue.dequeue(timeout=1))
+
+    def test_expired_lease_is_retried_then_dead_lettered(self):
+        self.queue.enqueue("session-1", generation=4)
+        self.queue.dequeue(timeout=1)
+
+        time.sleep(1.1)
+        requeued, dead = self.queue.reap_expired()
+        self.assertEqual((requeued, dead), (["session-1"], []))
+
+        job = self.queue.dequeue(timeout=1)
+        self.assertEqual(job["attempts"], 2)
+
+        time.sleep(1.1)
+        requeued, dead = self.queue.reap_expired()
+        self.assertEqual(requeued, [])
+        self.assertEqual(
+            [(job["session_id"], job["generation"]) for job in dead], [("session-1", 4)]
+        )
+        self.assertEqual(self.queue.stats()["dead"], 1)
+
+    def test_extend_lease_keeps_job_leased(self):
+        self.queue.enqueue("session-1")
+        job = self.queue.dequeue(timeout=1)
+
+        time.sleep(0.6)
+        self.queue.extend_lease(job["token"])
+        time.sleep(0.6)
+        self.assertEqual(self.queue.reap_expired(), ([], []))
+
+    def test_late_ack_leaves_the_next_job_leased(self):
+        self.queue.enqueue("session-1")
+        superseded = self.queue.dequeue(timeout=1)
+        self.queue.enqueue("session-1", {"incremental": True})
+        current = self.queue.dequeue(timeout=1)
+        self.assertEqual(current["options"], {"incremental": True})
+
+        self.queue.ack(superseded["token"])
+        self.assertEqual(self.queue.stats()["processing"], 1)
+
+        time.sleep(1.1)
+        self.assertEqual(self.queue.reap_expired(), (["session-1"], []))
+
+    def test_ack_after_lease_expired_keeps_the_retry(self):
+        self.queue.enqueue("session-1")
+        stalled = self.queue.dequeue(timeout=1)
+        time.sleep(1.1)
+        self.queue.reap_expired()
+        retry = self.queue.dequeue(timeout=1)
+
+        self.queue.ack(stalled["token"])
+        self.queue.extend_lease(retry["token"])
+        self.assertEqual(self.queue.stats()["processing"], 1)
+        self.assertEqual(self.queue.reap_expired(), ([], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from src import lazy_imports, redis_utils
+
+
+class LazyImportTest(unittest.TestCase):
+    def test_module_loads_on_first_attribute_access(self):
+        module = lazy_imports.lazy_import("json.tool")
+        try:
+            self.assertFalse(lazy_imports.is_loaded("json.tool"))
+            self.assertTrue(callable(module.main))
+            self.assertTrue(lazy_imports.is_loaded("json.tool"))
+        finally:
+            sys.modules.pop("json.tool", None)
+
+    def test_entry_points_do_not_load_heavy_libraries(self):
+        script = (
+            "import sys, src.main, src.worker\n"
+            "from src.lazy_imports import is_loaded\n"
+            "print([name for name in ('pandas', 'numpy', 'plotly.express') "
+            "if is_loaded(name)])"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        )
+
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+class RedisConnectTest(unittest.TestCase):
+    def test_connect_retries_with_backoff(self):
+        with (
+            mock.patch.object(redis_utils, "ping", side_effect=[False, False, True]),
+            mock.patch.object(redis_utils.time, "sleep") as sleep,
+        ):
+            self.assertTrue(redis_utils.connect(retries=5, backoff=0.5))
+
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.5, 1.0])
+
+    def test_connect_gives_up_without_raising(self):
+        with (
+            mock.patch.object(redis_utils, "ping", return_value=False),
+            mock.patch.object(redis_utils.time, "sleep") as sleep,
+        ):
+            self.assertFalse(redis_utils.connect(retries=2, backoff=0.5))
+
+        self.assertEqual(sleep.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
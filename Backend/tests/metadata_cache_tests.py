@@ -0,0 +1,185 @@
+import asyncio
+import os
+import unittest
+import uuid
+
+import httpx
+import redis
+
+from src import api_handling
+from src.metadata_cache import MetadataCache
+
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL", "redis://localhost:6379/15")
+
+
+def _local_redis():
+    client = redis.Redis.from_url(REDIS_TEST_URL)
+    try:
+        client.ping()
+    except redis.exceptions.ConnectionError:
+        return None
+    return client
+
+
+class SlowStubApi:
+    """videos.list stand-in that records each requested batch."""
+
+    def __init__(self, delay=0.05):
+        self.batches = []
+        self.delay = delay
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        ids = request.url.params["id"].split(",")
+        self.batches.append(ids)
+        await asyncio.sleep(self.delay)
+        items = [
+            {
+                "id": video_id,
+                "snippet": {"title": f"Title {video_id}", "channelTitle": "Channel"},
+                "contentDetails": {"duration": "PT1M"},
+            }
+            for video_id in ids
+            if not video_id.startswith("gone")
+        ]
+        return httpx.Response(200, json={"items": items})
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+    def requested_ids(self):
+        return [video_id for batch in self.batches for video_id in batch]
+
+
+def _ids(prefix, count):
+    return [f"{prefix}-{i}" for i in range(count)]
+
+
+class InProcessCoalescingTest(unittest.TestCase):
+    def test_concurrent_sessions_share_in_flight_lookups(self):
+        api = SlowStubApi()
+        shared = _ids("trending", 60)
+
+        async def simulate():
+            async with api.client() as http:
+                results = await asyncio.gather(
+                    api_handling.fetch_video_metadata(
+                        shared + _ids("a", 40), "key", client=http
+                    ),
+                    api_handling.fetch_video_metadata(
+                        shared + _ids("b", 45), "key", client=http
+                    ),
+                )
+            loop = asyncio.get_running_loop()
+            self.assertEqual(api_handling._in_flight_by_loop[loop], {})
+            return results
+
+        (first, _), (second, _) = asyncio.run(simulate())
+
+        self.assertEqual(len(first), 100)
+        self.assertEqual(len(second), 105)
+        self.assertEqual(second["trending-0"]["title"], "Title trending-0")
+        requested = api.requested_ids()
+        self.assertEqual(len(requested), len(set(requested)))
+        self.assertEqual(len(requested), 60 + 40 + 45)
+        # The second session's 45 own IDs still go out as one batch
+        self.assertIn(45, [len(batch) for batch in api.batches])
+
+
+@unittest.skipIf(_local_redis() is None, f"Redis not reachable at {REDIS_TEST_URL}")
+class CrossProcessCoalescingTest(unittest.TestCase):
+    def setUp(self):
+        self.client = _local_redis()
+        self.name = f"test-{uuid.uuid4().hex}"
+
+    def tearDown(self):
+        keys = self.client.keys(f"{self.name}:*")
+        if keys:
+            self.client.delete(*keys)
+
+    def cache(self):
+        # Separate instances have separate owner tokens, like separate processes
+        return MetadataCache(self.client, name=self.name)
+
+    def test_second_process_waits_for_first_and_repacks_batches(self):
+        api = SlowStubApi(delay=0.3)
+        shared = _ids("trending", 30)
+
+        def other_process(ids):
+            # A separate event loop has its own in-process registry, so
+            # only the Redis markers can coalesce its lookups
+            async def lookup():
+                async with api.client() as http:
+                    return await api_handling.fetch_video_metadata(
+                        ids, "key", client=http, cache=self.cache()
+                    )
+
+            return asyncio.run(lookup())
+
+        async def simulate():
+            async with api.client() as http:
+                first = asyncio.create_task(
+                    api_handling.fetch_video_metadata(
+                        shared, "key", client=http, cache=self.cache()
+                    )
+                )
+                await asyncio.sleep(0.05)
+                second = await asyncio.to_thread(
+                    other_process, shared + _ids("own", 50)
+                )
+                return await first, second
+
+        (first, _), (second, _) = asyncio.run(simulate())
+
+        self.assertEqual(len(first), 30)
+        self.assertEqual(len(second), 80)
+        self.assertEqual(sorted(len(batch) for batch in api.batches), [30, 50])
+
+    def test_cached_ids_are_not_requested_again(self):
+        api = SlowStubApi(delay=0)
+        cache = self.cache()
+
+        async def lookup(ids):
+            async with api.client() as http:
+                return await api_handling.fetch_video_metadata(
+                    ids, "key", client=http, cache=cache
+                )
+
+        asyncio.run(lookup(_ids("video", 10)))
+        records, skipped = asyncio.run(lookup(_ids("video", 12)))
+
+        self.assertEqual(len(records), 12)
+        self.assertEqual(skipped, 0)
+        self.assertEqual([len(batch) for batch in api.batches], [10, 2])
+
+    def test_missing_ids_are_not_requested_again(self):
+        api = SlowStubApi(delay=0)
+        cache = self.cache()
+
+        async def lookup(ids):
+            async with api.client() as http:
+                return await api_handling.fetch_video_metadata(
+                    ids, "key", client=http, cache=self.cache()
+                )
+
+        first, _ = asyncio.run(lookup(_ids("video", 5) + _ids("gone", 5)))
+        second, skipped = asyncio.run(lookup(_ids("gone", 5) + ["gone-new"]))
+
+        self.assertEqual(len(first), 5)
+        self.assertEqual(second, {})
+        self.assertEqual(skipped, 5)
+        self.assertEqual(api.batches[1], ["gone-new"])
+        self.assertEqual(cache.lookup(["gone-0", "video-0"])[1], ["gone-0"])
+
+    def test_abandoned_claims_can_be_taken_over(self):
+        crashed = self.cache()
+        self.assertEqual(crashed.claim(["video-1"]), (["video-1"], []))
+        self.assertEqual(self.cache().claim(["video-1"]), ([], ["video-1"]))
+
+        # The crashed owner stops heartbeating
+        self.client.delete(crashed.owner_prefix + crashed.token)
+        self.assertEqual(self.cache().status(["video-1"]), [-1])
+        self.assertEqual(self.cache().claim(["video-1"]), (["video-1"], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
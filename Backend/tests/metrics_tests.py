@@ -0,0 +1,59 @@
+import json
+import unittest
+from unittest import mock
+
+from src import ingestion, metrics
+
+
+class MetricsModuleTest(unittest.TestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = metrics.Histogram("test_seconds", "Test.", (0.1, 1))
+        histogram.observe(0.05, stage="a")
+        histogram.observe(0.5, stage="a")
+        histogram.observe(5, stage="a")
+
+        lines = list(histogram.render())
+
+        self.assertIn('test_seconds_bucket{stage="a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{stage="a",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="a",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_sum{stage="a"} 5.55', lines)
+        self.assertIn('test_seconds_count{stage="a"} 3', lines)
+
+    def test_counter_escapes_label_values(self):
+        counter = metrics.Counter("test_total", "Test.")
+        counter.inc(status='say "hi"')
+        counter.inc(2, status='say "hi"')
+
+        self.assertIn('test_total{status="say \\"hi\\""} 3', list(counter.render()))
+
+    def test_disabled_metrics_record_nothing(self):
+        histogram = metrics.Histogram("test_seconds", "Test.", (1,))
+        with mock.patch.object(metrics, "METRICS_ENABLED", False):
+            with histogram.time(stage="a"):
+                pass
+            histogram.observe(1, stage="a")
+
+        self.assertEqual(len(list(histogram.render())), 2)
+
+    def test_upload_parsing_records_stage_timings(self):
+        raw = json.dumps(
+            [
+                {
+                    "header": "YouTube",
+                    "title": "Watched Video A",
+                    "titleUrl": "https://www.youtube.com/watch?v=aaa",
+                    "time": "2024-01-01T10:00:00.000Z",
+                    "products": ["YouTube"],
+                }
+            ]
+        ).encode("utf-8")
+
+        parsed = ingestion.parse_upload(raw)
+
+        self.assertEqual(set(parsed.timings), {"decode", "validate", "filter_data"})
+        self.assertIn("process_peak_resident_memory_bytes", metrics.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import contextvars
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import profiling
+
+
+class ProfilingModuleTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        patches = [
+            mock.patch.object(profiling, "PROFILING_ENABLED", True),
+            mock.patch.object(profiling, "PROFILE_DIR", self.directory.name),
+            mock.patch.object(profiling, "PROFILE_SAMPLE_RATE", 0),
+            mock.patch.object(profiling, "PROFILING_TOKEN", "secret"),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.directory.cleanup)
+        # Writes still queued would otherwise land outside the test directory
+        self.addCleanup(profiling.flush)
+
+    def test_profile_writes_report_and_pstats(self):
+        with profiling.profile("GET /example") as profile_id:
+            sorted(str(number) for number in range(20_000))
+        profiling.flush()
+
+        record = profiling.load_profile(profile_id)
+        self.assertEqual(record["name"], "GET /example")
+        self.assertGreater(record["peakBytes"], 0)
+        self.assertTrue(record["topAllocations"])
+        self.assertIn("function calls", record["topFunctions"])
+        self.assertTrue(os.path.exists(profiling.profile_path(profile_id, ".prof")))
+        self.assertEqual(profiling.recent_profiles()[0]["id"], profile_id)
+
+    def test_only_one_profile_runs_at_a_time(self):
+        with profiling.profile("outer") as outer:
+            with profiling.profile("inner") as inner:
+                pass
+
+        self.assertIsNotNone(outer)
+        self.assertIsNone(inner)
+
+    def test_header_needs_token(self):
+        def profiled(headers):
+            with profiling.request_profile(headers, "GET /") as profile_id:
+                return profile_id is not None
+
+        self.assertFalse(profiled({"X-Profile": "1"}))
+        self.assertTrue(profiled({"X-Profile": "1", "X-Profile-Token": "secret"}))
+        self.assertFalse(profiled({}))
+
+    def test_pipeline_follows_request_decision(self):
+        def pipeline_after_request(headers):
+            with profiling.request_profile(headers, "POST /api/load-data"):
+                pass
+            with profiling.pipeline_profile("session") as profile_id:
+                return profile_id is not None
+
+        context = contextvars.copy_context()
+        self.assertTrue(
+            context.run(
+                pipeline_after_request, {"X-Profile": "1", "X-Profile-Token": "secret"}
+            )
+        )
+        self.assertFalse(contextvars.copy_context().run(pipeline_after_request, {}))
+
+    def test_profile_ids_cannot_escape_the_directory(self):
+        self.assertIsNone(profiling.profile_path("../../etc/passwd", ".json"))
+        self.assertIsNone(profiling.load_profile("../secrets"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import unittest
+import uuid
+
+import httpx
+import redis
+
+from src import api_handling
+from src.quota import QuotaExceededError, QuotaScheduler
+
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL", "redis://localhost:6379/15")
+
+
+def _local_redis():
+    client = redis.Redis.from_url(REDIS_TEST_URL)
+    try:
+        client.ping()
+    except redis.exceptions.ConnectionError:
+        return None
+    return client
+
+
+class StubYouTubeApi:
+    """In-process stand-in for videos.list that records who called it."""
+
+    def __init__(self):
+        self.calls = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request.url.params["key"])
+        ids = request.url.params["id"].split(",")
+        items = [
+            {
+                "id": video_id,
+                "snippet": {"title": f"Title {video_id}", "channelTitle": "Channel"},
+                "contentDetails": {"duration": "PT1M"},
+            }
+            for video_id in ids
+        ]
+        return httpx.Response(200, json={"items": items})
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+
+def _chunks(prefix, count):
+    return [[f"{prefix}-{i}"] for i in range(count)]
+
+
+@unittest.skipIf(_local_redis() is None, f"Redis not reachable at {REDIS_TEST_URL}")
+class QuotaSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.client = _local_redis()
+        self.name = f"test-{uuid.uuid4().hex}"
+        self.api = StubYouTubeApi()
+
+    def tearDown(self):
+        keys = self.client.keys(f"{self.name}:*")
+        if keys:
+            self.client.delete(*keys)
+
+    def scheduler(self, **kwargs):
+        options = {"rate": 200, "burst": 1, "daily_budget": 1000}
+        options.update(kwargs)
+        return QuotaScheduler(self.client, name=self.name, **options)
+
+    def test_small_session_is_not_starved_by_large_one(self):
+        scheduler = self.scheduler()
+
+        async def simulate():
+            async with self.api.client() as http:
+                large = asyncio.create_task(
+                    api_handling.process_vid_info_df(
+                        _chunks("large", 40), "large", "large", scheduler, http
+                    )
+                )
+                await asyncio.sleep(0.05)
+                small = await api_handling.process_vid_info_df(
+                    _chunks("small", 3), "small", "small", scheduler, http
+                )
+                return small, await large
+
+        small, large = asyncio.run(simulate())
+
+        self.assertEqual(len(small), 3)
+        self.assertEqual(len(large), 40)
+        # Round-robin gives the small session every other slot once it joins
+        last_small_call = max(
+            i for i, key in enumerate(self.api.calls) if key == "small"
+        )
+        self.assertLess(last_small_call, 30)
+        self.assertEqual(scheduler.usage()["used"], 43)
+        self.assertEqual(scheduler.usage()["queueDepth"], 0)
+
+    def test_daily_budget_stops_requests(self):
+        scheduler = self.scheduler(daily_budget=5)
+
+        async def simulate():
+            async with self.api.client() as http:
+                await api_handling.process_vid_info_df(
+                    _chunks("video", 8), "key", "session", scheduler, http
+                )
+
+        with self.assertRaises(QuotaExceededError):
+            asyncio.run(simulate())
+
+        self.assertEqual(len(self.api.calls), 5)
+        usage = scheduler.usage()
+        self.assertEqual(usage["remaining"], 0)
+        self.assertEqual(usage["queueDepth"], 0)
+
+    def test_api_quota_error_marks_budget_exhausted(self):
+        scheduler = self.scheduler()
+
+        def quota_exceeded(request):
+            return httpx.Response(
+                403, json={"error": {"errors": [{"reason": "quotaExceeded"}]}}
+            )
+
+        async def simulate():
+            transport = httpx.MockTransport(quota_exceeded)
+            async with httpx.AsyncClient(transport=transport) as http:
+                await api_handling.process_vid_info_df(
+                    _chunks("video", 2), "key", "session", scheduler, http
+                )
+
+        with self.assertRaises(QuotaExceededError):
+            asyncio.run(simulate())
+        self.assertEqual(scheduler.usage()["remaining"], 0)
+
+    def test_sessions_further_back_wait_longer(self):
+        scheduler = self.scheduler(rate=10, burst=1)
+        for session_id in ("session-1", "session-2", "session-3"):
+            scheduler.register(session_id, 1)
+
+        self.assertEqual(scheduler.try_acquire("session-1"), 0)
+        # session-2 is next but the bucket is empty; session-3 also waits
+        # for the request session-2 takes before it
+        self.assertAlmostEqual(scheduler.try_acquire("session-2"), 0.1, places=2)
+        self.assertAlmostEqual(scheduler.try_acquire("session-3"), 0.2, places=2)
+
+    def test_usage_reports_waiting_requests(self):
+        scheduler = self.scheduler()
+        scheduler.register("session-1", 4)
+        scheduler.register("session-2", 2)
+
+        usage = scheduler.usage()
+        self.assertEqual(usage["waitingSessions"], 2)
+        self.assertEqual(usage["queueDepth"], 6)
+
+        scheduler.release("session-1", 4)
+        self.assertEqual(scheduler.usage()["queueDepth"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+import unittest
+import uuid
+from unittest import mock
+
+import pandas as pd
+import redis
+
+from src import redis_utils, result_cache, session_pipeline
+from src.data_store import DataStore, DataStoreState
+
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL", "redis://localhost:6379/15")
+
+
+def _local_redis():
+    client = redis.Redis.from_url(REDIS_TEST_URL)
+    try:
+        client.ping()
+    except redis.exceptions.ConnectionError:
+        return None
+    return client
+
+
+@unittest.skipIf(_local_redis() is None, f"Redis not reachable at {REDIS_TEST_URL}")
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.client = _local_redis()
+        self.name = f"test-results-{uuid.uuid4().hex}"
+        self.cache = result_cache.ResultCache(self.client, name=self.name)
+        self.addCleanup(self._cleanup)
+
+    def _cleanup(self):
+        keys = list(self.client.scan_iter(f"{self.name}:*"))
+        keys += list(self.client.scan_iter("test-session-*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def results(self, size=100):
+        return {"complete_data": "x" * size, "removed_video_count": 1}
+
+    def test_published_result_is_shared_with_other_sessions(self):
+        self.assertIsNone(self.cache.acquire("digest", "second"))
+
+        self.cache.publish("digest", self.results(), "first")
+
+        self.assertEqual(self.cache.acquire("digest", "second"), self.results())
+        self.assertEqual(self.client.zcard(self.cache.references_key("digest")), 2)
+
+    def test_least_recently_used_unreferenced_results_are_evicted(self):
+        # Room for three results
+        self.cache.max_bytes = 1100
+        for digest in ("old", "used", "held"):
+            self.cache.publish(digest, self.results(300), f"session-{digest}")
+        self.cache.release("old", "session-old")
+        self.cache.release("used", "session-used")
+        # Acquired after "old", so "old" is the least recently used
+        self.cache.acquire("used", "session-again")
+        self.cache.release("used", "session-again")
+
+        self.cache.publish("new", self.results(300), "session-new")
+
+        self.assertIsNone(self.cache.load("old"))
+        for digest in ("used", "held", "new"):
+            self.assertIsNotNone(self.cache.load(digest), digest)
+
+    def test_expired_references_do_not_keep_results(self):
+        self.cache.max_bytes = 500
+        self.cache.publish("expired", self.results(300), "gone", expire=-1)
+
+        self.cache.publish("new", self.results(300), "session-new")
+
+        self.assertIsNone(self.cache.load("expired"))
+        self.assertIsNotNone(self.cache.load("new"))
+
+    def test_session_points_at_cached_result(self):
+        first = DataStore()
+        first.complete_data = pd.DataFrame(
+            {
+                "id": ["a", "b"],
+                "watch_date": pd.to_datetime(["2024-01-02", "2024-01-01"]),
+                "title": ["A", "B"],
+                "channelTitle": ["C", "C"],
+                "duration": ["PT1M", "PT2M"],
+            }
+        )
+        first.unique_vids = [["A", "C"], ["B", "C"]]
+        first.removed_video_count = 3
+        first.num_of_pages = 1
+        self.cache.publish("digest", first.results(), "test-session-first")
+
+        session_id = f"test-session-{uuid.uuid4().hex}"
+        store = DataStore()
+        with (
+            mock.patch.object(redis_utils, "redis_client", self.client),
+            mock.patch.object(result_cache, "_result_cache", self.cache),
+        ):
+            store.generation = redis_utils.next_generation(session_id)
+            attached = asyncio.run(
+                session_pipeline.attach_cached_result(session_id, store, "digest")
+            )
+            redis_utils.save_data_store(session_id, store)
+            loaded = redis_utils.load_data_store(session_id)
+
+        self.assertTrue(attached)
+        self.assertEqual(store.current_state(), DataStoreState.COMPLETE)
+        # The session's own payload only holds the reference
+        self.assertNotIn("complete_data", json.loads(self.client.get(session_id)))
+        pd.testing.assert_frame_equal(loaded.complete_data, first.complete_data)
+        self.assertEqual(loaded.unique_vids, first.unique_vids)
+        self.assertEqual(loaded.removed_video_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from src import search_index
+
+
+class SearchIndexModuleTest(unittest.TestCase):
+    def setUp(self):
+        self.unique_vids = [
+            ["HTMX: 3 IRL Use Cases", "ThePrimeTime"],
+            ["Rust in 100 Seconds", "Fireship"],
+            ["Python in 100 Seconds", "Fireship"],
+            ["Why I use HTMX", "Fireship"],
+        ]
+        self.index = search_index.build_search_index(self.unique_vids)
+
+    def test_tokenize_lowercases_words(self):
+        self.assertListEqual(
+            search_index.tokenize("HTMX: 3 IRL Use-Cases"),
+            ["htmx", "3", "irl", "use", "cases"],
+        )
+
+    def test_search_matches_title_and_channel_tokens(self):
+        self.assertListEqual(search_index.search(self.index, "htmx").tolist(), [0, 3])
+        self.assertListEqual(
+            search_index.search(self.index, "100 seconds fireship").tolist(), [1, 2]
+        )
+
+    def test_last_token_matches_as_prefix(self):
+        self.assertListEqual(search_index.search(self.index, "pyth").tolist(), [2])
+        self.assertListEqual(
+            search_index.search(self.index, "fire").tolist(), [1, 2, 3]
+        )
+
+    def test_earlier_tokens_must_match_exactly(self):
+        self.assertListEqual(search_index.search(self.index, "pyth 100").tolist(), [])
+
+    def test_empty_query_returns_no_rows(self):
+        self.assertEqual(len(search_index.search(self.index, "  ")), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+import unittest
+import uuid
+from datetime import datetime
+from unittest import mock
+
+import pandas as pd
+import redis
+
+from src import (
+    data_processing,
+    ingestion,
+    metrics,
+    redis_utils,
+    session_pipeline,
+    synthetic_history,
+)
+from src.data_store import DataStore, DataStoreState
+from src.models import YouTubeVideo
+
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL", "redis://localhost:6379/15")
+
+
+def _local_redis():
+    client = redis.Redis.from_url(REDIS_TEST_URL)
+    try:
+        client.ping()
+    except redis.exceptions.ConnectionError:
+        return None
+    return client
+
+
+@unittest.skipIf(_local_redis() is None, f"Redis not reachable at {REDIS_TEST_URL}")
+class GenerationTest(unittest.TestCase):
+    def setUp(self):
+        self.client = _local_redis()
+        self.session_id = f"test-{uuid.uuid4().hex}"
+        patcher = mock.patch.object(redis_utils, "redis_client", self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.client.delete(self.session_id, redis_utils.generation_key(self.session_id))
+
+    def uploaded_store(self):
+        store = DataStore()
+        store.generation = redis_utils.next_generation(self.session_id)
+        store.filtered_json_data = [
+            YouTubeVideo(watchDate=datetime(2024, 1, 1), id="video-1").to_json()
+        ]
+        store.update_state(DataStoreState.REQUESTING_DATA)
+        redis_utils.save_data_store(self.session_id, store)
+        return store
+
+    def test_saves_from_a_superseded_generation_are_rejected(self):
+        old_store = self.uploaded_store()
+        new_store = self.uploaded_store()
+
+        with self.assertRaises(redis_utils.StaleGenerationError):
+            redis_utils.save_data_store(self.session_id, old_store)
+
+        redis_utils.save_data_store(self.session_id, new_store)
+        self.assertEqual(
+            redis_utils.load_data_store(self.session_id).generation,
+            new_store.generation,
+        )
+
+    def test_reupload_cancels_running_pipeline(self):
+        self.uploaded_store()
+        fetch_started = asyncio.Event()
+        fetch_cancelled = []
+
+        async def slow_request_data(*args, **kwargs):
+            fetch_started.set()
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                fetch_cancelled.append(True)
+                raise
+
+        async def simulate():
+            pipeline = asyncio.create_task(
+                session_pipeline.process_data_pipeline(self.session_id)
+            )
+            await fetch_started.wait()
+            new_store = await asyncio.to_thread(self.uploaded_store)
+            await asyncio.wait_for(pipeline, timeout=5)
+            return new_store
+
+        with (
+            mock.patch.object(session_pipeline, "GENERATION_POLL_SECONDS", 0.05),
+            mock.patch.object(
+                session_pipeline.api_handling, "request_data", slow_request_data
+            ),
+        ):
+            new_store = asyncio.run(simulate())
+
+        self.assertEqual(fetch_cancelled, [True])
+        stored = redis_utils.load_data_store(self.session_id)
+        self.assertEqual(stored.generation, new_store.generation)
+        self.assertEqual(stored.current_state(), DataStoreState.REQUESTING_DATA)
+        self.assertFalse(stored.error_message)
+
+    def test_history_without_available_metadata_fails_with_a_clear_error(self):
+        self.uploaded_store()
+        no_metadata = pd.DataFrame(columns=["id", "title", "channelTitle", "duration"])
+
+        with mock.patch.object(
+            session_pipeline.api_handling,
+            "request_data",
+            mock.AsyncMock(return_value=(no_metadata, 1)),
+        ):
+            asyncio.run(session_pipeline.process_data_pipeline(self.session_id))
+
+        self.assertEqual(
+            redis_utils.load_data_store(self.session_id).error_message,
+            "No videos with available metadata.",
+        )
+
+    def test_session_analyzed_before_watch_metrics_still_renders(self):
+        history = synthetic_history.generate_watch_history(200, seed=3)
+        parsed = ingestion.parse_upload(json.dumps(history).encode())
+        videos = data_processing.json_to_youtube_videos(parsed.filtered_json_data)
+        metadata = synthetic_history.video_metadata_frame(video.id for video in videos)
+        store = DataStore()
+        store.generation = redis_utils.next_generation(self.session_id)
+        store.complete_data = data_processing.merge_data(videos, metadata)
+        store.update_state(DataStoreState.COMPLETE)
+        redis_utils.save_data_store(self.session_id, store)
+
+        context = asyncio.run(
+            session_pipeline.generate_analytics_context(self.session_id)
+        )
+
+        self.assertEqual(context["total_vids"], len(store.complete_data))
+        self.assertIn("heatmap", context)
+
+    def test_failed_run_is_counted_as_failed(self):
+        self.uploaded_store()
+        runs = metrics.Counter("pipeline_runs_total", "Test.")
+
+        with (
+            mock.patch.object(session_pipeline, "PIPELINE_RUNS", runs),
+            mock.patch.object(
+                session_pipeline.api_handling,
+                "request_data",
+                mock.AsyncMock(side_effect=ValueError("No metadata returned.")),
+            ),
+        ):
+            asyncio.run(session_pipeline.process_data_pipeline(self.session_id))
+
+        self.assertEqual(
+            redis_utils.load_data_store(self.session_id).error_message,
+            "No metadata returned.",
+        )
+        self.assertEqual(
+            list(runs.render())[2:], ['pipeline_runs_total{outcome="failed"} 1']
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import unittest
+
+from src import data_processing, ingestion, synthetic_history
+
+
+class SyntheticHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.history = synthetic_history.generate_watch_history(
+            5_000, seed=7, ad_ratio=0.1, removed_ratio=0.05
+        )
+
+    def test_same_seed_gives_same_history(self):
+        self.assertEqual(
+            self.history,
+            synthetic_history.generate_watch_history(
+                5_000, seed=7, ad_ratio=0.1, removed_ratio=0.05
+            ),
+        )
+
+    def test_history_parses_like_a_takeout_export(self):
+        parsed = ingestion.parse_upload(json.dumps(self.history).encode("utf-8"))
+
+        removed = sum(
+            item["title"] == synthetic_history.REMOVED_VIDEO_TITLE
+            for item in self.history
+        )
+        ads = sum("details" in item for item in self.history)
+        self.assertEqual(parsed.removed_video_count, removed)
+        self.assertEqual(len(parsed.filtered_json_data), 5_000 - removed - ads)
+        self.assertAlmostEqual(removed / 5_000, 0.05, delta=0.01)
+        self.assertAlmostEqual(ads / 5_000, 0.1, delta=0.015)
+        self.assertEqual(parsed.latest_watch_date[:19], self.history[0]["time"][:19])
+
+    def test_metadata_is_derived_from_the_video_id(self):
+        parsed = ingestion.parse_upload(json.dumps(self.history).encode("utf-8"))
+        videos = data_processing.json_to_youtube_videos(parsed.filtered_json_data)
+        metadata = synthetic_history.video_metadata_frame(video.id for video in videos)
+
+        merged = data_processing.merge_data(videos, metadata)
+
+        self.assertEqual(len(merged), len(videos))
+        self.assertTrue((merged["duration_seconds"] >= 30).all())
+        first = videos[0].id
+        self.assertEqual(
+            synthetic_history.video_metadata(first)["channelTitle"],
+            f"Synthetic channel {int(first[1:5], 16)}",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
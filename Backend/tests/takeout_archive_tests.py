@@ -0,0 +1,101 @@
+import gzip
+import io
+import json
+import tarfile
+import unittest
+import zipfile
+from unittest import mock
+
+from src import ingestion, takeout_archive
+
+HISTORY_PATH = "Takeout/YouTube and YouTube Music/history/watch-history.json"
+
+
+def zip_archive(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def tgz_archive(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+class TakeoutArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.history = json.dumps(
+            [
+                {
+                    "header": "YouTube",
+                    "title": "Watched Video A",
+                    "titleUrl": "https://www.youtube.com/watch?v=aaa",
+                    "time": "2024-01-01T10:00:00.000Z",
+                    "products": ["YouTube"],
+                }
+            ]
+        ).encode("utf-8")
+        self.other_files = {
+            "Takeout/archive_browser.html": b"<html></html>",
+            "Takeout/YouTube and YouTube Music/history/search-history.json": b"[]",
+        }
+
+    def read_history(self, raw):
+        with takeout_archive.open_watch_history(raw) as history:
+            return bytes(history.stream.read())
+
+    def test_watch_history_is_found_in_zip_and_tgz(self):
+        files = {**self.other_files, HISTORY_PATH: self.history}
+
+        for archive in (zip_archive(files), tgz_archive(files)):
+            self.assertTrue(takeout_archive.is_archive(archive))
+            self.assertEqual(self.read_history(archive), self.history)
+
+    def test_plain_and_gzipped_json_are_accepted(self):
+        with takeout_archive.open_watch_history(self.history) as history:
+            self.assertFalse(history.is_html)
+            self.assertIs(history.stream.read(), self.history)
+        self.assertEqual(self.read_history(gzip.compress(self.history)), self.history)
+
+    def test_json_entry_is_preferred_over_html(self):
+        html_path = HISTORY_PATH.replace(".json", ".html")
+        archive = zip_archive({html_path: b"<html></html>", HISTORY_PATH: self.history})
+
+        with takeout_archive.open_watch_history(archive) as history:
+            self.assertFalse(history.is_html)
+        with takeout_archive.open_watch_history(
+            zip_archive({html_path: b"<html></html>"})
+        ) as history:
+            self.assertTrue(history.is_html)
+
+    def test_archive_without_watch_history_is_rejected(self):
+        for archive in (zip_archive(self.other_files), tgz_archive(self.other_files)):
+            with self.assertRaisesRegex(ValueError, "No watch-history.json"):
+                self.read_history(archive)
+
+    def test_oversized_entry_is_rejected(self):
+        archive = zip_archive({HISTORY_PATH: self.history})
+
+        with mock.patch.object(takeout_archive, "MAX_WATCH_HISTORY_BYTES", 10):
+            with self.assertRaisesRegex(ValueError, "larger than"):
+                self.read_history(archive)
+
+    def test_parse_upload_reads_archives(self):
+        archive = tgz_archive({HISTORY_PATH: self.history})
+
+        parsed = ingestion.parse_upload(archive)
+
+        self.assertEqual(len(parsed.filtered_json_data), 1)
+        self.assertEqual(parsed.history_bytes, len(self.history))
+        self.assertIn("extract", parsed.timings)
+
+
+if __name__ == "__main__":
+    unittest.main()
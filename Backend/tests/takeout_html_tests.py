@@ -0,0 +1,71 @@
+import io
+import json
+import unittest
+
+from src import ingestion, synthetic_history, takeout_html
+from tests.takeout_archive_tests import zip_archive
+
+
+class TakeoutHtmlTest(unittest.TestCase):
+    def setUp(self):
+        self.history = synthetic_history.generate_watch_history(
+            400, seed=3, ad_ratio=0.1, removed_ratio=0.05
+        )
+        self.html = synthetic_history.to_takeout_html(self.history).encode("utf-8")
+
+    def test_parse_watch_time_converts_to_utc(self):
+        cases = {
+            "Jan 30, 2024, 9:52:57 PM EST": "2024-01-31T02:52:57Z",
+            "Jan 30, 2024, 12:05:00 AM UTC": "2024-01-30T00:05:00Z",
+            "30 Jan 2024, 21:52:57 CET": "2024-01-30T20:52:57Z",
+            "Jan 30, 2024, 21:52:57 GMT+05:30": "2024-01-30T16:22:57Z",
+        }
+        for text, expected in cases.items():
+            self.assertEqual(takeout_html.parse_watch_time(text), expected, text)
+        self.assertIsNone(takeout_html.parse_watch_time("30 janv. 2024, 21:52:57"))
+
+    def test_html_and_json_exports_parse_alike(self):
+        from_html = ingestion.parse_upload(self.html)
+        from_json = ingestion.parse_upload(json.dumps(self.history).encode("utf-8"))
+
+        self.assertEqual(from_html.entry_count, len(self.history))
+        self.assertEqual(from_html.removed_video_count, from_json.removed_video_count)
+        self.assertEqual(from_html.history_bytes, len(self.html))
+        # HTML times have no fractional seconds
+        self.assertEqual(from_html.latest_watch_date, from_json.latest_watch_date[:19])
+        self.assertEqual(
+            [json.loads(entry)["id"] for entry in from_html.filtered_json_data],
+            [json.loads(entry)["id"] for entry in from_json.filtered_json_data],
+        )
+
+    def test_entries_split_across_chunks_are_parsed(self):
+        class Trickle(io.BytesIO):
+            # Chunk boundaries fall inside tags, entities and UTF-8 sequences
+            def read(self, size=-1):
+                return super().read(7)
+
+        items = list(takeout_html.iter_watched_items(Trickle(self.html)))
+
+        self.assertEqual(len(items), len(self.history))
+        self.assertEqual(items[0].titleUrl, self.history[0].get("titleUrl"))
+        self.assertEqual(items[0].products, ["YouTube"])
+
+    def test_html_inside_archive_is_parsed(self):
+        archive = zip_archive(
+            {"Takeout/YouTube and YouTube Music/history/watch-history.html": self.html}
+        )
+
+        parsed = ingestion.parse_upload(archive)
+
+        self.assertEqual(parsed.entry_count, len(self.history))
+        self.assertEqual(parsed.history_bytes, len(self.html))
+
+    def test_non_english_export_is_rejected(self):
+        html = self.html.replace(b" UTC<br>", b" UTC heure<br>", 1)
+
+        with self.assertRaisesRegex(ValueError, "only English"):
+            ingestion.parse_upload(html)
+
+
+if __name__ == "__main__":
+    unittest.main()
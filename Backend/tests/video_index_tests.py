@@ -0,0 +1,110 @@
+import unittest
+from datetime import date
+
+import pandas as pd
+
+from src import data_processing, video_index
+
+
+class VideoIndexModuleTest(unittest.TestCase):
+    def setUp(self):
+        self.complete_data = pd.DataFrame(
+            {
+                "id": ["a", "b", "a", "c", "b", "a"],
+                "watch_date": pd.to_datetime(
+                    [
+                        "2024-01-06",
+                        "2024-01-05",
+                        "2024-01-04",
+                        "2024-01-03",
+                        "2024-01-02",
+                        "2024-01-01",
+                    ]
+                ),
+                "title": [
+                    "Video A",
+                    "Video B",
+                    "Video A",
+                    "Video C",
+                    "Video B",
+                    "Video A",
+                ],
+                "channelTitle": [
+                    "Channel Y",
+                    "Channel X",
+                    "Channel Y",
+                    "Channel Y",
+                    "Channel X",
+                    "Channel Y",
+                ],
+                "duration": ["PT1M", "PT10M", "PT1M", "PT1H", "PT10M", "PT1M"],
+            }
+        )
+        self.table = video_index.build_unique_video_table(self.complete_data)
+        self.index = video_index.build_video_index(self.table)
+
+    def _titles(self, sort="first_seen", channel=None, ascending=None, size=10):
+        order, start, stop, reverse = video_index.select_rows(
+            self.index, sort, channel, ascending
+        )
+        rows = video_index.page_rows(order, start, stop, reverse, 0, size)
+        return [self.table["title"].iloc[row] for row in rows]
+
+    def test_unique_table_keeps_first_seen_order_and_stats(self):
+        self.assertListEqual(
+            self.table["title"].tolist(), ["Video A", "Video B", "Video C"]
+        )
+        self.assertListEqual(self.table["watch_count"].tolist(), [3, 2, 1])
+        self.assertListEqual(self.table["watch_seconds"].tolist(), [180, 1200, 3600])
+
+    def test_sort_orders(self):
+        self.assertListEqual(
+            self._titles("watch_count"), ["Video A", "Video B", "Video C"]
+        )
+        self.assertListEqual(
+            self._titles("watch_time"), ["Video C", "Video B", "Video A"]
+        )
+        self.assertListEqual(
+            self._titles("last_watched"), ["Video A", "Video B", "Video C"]
+        )
+        self.assertListEqual(
+            self._titles("watch_count", ascending=True),
+            ["Video C", "Video B", "Video A"],
+        )
+
+    def test_channel_filter_uses_row_ranges(self):
+        self.assertListEqual(
+            self._titles("watch_time", channel="Channel Y"), ["Video C", "Video A"]
+        )
+        self.assertListEqual(self._titles(channel="Channel X"), ["Video B"])
+        self.assertListEqual(self._titles(channel="Missing"), [])
+
+    def test_paging_reversed_range(self):
+        self.assertListEqual(
+            self._titles("first_seen", ascending=False, size=2), ["Video C", "Video B"]
+        )
+
+    def test_date_range_keeps_videos_watched_in_it(self):
+        history_rows = data_processing.rows_between(
+            self.complete_data, date(2024, 1, 2), date(2024, 1, 3), newest_first=True
+        )
+        keep = video_index.watched_rows(
+            self.table[["title", "channelTitle"]].to_records(index=False).tolist(),
+            history_rows,
+        )
+        order, start, stop, reverse = video_index.select_rows(self.index, "watch_time")
+
+        order, start, stop = video_index.restrict_rows(order, start, stop, keep)
+
+        rows = video_index.page_rows(order, start, stop, reverse, 0, 10)
+        self.assertListEqual(
+            [self.table["title"].iloc[row] for row in rows], ["Video C", "Video B"]
+        )
+
+    def test_unknown_sort_raises(self):
+        with self.assertRaises(ValueError):
+            video_index.select_rows(self.index, "views")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import unittest
+import uuid
+from datetime import datetime
+from unittest import mock
+
+import redis
+
+from src import redis_utils, session_pipeline, worker
+from src.data_store import DataStore, DataStoreState
+from src.job_queue import JobQueue
+from src.models import YouTubeVideo
+
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL", "redis://localhost:6379/15")
+
+
+def _local_redis():
+    client = redis.Redis.from_url(REDIS_TEST_URL)
+    try:
+        client.ping()
+    except redis.exceptions.ConnectionError:
+        return None
+    return client
+
+
+@unittest.skipIf(_local_redis() is None, f"Redis not reachable at {REDIS_TEST_URL}")
+class RunJobTest(unittest.TestCase):
+    def setUp(self):
+        self.client = _local_redis()
+        self.session_id = f"test-{uuid.uuid4().hex}"
+        self.queue = JobQueue(self.client, name=f"test-{uuid.uuid4().hex}")
+        patcher = mock.patch.object(redis_utils, "redis_client", self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        store = DataStore()
+        store.generation = redis_utils.next_generation(self.session_id)
+        store.filtered_json_data = [
+            YouTubeVideo(watchDate=datetime(2024, 1, 1), id="video-1").to_json()
+        ]
+        store.update_state(DataStoreState.REQUESTING_DATA)
+        redis_utils.save_data_store(self.session_id, store)
+        self.generation = store.generation
+
+    def tearDown(self):
+        keys = self.client.keys(f"{self.queue.name}:*")
+        self.client.delete(
+            self.session_id, redis_utils.generation_key(self.session_id), *keys
+        )
+
+    def run_next_job(self):
+        job = self.queue.dequeue(1)
+        self.assertIsNotNone(job)
+        asyncio.run(worker.run_job(self.queue, job))
+        return job
+
+    def test_failed_run_is_retried(self):
+        request_data = mock.AsyncMock(
+            side_effect=[RuntimeError("YouTube API unavailable"), True]
+        )
+        generate_analytics = mock.AsyncMock()
+        self.queue.enqueue(self.session_id, generation=self.generation)
+
+        with (
+            mock.patch.object(session_pipeline, "request_data", request_data),
+            mock.patch.object(
+                session_pipeline, "generate_analytics", generate_analytics
+            ),
+        ):
+            self.run_next_job()
+            self.assertEqual(self.queue.stats()["pending"], 1)
+            self.assertFalse(redis_utils.load_data_store(self.session_id).error_message)
+
+            job = self.run_next_job()
+
+        self.assertEqual(job["attempts"], 2)
+        generate_analytics.assert_awaited_once()
+        self.assertEqual(self.queue.stats(), {"pending": 0, "processing": 0, "dead": 0})
+
+    def test_session_fails_once_retries_are_used_up(self):
+        request_data = mock.AsyncMock(side_effect=RuntimeError("Redis unavailable"))
+        self.queue.max_attempts = 2
+        self.queue.enqueue(self.session_id, generation=self.generation)
+
+        with mock.patch.object(session_pipeline, "request_data", request_data):
+            self.run_next_job()
+            self.run_next_job()
+
+        self.assertEqual(self.queue.stats()["dead"], 1)
+        self.assertEqual(
+            redis_utils.load_data_store(self.session_id).error_message,
+            "Failed to process data pipeline.",
+        )
+
+    def test_failure_of_a_superseded_upload_leaves_the_session_alone(self):
+        store = redis_utils.load_data_store(self.session_id)
+        store.generation = redis_utils.next_generation(self.session_id)
+        redis_utils.save_data_store(self.session_id, store)
+
+        asyncio.run(worker._mark_failed(self.session_id, self.generation))
+        self.assertFalse(redis_utils.load_data_store(self.session_id).error_message)
+
+        redis_utils.delete_data_store(self.session_id)
+        asyncio.run(worker._mark_failed(self.session_id, store.generation))
+        self.assertIsNone(redis_utils.load_data_store(self.session_id))
+
+
+class ConsumeTest(unittest.TestCase):
+    def test_queue_errors_do_not_stop_the_consumer(self):
+        stopping = asyncio.Event()
+        calls = []
+
+        def dequeue(timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                raise redis.exceptions.ConnectionError("Connection reset")
+            stopping.set()
+
+        queue = mock.Mock(dequeue=dequeue)
+        with mock.patch.object(worker, "CONSUME_BACKOFF_SECONDS", 0):
+            asyncio.run(worker.consume(queue, stopping))
+
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()